@@ -1,11 +1,164 @@
-import cv2
-import numpy as np
-from PIL import Image
+import os
+import io
+import time
+import uuid
+import bisect
+import asyncio
+import contextvars
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from src.startup import StartupTimer, is_profile_enabled
+
+# MRI_STARTUP_PROFILE=1 uvicorn backend:app: print the import and startup phases when it is ready
+startup_timer = StartupTimer("backend", is_profile_enabled())
+startup_timer.import_modules("numpy", "fastapi", "inference")
 
-import uvicorn
-from fastapi import FastAPI, File, UploadFile
+import numpy as np
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 from pydantic import BaseModel, Base64Bytes, ConfigDict
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import UploadFile, MutableHeaders
+
+from inference import MRIKneePredictor
+from src.dicom_io import is_dicom_path, read_dicom_bytes, write_dicom
+from src.reslice import Reslicer
+from src.shared_store import SharedVolumeStore, get_default_shared_dir
+from src.stream_frame import encode_frame
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_CASE = "default"
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("MRI_STORE_BUDGET_MB", 1024)) * 1024 * 1024
+DEFAULT_SPILL_DIR = os.environ.get(
+    "MRI_STORE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "mri_viewer_store")
+)
+# volumes shared by every worker process (uvicorn --workers N) when it is set, e.g. /dev/shm/mri_viewer_shared
+DEFAULT_SHARED_DIR = os.environ.get("MRI_SHARED_STORE_DIR", "")
+UPLOAD_CHUNK_SIZE = 1 << 20
+DEFAULT_PUSH_RADIUS = 4
+DEFAULT_PUSH_WINDOW = 4
+DEFAULT_GRADCAM_CACHE = int(os.environ.get("MRI_GRADCAM_CACHE", 512))
+DEFAULT_RESLICE_VOLUMES = int(os.environ.get("MRI_RESLICE_VOLUMES", 8))
+# add a Server-Timing header with the stage timings to every response (or per request by "X-Profile: 1")
+PROFILE_ALL = os.environ.get("MRI_PROFILE", "") == "1"
+
+
+###################################################################
+# Define Volume Store.
+class VolumeStore:
+    """ 
+    This Class keeps one contiguous volume (slices, h, w) per (case, plane, method).
+    
+    The volumes in memory are limited by memory_budget (bytes). When the budget is exceeded,
+    the least recently used volume is spilled to a .npy file in spill_dir and served 
+    from a memory-mapped file afterwards, so many studies can be held at once.
+    """
+    def __init__(self, memory_budget: int, spill_dir: str):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.__volumes = OrderedDict()
+        self.__spilled = {}
+        self.__nbytes = 0
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        
+    def put(self, key: tuple, volume: np.ndarray) -> None:
+        volume = np.ascontiguousarray(volume)
+        with self.__lock:
+            self.__remove(key)
+            self.__volumes[key] = volume
+            self.__nbytes += volume.nbytes
+            self.__evict()
+    
+    def get(self, key: tuple) -> np.ndarray:
+        """ Raise KeyError when the key is not stored """
+        with self.__lock:
+            volume = self.__volumes.get(key)
+            if volume is not None:
+                self.__volumes.move_to_end(key)
+                self.hits += 1
+                return volume
+            volume = self.__spilled.get(key)
+            if volume is None:
+                self.misses += 1
+                raise KeyError(key)
+            self.spill_hits += 1
+            return volume
+    
+    def __contains__(self, key: tuple) -> bool:
+        with self.__lock:
+            return key in self.__volumes or key in self.__spilled
+        
+    def keys(self) -> list:
+        with self.__lock:
+            return list(self.__volumes) + list(self.__spilled)
+        
+    def delete(self, key: tuple) -> None:
+        with self.__lock:
+            self.__remove(key)
+            
+    def clear(self) -> None:
+        with self.__lock:
+            for key in list(self.__volumes) + list(self.__spilled):
+                self.__remove(key)
+    
+    def memory_usage(self) -> int:
+        """ Bytes of the volumes held in memory (spilled volumes are not counted) """
+        return self.__nbytes
+    
+    def attach(self) -> None:
+        """ Nothing to do, the store belongs to this process (see SharedVolumeStore) """
+    
+    def detach(self) -> bool:
+        """ Remove every volume, then return True """
+        self.clear()
+        return True
+    
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "memory_bytes": self.__nbytes,
+                "memory_budget_bytes": self.memory_budget,
+                "memory_volumes": len(self.__volumes),
+                "spilled_volumes": len(self.__spilled),
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+            }
+    
+    def __remove(self, key: tuple) -> None:
+        volume = self.__volumes.pop(key, None)
+        if volume is not None:
+            self.__nbytes -= volume.nbytes
+        spilled = self.__spilled.pop(key, None)
+        if spilled is not None:
+            path = spilled.filename
+            del spilled
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def __evict(self) -> None:
+        while self.__nbytes > self.memory_budget and len(self.__volumes) > 1:
+            key, volume = self.__volumes.popitem(last=False)
+            self.__nbytes -= volume.nbytes
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.npy")
+            np.save(path, volume)
+            self.__spilled[key] = np.load(path, mmap_mode="r")
 
 
 ###################################################################
@@ -13,75 +166,413 @@ from fastapi.middleware.cors import CORSMiddleware
 class Controller:
     """ 
     This Class is a controller for the FastAPI. 
-    It will handle the request from the client and save inference results by dictionary.
-    So, the client can get the result by call function get_res_dict_item_by_key.
-    
-    Here is the structure of the result dictionary.
-    self.res_dict = {
-        'coronal': {
-            'idx': {
-                'original': 'base64 string',
-                'gradcam': 'base64 string',
-            }
-        },
-        'sagittal': {
-            ...
-        },
-        'axial': {
-            ...
-        }
-    }    
+    It will handle the request from the client and save inference results by volume store.
+    So, the client can get the result by call function get_res_dict_item.
+    
+    Every result is one contiguous volume keyed by (case, plane, method).
+    The case is given by the client (e.g. "<session>-<file name>"),
+    so two clients or two cases never overwrite each other.
+    self.store = {
+        ('0000', 'coronal', 'original'): np.ndarray (slices, h, w),
+        ('0000', 'coronal', 'gradcam'): np.ndarray (slices, h, w),
+        ...
+    }
+    Until the inference model writes a gradcam volume, "gradcam" falls back to "original".
+    
+    With shared_dir, the volumes and predictions are kept in a SharedVolumeStore,
+    so every worker process of the backend sees the uploads of the others.
     """
-    def __init__(self):
-        self.__res_dict = {}
+    def __init__(
+        self, memory_budget: int = DEFAULT_MEMORY_BUDGET, spill_dir: str = DEFAULT_SPILL_DIR, 
+        shared_dir: str = DEFAULT_SHARED_DIR
+    ):
+        if shared_dir:
+            self.store = SharedVolumeStore(shared_dir, memory_budget, spill_dir)
+            self.__predictions = self.store.predictions
+        else:
+            self.store = VolumeStore(memory_budget, spill_dir)
+            self.__predictions = {}
         
     def get_res_dict(self) -> dict:
-        """ Get all of the result dictionary """
-        return self.__res_dict
+        """ Get the shape of every stored volume """
+        return {key: self.store.get(key).shape for key in self.store.keys()}
     
-    def get_res_dict_item(self, plane: str, idx: int, method: str) -> np.ndarray:
+    def get_res_dict_item(self, plane: str, idx: int, method: str, case: str = DEFAULT_CASE) -> np.ndarray:
         """ Get result item by the given key """
-        return self.__res_dict[plane][idx][method]
+        return self.get_volume(plane, method, case)[idx]
+    
+    def get_volume(self, plane: str, method: str, case: str = DEFAULT_CASE) -> np.ndarray:
+        """ Get the contiguous volume (slices, h, w) of the given plane and method """
+        key = (case, plane, method)
+        if method != "original" and key not in self.store:
+            key = (case, plane, "original")
+        return self.store.get(key)
     
     def clear_res_dict(self) -> None:
         """ 
-        This function will clear the result dictionary.
-        It will be called when the client want to set result dictionary by new data.
+        This function will clear every stored volume.
         """
-        self.__res_dict.clear()
+        self.store.clear()
+        self.__predictions.clear()
         
-    def clear_res_dict_by_plane(self, plane: str) -> None:
+    def clear_res_dict_by_plane(self, plane: str, case: str = DEFAULT_CASE) -> None:
         """ 
-        This function will clear the result dictionary by the given key.
-        It will be called when the client want to set result dictionary by new data.
+        This function will clear the volumes of the given case and plane.
+        It will be called when the client want to set result by new data.
         """
-        del self.__res_dict[plane]
+        for key in self.store.keys():
+            if key[:2] == (case, plane):
+                self.store.delete(key)
+        self.__predictions.pop((case, plane), None)
+        
+    def open(self) -> None:
+        """ Called at startup """
+        self.store.attach()
+        
+    def close(self) -> None:
+        """ Called at shutdown: the volumes are removed unless another worker still uses them """
+        if self.store.detach():
+            self.__predictions.clear()
         
     def is_empty(self) -> bool:
-        """ Check if the result dictionary is empty """
-        return len(self.__res_dict) == 0
-    
-    def set_res_dict(self, np_img: np.ndarray, plane: str) -> None:
-        if self.__res_dict.get(plane, -1) != -1:
-            print("The result dictionary is not empty. Auto Removing...")
-            self.clear_res_dict_by_plane(plane)
-        print(np_img.shape)
-        _plane_dict=  {}
-        for i in range(np_img.shape[0]):
-            _plane_dict[i] = {
-                "original": np_img[i, :, :],
-                "gradcam": np_img[i, :, :]
-            }
+        """ Check if the store is empty """
+        return len(self.store.keys()) == 0
+    
+    def set_res_dict(self, np_img: np.ndarray, plane: str, case: str = DEFAULT_CASE) -> None:
+        """ 
+        The original volume is replaced at once, so a reader (or another worker) never finds it missing,
+        then the results derived from the former volume are dropped.
+        """
+        self.store.put((case, plane, "original"), np_img)
+        for key in self.store.keys():
+            if key[:2] == (case, plane) and key[2] != "original":
+                self.store.delete(key)
+        self.__predictions.pop((case, plane), None)
+        
+    def set_prediction(self, prediction: dict | None, plane: str, case: str = DEFAULT_CASE) -> None:
+        self.__predictions[(case, plane)] = prediction
         
-        self.__res_dict[plane] = _plane_dict
+    def get_prediction(self, plane: str, case: str = DEFAULT_CASE) -> dict | None:
+        """ Raise KeyError when the case and plane were not uploaded """
+        return self.__predictions[(case, plane)]
 
 
 ###################################################################
-# Inference Model
-class MRIKneePredictor:
-    pass
+# Streaming .npy upload.
+def parse_npy_header(data: bytes) -> tuple | None:
+    """ 
+    Parse the .npy header from the first bytes of an upload.
+    Return (shape, fortran_order, dtype, data_offset), or None when more bytes are needed.
+    Raise ValueError when it is not a .npy file.
+    """
+    if len(data) < 8:
+        return None
+    stream = io.BytesIO(data)
+    version = np.lib.format.read_magic(stream)
+    hlen_size = 2 if version == (1, 0) else 4
+    if len(data) < 8 + hlen_size:
+        return None
+    offset = 8 + hlen_size + int.from_bytes(data[8:8 + hlen_size], "little")
+    if len(data) < offset:
+        return None
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    return shape, fortran_order, dtype, offset
 
 
+class NpyStreamReader:
+    """ 
+    This Class receives a .npy upload chunk by chunk.
+    The header is parsed as soon as it arrives, so a wrong file is rejected before the body is read,
+    and the data chunks are copied straight into the preallocated volume (no temp copy of the whole body).
+    """
+    def __init__(self):
+        self.head = bytearray()
+        self.volume = None
+        self.buffer = None
+        self.received = 0
+        
+    def feed(self, chunk: bytes) -> None:
+        if self.volume is None:
+            self.head += chunk
+            header = parse_npy_header(bytes(self.head))
+            if header is None:
+                return
+            shape, fortran_order, dtype, offset = header
+            if len(shape) != 3 or dtype.hasobject:
+                raise ValueError(f"Expected a (slices, h, w) volume, got shape={shape}, dtype={dtype}")
+            self.volume = np.empty(shape, dtype=dtype, order="F" if fortran_order else "C")
+            self.buffer = self.volume.reshape(-1, order="A").view(np.uint8)
+            chunk = bytes(self.head[offset:])
+            self.head = None
+        
+        end = self.received + len(chunk)
+        if end > self.buffer.shape[0]:
+            raise ValueError("The upload is larger than the .npy header says")
+        self.buffer[self.received:end] = np.frombuffer(chunk, dtype=np.uint8)
+        self.received = end
+        
+    def result(self) -> np.ndarray:
+        if self.volume is None or self.received != self.buffer.shape[0]:
+            raise ValueError("The upload ended before the whole volume was received")
+        return np.ascontiguousarray(self.volume)
+
+
+def load_npy_file(file) -> np.ndarray:
+    """ Parse a spooled multipart upload (called on the ingest pool) """
+    reader = NpyStreamReader()
+    while chunk := file.read(UPLOAD_CHUNK_SIZE):
+        reader.feed(chunk)
+    return reader.result()
+
+
+###################################################################
+# Lazy Grad-CAM.
+class GradCamCache:
+    """ 
+    This Class computes the Grad-CAM of a slice the first time it is requested.
+    
+    Results are kept in a bounded LRU keyed by (case, plane, idx, model version).
+    Concurrent requests for the same key wait for one shared computation,
+    and the neighbouring slices are computed speculatively in the background.
+    The results of a case and plane are dropped when its stored volume changes,
+    which also catches an upload to another worker sharing the store.
+    """
+    def __init__(self, predictor: MRIKneePredictor, controller: "Controller", capacity: int = DEFAULT_GRADCAM_CACHE):
+        self.predictor = predictor
+        self.controller = controller
+        self.capacity = capacity
+        self.__cache = OrderedDict()
+        self.__pending = {}
+        self.__ranges = {}
+        self.__generations = {}
+        self.__background = set()
+        self.__sources = {}
+        self.hits = 0
+        self.misses = 0
+        
+    def is_enabled(self) -> bool:
+        return self.predictor.enabled
+        
+    def invalidate(self, plane: str, case: str) -> None:
+        """ Drop every result of the case and plane (called when it is uploaded again) """
+        for key in [key for key in self.__cache if key[:2] == (case, plane)]:
+            del self.__cache[key]
+        self.__ranges.pop((case, plane), None)
+        self.__sources.pop((case, plane), None)
+        # results of the former upload which are still being computed must not be cached
+        self.__generations[(case, plane)] = self.__generations.get((case, plane), 0) + 1
+        
+    async def get(self, plane: str, idx: int, case: str) -> np.ndarray:
+        volume = self.controller.get_volume(plane, "original", case)
+        source = self.__sources.get((case, plane))
+        if source is None or source() is not volume:
+            self.invalidate(plane, case)
+            self.__sources[(case, plane)] = weakref.ref(volume)
+        key = (case, plane, idx, self.predictor.model_version)
+        img = self.__cache.get(key)
+        if img is not None:
+            self.__cache.move_to_end(key)
+            self.hits += 1
+            return img
+        
+        future = self.__pending.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self.__compute(key))
+            self.__pending[key] = future
+            future.add_done_callback(lambda _: self.__pending.pop(key, None))
+        return await asyncio.shield(future)
+    
+    def prefetch(self, plane: str, idx: int, case: str, radius: int = 2) -> None:
+        """ Start computing the neighbours of idx, if they are not cached or pending """
+        length = self.controller.get_volume(plane, "original", case).shape[0]
+        for i in range(max(idx - radius, 0), min(idx + radius + 1, length)):
+            key = (case, plane, i, self.predictor.model_version)
+            if key in self.__cache or key in self.__pending:
+                continue
+            task = asyncio.ensure_future(self.get(plane, i, case))
+            self.__background.add(task)
+            task.add_done_callback(self.__background.discard)
+    
+    async def __compute(self, key: tuple) -> np.ndarray:
+        case, plane, idx, _ = key
+        generation = self.__generations.get((case, plane), 0)
+        volume = self.controller.get_volume(plane, "original", case)
+        lo_hi = self.__ranges.get((case, plane))
+        if lo_hi is None:
+            lo_hi = (float(volume.min()), float(volume.max()))
+            self.__ranges[(case, plane)] = lo_hi
+        img = await self.predictor.saliency(np.asarray(volume[idx]), *lo_hi)
+        if img is None:
+            img = volume[idx]
+        if generation != self.__generations.get((case, plane), 0):
+            return img
+        self.__cache[key] = img
+        while len(self.__cache) > self.capacity:
+            self.__cache.popitem(last=False)
+        return img
+
+
+###################################################################
+# Reslicing (MPR).
+class ResliceCache:
+    """ 
+    This Class keeps one Reslicer (with its sampled slices) per recently resliced volume.
+    A reslicer is made again when the stored volume changes (new upload or spilled to disk).
+    """
+    def __init__(self, capacity: int = DEFAULT_RESLICE_VOLUMES):
+        self.capacity = capacity
+        self.__reslicers = OrderedDict()
+        self.__lock = threading.Lock()
+        
+    def get(self, key: tuple, volume: np.ndarray) -> Reslicer:
+        with self.__lock:
+            reslicer = self.__reslicers.get(key)
+            if reslicer is None or reslicer.volume is not volume:
+                reslicer = Reslicer(volume)
+                self.__reslicers[key] = reslicer
+            self.__reslicers.move_to_end(key)
+            while len(self.__reslicers) > self.capacity:
+                self.__reslicers.popitem(last=False)
+            return reslicer
+    
+    def invalidate(self, plane: str, case: str) -> None:
+        with self.__lock:
+            for key in [key for key in self.__reslicers if key[:2] == (case, plane)]:
+                del self.__reslicers[key]
+
+
+###################################################################
+# Metrics.
+# stage timings of the request being handled (set by TimingMiddleware)
+_stage_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+class Metrics:
+    """ 
+    This Class keeps the request and stage timings of the backend as histograms
+    and renders them with the other gauges in the Prometheus text format (/metrics).
+    
+    Stages: upload_read, np_load (parsing the .npy or DICOM upload), store, inference, reslice,
+    encode (binary / PNG / DICOM body) and serialize (JSON body).
+    """
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    HELP = {
+        "mri_request_seconds": "Time to the first byte of the response by handler",
+        "mri_stage_seconds": "Time spent in each stage of the requests",
+        "mri_requests_total": "Requests by handler and status",
+    }
+    
+    def __init__(self):
+        self.__histograms = {}
+        self.__counters = {}
+        self.__lock = threading.Lock()
+        
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+            histogram[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+            
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+            
+    def record_stage(self, stage: str, seconds: float) -> None:
+        self.observe("mri_stage_seconds", seconds, stage=stage)
+        timings = _stage_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+            
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started)
+    
+    @staticmethod
+    def format_labels(labels: tuple, extra: str = "") -> str:
+        items = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+        return "{" + ",".join(items) + "}" if items else ""
+    
+    def render(self, gauges: dict) -> str:
+        """ gauges: {name: (type, help, value)} read at scrape time """
+        with self.__lock:
+            histograms = {key: ([*h[0]], h[1]) for key, h in self.__histograms.items()}
+            counters = dict(self.__counters)
+        
+        lines, described = [], set()
+        
+        def describe(name: str, kind: str, help: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+        
+        for (name, labels), (counts, total) in sorted(histograms.items()):
+            describe(name, "histogram", self.HELP.get(name, name))
+            cumulative = 0
+            for le, count in zip(self.BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                bucket = f'le="{le}"'
+                lines.append(f"{name}_bucket{self.format_labels(labels, bucket)} {cumulative}")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {cumulative}")
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, "counter", self.HELP.get(name, name))
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        for name, (kind, help, value) in gauges.items():
+            describe(name, kind, help)
+            lines.append(f"{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class TimingMiddleware:
+    """ 
+    ASGI middleware timing every HTTP request to its first response byte, by handler.
+    The stages recorded by the handler are collected for the request, and with "X-Profile: 1"
+    (or MRI_PROFILE=1) they are sent back in a Server-Timing header.
+    The body of a streamed response is not included in the timing.
+    """
+    def __init__(self, app):
+        self.app = app
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = PROFILE_ALL or (b"x-profile", b"1") in scope.get("headers", [])
+        timings = []
+        token = _stage_timings.set(timings)
+        started = time.perf_counter()
+        
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+                metrics.observe("mri_request_seconds", elapsed, handler=handler)
+                metrics.inc("mri_requests_total", handler=handler, status=message["status"])
+                if profile:
+                    stages = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings]
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", ", ".join(stages + [f"total;dur={elapsed * 1000:.3f}"])
+                    )
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _stage_timings.reset(token)
+
 
 ###################################################################
 # Define return type.
@@ -100,9 +591,257 @@ class TestResult(BaseModel):
     idx: int
     method: str
 
+###################################################################
+# Slice encoding.
+RAW_MEDIA_TYPE = "application/octet-stream"
+PNG_MEDIA_TYPE = "image/png"
+DICOM_MEDIA_TYPE = "application/dicom"
+JSON_MEDIA_TYPE = "application/json"
+# a slice as JSON first, so a client sending no Accept header (or */*) keeps the nested list
+SLICE_MEDIA_TYPES = (JSON_MEDIA_TYPE, RAW_MEDIA_TYPE, PNG_MEDIA_TYPE)
+VOLUME_MEDIA_TYPES = (RAW_MEDIA_TYPE, DICOM_MEDIA_TYPE)
+
+
+def parse_accept(accept: str) -> list[tuple[str, float]]:
+    """ "image/png;q=0.5, */*" -> [("image/png", 0.5), ("*/*", 1.0)], in the order of the header """
+    ranges = []
+    for item in accept.split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        ranges.append((media_range.lower(), q))
+    return ranges
+
+
+def negotiate(accept: str, media_types: tuple) -> str | None:
+    """ 
+    The media type of media_types the Accept header prefers: the highest q, then the first in the header,
+    then the first of media_types. Each type takes the q of its most specific range (image/png, image/*, */*).
+    No header accepts anything. None when no type is acceptable (406).
+    """
+    ranges = parse_accept(accept)
+    if not ranges:
+        return media_types[0]
+    best, best_rank = None, None
+    for order, media_type in enumerate(media_types):
+        matches = [
+            (media_range.count("*"), position, q) for position, (media_range, q) in enumerate(ranges)
+            if media_range in (media_type, media_type.split("/")[0] + "/*", "*/*")
+        ]
+        if not matches:
+            continue
+        _, position, q = min(matches)
+        rank = (-q, position, order)
+        if q > 0 and (best_rank is None or rank < best_rank):
+            best, best_rank = media_type, rank
+    return best
+
+
+def encode_slice(img: np.ndarray, accept: str, accept_encoding: str = "") -> Response | None:
+    """ 
+    Encode a slice as a binary response chosen by the Accept header.
+    The pixel buffer is sent as it is, so the client can wrap it into a QImage
+    without building any python object per pixel.
+    Shape and dtype are sent by the X-Image-Shape / X-Image-Dtype headers.
+    Return None when the client prefers JSON (fallback), raise 406 when it accepts none of the three.
+    """
+    media_type = negotiate(accept, SLICE_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(SLICE_MEDIA_TYPES)}")
+    headers = {
+        "X-Image-Shape": ",".join(str(s) for s in img.shape),
+        "X-Image-Dtype": img.dtype.name,
+    }
+    if media_type == PNG_MEDIA_TYPE:
+        # OpenCV is only needed for PNG, so it is not imported at startup
+        import cv2
+
+        ok, buf = cv2.imencode(".png", img)
+        if not ok:
+            return None
+        return Response(buf.tobytes(), media_type=PNG_MEDIA_TYPE, headers=headers)
+    
+    if media_type == RAW_MEDIA_TYPE:
+        body = np.ascontiguousarray(img).data
+        if zstandard is not None and "zstd" in accept_encoding:
+            body = zstandard.ZstdCompressor(level=1).compress(body)
+            headers["Content-Encoding"] = "zstd"
+        return Response(bytes(body), media_type=RAW_MEDIA_TYPE, headers=headers)
+    return None
+
+
+def stream_volume(volume: np.ndarray, start: int = 0) -> StreamingResponse:
+    """ 
+    Stream a contiguous block of slices as raw bytes, one slice per chunk.
+    X-Image-Shape is the shape of the whole block and X-Slice-Start is the index of its first slice.
+    """
+    def iter_slices():
+        for i in range(volume.shape[0]):
+            yield np.ascontiguousarray(volume[i]).tobytes()
+    
+    headers = {
+        "X-Image-Shape": ",".join(str(s) for s in volume.shape),
+        "X-Image-Dtype": volume.dtype.name,
+        "X-Slice-Start": str(start),
+        "Content-Length": str(volume.nbytes),
+    }
+    return StreamingResponse(iter_slices(), media_type=RAW_MEDIA_TYPE, headers=headers)
+
+
+def encode_dicom(volume: np.ndarray) -> bytes:
+    """ The volume as one multi-frame DICOM with its own bit depth (called on the ingest pool) """
+    buf = io.BytesIO()
+    write_dicom(volume, buf)
+    return buf.getvalue()
+
+
+###################################################################
+# Slice push over WebSocket (frames: src/stream_frame.py).
+def get_push_order(idx: int, length: int, radius: int) -> list:
+    """ idx, idx + 1, idx - 1, idx + 2, ... within the radius and the volume """
+    order = [idx] + [i for d in range(1, radius + 1) for i in (idx + d, idx - d)]
+    return [i for i in order if 0 <= i < length]
+
+
+class SlicePushSession:
+    """ 
+    This Class pushes the slices of one subscribed (case, plane, method) over a WebSocket.
+    
+    The client sends JSON messages:
+        {"type": "subscribe", "case": "0000", "plane": "sagittal", "method": "original", "idx": 0}
+        {"type": "cursor", "idx": 12}
+        {"type": "ack", "count": 1}
+    and gets a "subscribed" message (length, shape, dtype), then binary frames (encode_frame)
+    of the cursor slice and its neighbours, nearest first.
+    A cursor update replaces the queue, so the frames queued for the former cursor are dropped,
+    and a slice is sent once per subscription (the client keeps it).
+    At most `window` frames are sent without an ack, so a slow client is never flooded
+    with frames that are stale by the time they arrive.
+    """
+    def __init__(self, websocket: WebSocket, radius: int = DEFAULT_PUSH_RADIUS, window: int = DEFAULT_PUSH_WINDOW):
+        self.websocket = websocket
+        self.radius = radius
+        self.window = window
+        self.subscription = 0
+        self.key = None
+        self.credits = window
+        self.queue = []
+        self.sent = set()
+        self.wakeup = asyncio.Event()
+        
+    async def run(self) -> None:
+        tasks = [asyncio.ensure_future(self.receive_messages()), asyncio.ensure_future(self.send_frames())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and not isinstance(task.exception(), WebSocketDisconnect):
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def send_error(self, detail: str) -> None:
+        await self.websocket.send_json({"type": "error", "detail": detail})
+        
+    async def receive_messages(self) -> None:
+        while True:
+            try:
+                message = await self.websocket.receive_json()
+            except (KeyError, TypeError, ValueError):
+                # a binary message has no "text" (KeyError) or None (TypeError)
+                await self.send_error("Messages must be JSON")
+                continue
+            if not isinstance(message, dict):
+                await self.send_error("Messages must be JSON objects")
+                continue
+            try:
+                await self.handle(message)
+            except (KeyError, TypeError, ValueError) as e:
+                await self.send_error(f"Bad {message.get('type')} message: {e!r}")
+                
+    async def handle(self, message: dict) -> None:
+        kind = message["type"]
+        if kind == "subscribe":
+            key = (str(message["case"]), str(message["plane"]), str(message.get("method", "original")))
+            idx = int(message.get("idx", 0))
+            try:
+                volume = controller.get_volume(key[1], key[2], key[0])
+            except KeyError:
+                await self.send_error(f"No {key[2]} volume for case={key[0]}, plane={key[1]}")
+                return
+            self.subscription += 1
+            self.key = key
+            self.credits = self.window
+            self.queue = []
+            self.sent = set()
+            await self.websocket.send_json({
+                "type": "subscribed", "subscription": self.subscription, "length": volume.shape[0],
+                "shape": list(volume.shape), "dtype": volume.dtype.str,
+            })
+            self.set_cursor(idx, volume.shape[0])
+        elif kind == "cursor":
+            if self.key is None:
+                await self.send_error("Subscribe before moving the cursor")
+                return
+            case, plane, method = self.key
+            self.set_cursor(int(message["idx"]), controller.get_volume(plane, method, case).shape[0])
+        elif kind == "ack":
+            self.credits = min(self.credits + int(message.get("count", 1)), self.window)
+            self.wakeup.set()
+        else:
+            await self.send_error(f"Unknown message type: {kind}")
+            
+    def set_cursor(self, idx: int, length: int) -> None:
+        self.queue = [i for i in get_push_order(idx, length, self.radius) if i not in self.sent]
+        self.wakeup.set()
+        
+    async def get_slice(self, idx: int) -> np.ndarray:
+        case, plane, method = self.key
+        if method == "gradcam" and gradcam_cache.is_enabled():
+            return await gradcam_cache.get(plane, idx, case)
+        return controller.get_volume(plane, method, case)[idx]
+    
+    async def send_frames(self) -> None:
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.queue and self.credits > 0:
+                idx = self.queue.pop(0)
+                subscription = self.subscription
+                try:
+                    img = await self.get_slice(idx)
+                except KeyError:
+                    self.queue = []
+                    await self.send_error(f"The volume of case={self.key[0]}, plane={self.key[1]} was removed")
+                    break
+                if subscription != self.subscription:
+                    # subscribed to another volume while the slice was computed
+                    continue
+                self.sent.add(idx)
+                self.credits -= 1
+                with metrics.stage("encode"):
+                    frame = encode_frame(subscription, idx, img)
+                await self.websocket.send_bytes(frame)
+
+
 ###################################################################
 app = FastAPI()
 controller = Controller()
+metrics = Metrics()
+predictor = MRIKneePredictor()
+gradcam_cache = GradCamCache(predictor, controller)
+reslice_cache = ResliceCache()
+# parsing and storing uploads run here, so the event loop keeps serving /result
+ingest_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="ingest")
 
 # CORS 설정 추가
 origins = ["*"]  # 또는 필요한 도메인 리스트
@@ -113,30 +852,261 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TimingMiddleware)
+startup_timer.mark("app")
+
+
+@app.on_event("startup")
+async def start_predictor() -> None:
+    controller.open()
+    predictor.start()
+    startup_timer.mark("startup (time-to-ready)")
+    startup_timer.report()
+
+
+@app.on_event("shutdown")
+async def remove_spilled_volumes() -> None:
+    await predictor.stop()
+    ingest_pool.shutdown(wait=False, cancel_futures=True)
+    controller.close()
 
 
+def get_volume_or_404(plane: str, method: str, case: str) -> np.ndarray:
+    try:
+        return controller.get_volume(plane, method, case)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No {method} volume for case={case}, plane={plane}")
+
+
+async def receive_volume(request: Request) -> np.ndarray:
+    """ 
+    Read the uploaded volume without blocking the event loop.
+    application/octet-stream: the raw .npy body is parsed while it is streamed.
+    application/dicom: the body is spooled (to disk when large) and parsed on the ingest pool.
+    multipart/form-data ("file" field): starlette spools it to a temp file, and it is parsed on the ingest pool
+    (as DICOM when the file name or type says so).
+    The stored bit depth of the upload is kept.
+    """
+    loop = asyncio.get_running_loop()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            with metrics.stage("upload_read"):
+                form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise ValueError("The multipart body has no file field")
+            with metrics.stage("np_load"):
+                if upload.content_type == DICOM_MEDIA_TYPE or is_dicom_path(upload.filename or ""):
+                    return await loop.run_in_executor(ingest_pool, read_dicom_bytes, upload.file)
+                return await loop.run_in_executor(ingest_pool, load_npy_file, upload.file)
+
+        if content_type.startswith(DICOM_MEDIA_TYPE):
+            with tempfile.SpooledTemporaryFile(max_size=64 * UPLOAD_CHUNK_SIZE) as spool:
+                with metrics.stage("upload_read"):
+                    async for chunk in request.stream():
+                        spool.write(chunk)
+                spool.seek(0)
+                with metrics.stage("np_load"):
+                    return await loop.run_in_executor(ingest_pool, read_dicom_bytes, spool)
+
+        # the body is parsed while it is received, so the parsing time is taken out of the read time
+        reader = NpyStreamReader()
+        started, parse_time = time.perf_counter(), 0.0
+        async for chunk in request.stream():
+            if chunk:
+                parse_started = time.perf_counter()
+                reader.feed(chunk)
+                parse_time += time.perf_counter() - parse_started
+        volume = reader.result()
+        metrics.record_stage("upload_read", time.perf_counter() - started - parse_time)
+        metrics.record_stage("np_load", parse_time)
+        return volume
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def get_gradcam_volume(plane: str, start: int, stop: int, case: str) -> np.ndarray:
+    slices = await asyncio.gather(*[gradcam_cache.get(plane, i, case) for i in range(start, stop)])
+    if not slices:
+        return get_volume_or_404(plane, "original", case)[start:stop]
+    return np.stack(slices)
+
 
 @app.post("/preprocess") 
-async def preprocess(file: UploadFile = File(...), plane: str = "sagittal") -> dict:        
-    np_array = np.load(file.file)
-    # add model inference
+async def preprocess(request: Request, plane: str = "sagittal", case: str = DEFAULT_CASE) -> dict:        
+    np_array = await receive_volume(request)
+    loop = asyncio.get_running_loop()
+    with metrics.stage("store"):
+        await loop.run_in_executor(ingest_pool, controller.set_res_dict, np_array, plane, case)
+    gradcam_cache.invalidate(plane, case)
+    reslice_cache.invalidate(plane, case)
     
-    controller.set_res_dict(np_array, plane)
-    print(controller.get_res_dict())
-    return {"length": np_array.shape[0]}
+    with metrics.stage("inference"):
+        prediction = await predictor.predict(np_array)
+    controller.set_prediction(prediction, plane, case)
+    return {"length": np_array.shape[0], "case": case, "prediction": prediction}
+
+
+@app.get("/prediction/{plane}")
+async def get_prediction(plane: str, case: str = DEFAULT_CASE) -> dict:
+    """ Return the prediction of the uploaded volume (null when no model is loaded) """
+    try:
+        return {"case": case, "plane": plane, "prediction": controller.get_prediction(plane, case)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No volume for case={case}, plane={plane}")
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """ Request/stage timings, volume store and cache statistics in the Prometheus text format """
+    store = controller.store.stats()
+    store_reads = store["hits"] + store["spill_hits"]
+    gradcam_reads = gradcam_cache.hits + gradcam_cache.misses
+    gauges = {
+        "mri_store_memory_bytes": ("gauge", "Bytes of the volumes held in memory", store["memory_bytes"]),
+        "mri_store_memory_budget_bytes": ("gauge", "Memory budget of the volume store", store["memory_budget_bytes"]),
+        "mri_store_memory_volumes": ("gauge", "Volumes held in memory", store["memory_volumes"]),
+        "mri_store_spilled_volumes": ("gauge", "Volumes spilled to memory-mapped files", store["spilled_volumes"]),
+        "mri_store_hits_total": ("counter", "Reads served from memory", store["hits"]),
+        "mri_store_spill_hits_total": ("counter", "Reads served from a spilled volume", store["spill_hits"]),
+        "mri_store_misses_total": ("counter", "Reads of a volume which is not stored", store["misses"]),
+        "mri_store_hit_ratio": (
+            "gauge", "Share of the reads served from memory", store["hits"] / store_reads if store_reads else 0.0
+        ),
+        "mri_gradcam_cache_hits_total": ("counter", "Grad-CAM slices served from the cache", gradcam_cache.hits),
+        "mri_gradcam_cache_misses_total": ("counter", "Grad-CAM slices computed", gradcam_cache.misses),
+        "mri_gradcam_cache_hit_ratio": (
+            "gauge", "Share of the Grad-CAM slices served from the cache",
+            gradcam_cache.hits / gradcam_reads if gradcam_reads else 0.0
+        ),
+    }
+    for key, value in predictor.stats().items():
+        gauges[f"mri_inference_{key}"] = ("gauge", f"Inference engine {key}", value)
+    return Response(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/inference/stats")
+async def get_inference_stats() -> dict:
+    """ Throughput and p50/p95 latency per volume of the inference engine """
+    return predictor.stats()
 
 
 @app.get("/result/{plane}/{idx}/{method}", response_model=ResultItem)
-async def get_result_by_idx(plane: str, idx: int, method: str) -> ResultItem:
+async def get_result_by_idx(request: Request, plane: str, idx: int, method: str, case: str = DEFAULT_CASE) -> ResultItem:
     """ 
     This function will return the result by the given index and method.
     Please note that the result is a dictionary, so the client can get the result by call function get_res_dict_item_by_key.
+    
+    Send "Accept: application/octet-stream" (raw buffer) or "Accept: image/png" 
+    to get the slice as binary instead of the JSON nested list.
+    
+    "gradcam" is computed on the first request (and its neighbours in the background) when a model is loaded.
     """
-    res_item = controller.get_res_dict_item(plane, idx, method)
-    return { 
-        "img": res_item.tolist(),
-    }
+    volume = get_volume_or_404(plane, method, case)
+    if not 0 <= idx < volume.shape[0]:
+        raise HTTPException(status_code=404, detail=f"Index {idx} is out of range")
+    if method == "gradcam" and gradcam_cache.is_enabled():
+        with metrics.stage("inference"):
+            res_item = await gradcam_cache.get(plane, idx, case)
+        gradcam_cache.prefetch(plane, idx, case)
+    else:
+        res_item = volume[idx]
+    with metrics.stage("encode"):
+        response = encode_slice(
+            res_item, 
+            request.headers.get("accept", ""), 
+            request.headers.get("accept-encoding", "")
+        )
+    if response is not None:
+        return response
+    # the nested list is rendered here once, instead of being validated again by the response model
+    with metrics.stage("serialize"):
+        return JSONResponse({ 
+            "img": res_item.tolist(),
+        })
+
+
+@app.get("/reslice/{plane}")
+async def get_reslice(
+    request: Request, plane: str, idx: int | None = None, yaw: float = 0.0, pitch: float = 0.0,
+    method: str = "original", case: str = DEFAULT_CASE
+):
+    """ 
+    Return one slice of the volume resliced at (yaw, pitch) degrees (multiplanar reformatting).
+    0 / 0 is the stored axis, pitch 90 and yaw 90 are the two other axes, anything else is oblique.
+    idx defaults to the middle slice, and X-Slice-Count (or "length") is the number of slices at that orientation.
+    The body is negotiated by the Accept header like /result.
+    """
+    volume = get_volume_or_404(plane, method, case)
+    reslicer = reslice_cache.get((case, plane, method), volume)
+    loop = asyncio.get_running_loop()
+    with metrics.stage("reslice"):
+        length = await loop.run_in_executor(ingest_pool, reslicer.get_length, yaw, pitch)
+        idx = length // 2 if idx is None else idx
+        if not 0 <= idx < length:
+            raise HTTPException(status_code=404, detail=f"Index {idx} is out of range")
+        img = await loop.run_in_executor(ingest_pool, reslicer.get_slice, yaw, pitch, idx)
+    with metrics.stage("encode"):
+        response = encode_slice(img, request.headers.get("accept", ""), request.headers.get("accept-encoding", ""))
+    if response is not None:
+        response.headers["X-Slice-Count"] = str(length)
+        return response
+    with metrics.stage("serialize"):
+        return JSONResponse({"img": img.tolist(), "length": length})
+
+
+@app.get("/volume/{plane}")
+async def get_volume(
+    request: Request, plane: str, method: str = "original", case: str = DEFAULT_CASE
+) -> StreamingResponse:
+    """ Return every slice of the given plane in one raw response (or one DICOM by Accept: application/dicom) """
+    volume = get_volume_or_404(plane, method, case)
+    if method == "gradcam" and gradcam_cache.is_enabled():
+        with metrics.stage("inference"):
+            volume = await get_gradcam_volume(plane, 0, volume.shape[0], case)
+    media_type = negotiate(request.headers.get("accept", ""), VOLUME_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(VOLUME_MEDIA_TYPES)}")
+    if media_type == DICOM_MEDIA_TYPE:
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.stage("encode"):
+                body = await loop.run_in_executor(ingest_pool, encode_dicom, volume)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return Response(body, media_type=DICOM_MEDIA_TYPE)
+    return stream_volume(volume)
+
+
+@app.get("/slices/{plane}")
+async def get_slices(
+    plane: str, start: int = 0, stop: int | None = None, 
+    method: str = "original", case: str = DEFAULT_CASE
+) -> StreamingResponse:
+    """ Return the slices [start, stop) of the given plane in one raw response """
+    volume = get_volume_or_404(plane, method, case)
+    start = max(start, 0)
+    stop = max(start, volume.shape[0] if stop is None else min(stop, volume.shape[0]))
+    if method == "gradcam" and gradcam_cache.is_enabled():
+        return stream_volume(await get_gradcam_volume(plane, start, stop, case), start)
+    return stream_volume(volume[start:stop], start)
+
+
+@app.websocket("/stream")
+async def stream_slices(websocket: WebSocket) -> None:
+    """ Push the slices around the client's cursor (see SlicePushSession) instead of one GET per slice """
+    await websocket.accept()
+    await SlicePushSession(websocket).run()
     
     
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=8000)
\ No newline at end of file
+    import uvicorn
+
+    # MRI_WORKERS=4 python backend.py: one process per worker, sharing the volumes by a tmpfs
+    workers = int(os.environ.get("MRI_WORKERS", 1))
+    if workers > 1:
+        os.environ.setdefault("MRI_SHARED_STORE_DIR", get_default_shared_dir())
+        uvicorn.run("backend:app", host="localhost", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="localhost", port=8000)
\ No newline at end of file
@@ -0,0 +1,285 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+from src.catalog import PLANES
+from src.label_index import TASKS
+
+
+# MRNet series are 256 x 256 uint8 with 17 to 61 slices per plane
+DEFAULT_SLICES = (24, 36, 48)
+IMAGE_SIZE = 256
+RESULT_FORMATS = {
+    "json": {},
+    "raw": {"Accept": "application/octet-stream"},
+    "png": {"Accept": "image/png"},
+}
+
+
+def make_volume(num_slices: int, seed: int = 0, dtype: str = "uint8") -> np.ndarray:
+    """ A synthetic series: smooth anatomy-like blobs plus noise, so PNG/zstd sizes are realistic """
+    rng = np.random.default_rng(seed)
+    z, y, x = np.meshgrid(
+        np.linspace(-1, 1, num_slices), np.linspace(-1, 1, IMAGE_SIZE), np.linspace(-1, 1, IMAGE_SIZE),
+        indexing="ij", sparse=True
+    )
+    volume = np.zeros((num_slices, IMAGE_SIZE, IMAGE_SIZE), dtype=np.float32)
+    for _ in range(6):
+        cz, cy, cx = rng.uniform(-0.6, 0.6, 3)
+        r = rng.uniform(0.2, 0.5)
+        volume += np.exp(-((z - cz) ** 2 + (y - cy) ** 2 + (x - cx) ** 2) / (2 * r ** 2))
+    volume += rng.normal(0, 0.05, volume.shape).astype(np.float32)
+    info = np.iinfo(dtype)
+    volume = (volume - volume.min()) / (volume.max() - volume.min()) * info.max
+    return volume.astype(dtype)
+
+
+def percentiles(samples: list) -> dict:
+    """ Summary of latencies in milliseconds """
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": int(ms.size), "mean_ms": float(ms.mean()), "p50_ms": float(p50),
+            "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+
+def get_git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+###################################################################
+# Backend: in-process ASGI client, no network.
+async def bench_backend(volumes: dict, num_clients: int, num_requests: int) -> dict:
+    import httpx
+    import backend
+
+    await backend.app.router.startup()
+    transport = httpx.ASGITransport(app=backend.app)
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            bodies = {}
+            for key, volume in volumes.items():
+                buf = io.BytesIO()
+                np.save(buf, volume)
+                bodies[key] = buf.getvalue()
+
+            # every upload at once, num_clients at a time
+            semaphore = asyncio.Semaphore(num_clients)
+            latencies = []
+
+            async def upload(key):
+                case, plane = key
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/preprocess", params={"case": case, "plane": plane}, content=bodies[key],
+                        headers={"Content-Type": "application/octet-stream"}
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*[upload(key) for key in volumes])
+            elapsed = time.perf_counter() - started
+            num_slices = sum(v.shape[0] for v in volumes.values())
+            results["preprocess"] = {
+                "volumes_per_s": len(volumes) / elapsed,
+                "slices_per_s": num_slices / elapsed,
+                "mb_per_s": sum(len(b) for b in bodies.values()) / elapsed / 2**20,
+                **percentiles(latencies),
+            }
+
+            # random slices, num_clients concurrent clients each sending num_requests requests
+            rng = random.Random(0)
+            keys = list(volumes)
+            for name, headers in RESULT_FORMATS.items():
+                latencies, sizes = [], []
+
+                async def fetch_slices():
+                    for _ in range(num_requests):
+                        case, plane = rng.choice(keys)
+                        idx = rng.randrange(volumes[(case, plane)].shape[0])
+                        started = time.perf_counter()
+                        response = await client.get(
+                            f"/result/{plane}/{idx}/original", params={"case": case}, headers=headers
+                        )
+                        response.raise_for_status()
+                        latencies.append(time.perf_counter() - started)
+                        sizes.append(len(response.content))
+
+                started = time.perf_counter()
+                await asyncio.gather(*[fetch_slices() for _ in range(num_clients)])
+                elapsed = time.perf_counter() - started
+                results[f"result_{name}"] = {
+                    "requests_per_s": len(latencies) / elapsed,
+                    "payload_bytes": float(np.mean(sizes)),
+                    **percentiles(latencies),
+                }
+    finally:
+        await backend.app.router.shutdown()
+    return results
+
+
+###################################################################
+# Viewer: offscreen Qt, local ImageLabel / MainWindow.
+def write_dataset(dataset_root: str, volumes: dict) -> list:
+    """ ${DATASET_ROOT}/train/<plane>/<case>.npy and the label csvs. Return the series paths. """
+    paths = []
+    for (case, plane), volume in volumes.items():
+        plane_dir = os.path.join(dataset_root, "train", plane)
+        os.makedirs(plane_dir, exist_ok=True)
+        paths.append(os.path.join(plane_dir, f"{case}.npy"))
+        np.save(paths[-1], volume)
+    cases = sorted({case for case, _ in volumes})
+    for task in TASKS:
+        with open(os.path.join(dataset_root, f"train_{task}.csv"), "w") as f:
+            f.writelines(f"{case},{i % 2}\n" for i, case in enumerate(cases))
+    return paths
+
+
+def bench_viewer(volumes: dict, work_dir: str) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from src.main_window import MainWindow
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    dataset_root = os.path.join(work_dir, "dataset")
+    paths = write_dataset(dataset_root, volumes)
+
+    window = MainWindow()
+    window.show()
+    label = window.original_label
+    finished = []
+    label.file_info.connect(lambda info: finished.append(time.perf_counter()))
+
+    def wait(condition, timeout: float = 60.0) -> None:
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("The viewer did not respond in time")
+            app.processEvents()
+
+    # drop to file_info (conversion + label lookup), first without and then with an up-to-date cache
+    results = {}
+    for name in ("preprocess_cold", "preprocess_warm"):
+        latencies = []
+        for path in paths:
+            finished.clear()
+            started = time.perf_counter()
+            label.preprocess(path)
+            wait(lambda: finished)
+            latencies.append(finished[0] - started)
+        results[name] = percentiles(latencies)
+
+    # set_img until the slice is painted, scrolling every slice of every series
+    painted = []
+
+    def record_paint():
+        painted.append(window.current_idx)
+    label.slice_painted.connect(record_paint)
+
+    latencies = []
+    for path in paths:
+        finished.clear()
+        label.preprocess(path)
+        wait(lambda: finished)
+        for idx in range(window.length):
+            painted.clear()
+            started = time.perf_counter()
+            window.current_idx = idx
+            window.set_img()
+            wait(lambda: idx in painted)
+            latencies.append(time.perf_counter() - started)
+    label.slice_painted.disconnect(record_paint)
+    results["set_img"] = percentiles(latencies)
+
+    window.close()
+    app.processEvents()
+    return results
+
+
+###################################################################
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """ Print every metric of both runs with its ratio (current / baseline) """
+    old, new = flatten(baseline.get("results", {})), flatten(current["results"])
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key] / old[key] if old[key] else float("nan")
+        print(f"{key:45s} {old[key]:12.3f} -> {new[key]:12.3f}  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend and the viewer with synthetic MRNet-size series")
+    parser.add_argument("--suites", nargs="+", default=["backend", "viewer"], choices=["backend", "viewer"])
+    parser.add_argument("--cases", type=int, default=4, help="synthetic cases, one series per plane each")
+    parser.add_argument("--slices", type=int, nargs="+", default=list(DEFAULT_SLICES))
+    parser.add_argument("--dtype", default="uint8", choices=["uint8", "uint16"])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients of the backend")
+    parser.add_argument("--requests", type=int, default=100, help="/result requests per client and format")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--baseline", default="", help="former benchmark.json to compare with")
+    args = parser.parse_args()
+
+    volumes = {
+        (f"{case:04d}", plane): make_volume(args.slices[(case + i) % len(args.slices)], case * 3 + i, args.dtype)
+        for case in range(args.cases) for i, plane in enumerate(PLANES)
+    }
+    report = {
+        "meta": {
+            "revision": get_git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    out_path = os.path.abspath(args.out)
+
+    if "backend" in args.suites:
+        report["results"]["backend"] = asyncio.run(bench_backend(volumes, args.clients, args.requests))
+    if "viewer" in args.suites:
+        with tempfile.TemporaryDirectory() as work_dir:
+            # the viewer cache is made in the temporary directory, not in the repository
+            os.environ["MRI_CACHE_ROOT"] = work_dir
+            report["results"]["viewer"] = bench_viewer(volumes, work_dir)
+
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
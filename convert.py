@@ -0,0 +1,116 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from src.catalog import SPLITS, PLANES
+from src.label_index import get_label_index
+from src.dicom_io import is_dicom_path, export_dicom
+from src.volume_store import (
+    SERIES_EXTENSIONS, build_pyramid, get_cache_path, get_cache_root, get_window_level,
+    is_cache_fresh, is_newer, open_series, read_series_header
+)
+
+
+def find_jobs(dataset_root: str, out_root: str, splits: list, planes: list, dicom: bool = False) -> list:
+    """
+    List (src_path, out_path) of every series under ${DATASET_ROOT}/{split}/{plane}.
+    out_path is the base path of the viewer cache (out_root/{split}_cache/{plane}/<case>.npy),
+    or the DICOM export of a .npy series (out_root/{split}/{plane}/<case>.dcm) when dicom is set.
+    """
+    jobs = []
+    for split in splits:
+        for plane in planes:
+            src_dir = os.path.join(dataset_root, split, plane)
+            if not os.path.isdir(src_dir):
+                continue
+            for file_name in sorted(os.listdir(src_dir)):
+                case_name, ext = os.path.splitext(file_name)
+                if dicom and ext == ".npy":
+                    out_path = os.path.join(out_root, split, plane, f"{case_name}.dcm")
+                elif not dicom and ext in SERIES_EXTENSIONS:
+                    out_path = get_cache_path(os.path.join(out_root, f"{split}_cache", plane), case_name)
+                else:
+                    continue
+                jobs.append((os.path.join(src_dir, file_name), out_path))
+    return jobs
+
+
+def is_up_to_date(src_path: str, out_path: str) -> bool:
+    """ The DICOM export is newer than the source with the same shape, or the viewer cache is fresh """
+    if not is_dicom_path(out_path):
+        return is_cache_fresh(src_path, out_path)
+    try:
+        return is_newer(out_path, src_path) and read_series_header(out_path)[0] == read_series_header(src_path)[0]
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def convert(src_path: str, out_path: str) -> tuple:
+    """ 
+    Run in a worker process: the DICOM export, or what the viewer reads at open time
+    (window/level histogram and thumbnail pyramid). Return (number of slices, bytes read)
+    """
+    if is_dicom_path(out_path):
+        num_slices, _ = export_dicom(src_path, out_path)
+    else:
+        volume = open_series(src_path)
+        num_slices = volume.shape[0]
+        build_pyramid(volume, get_window_level(volume, src_path, out_path), out_path)
+    return num_slices, os.path.getsize(src_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a whole dataset root into the viewer cache")
+    parser.add_argument("dataset_root", help="${DATASET_ROOT} with train/valid and the label csvs")
+    parser.add_argument("--cache-root", default=get_cache_root(), help="where train_cache/valid_cache are made")
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS), choices=SPLITS)
+    parser.add_argument("--planes", nargs="+", default=list(PLANES), choices=PLANES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="convert even the up-to-date series")
+    parser.add_argument("--dicom-out", default="", help="export every .npy series as multi-frame DICOM here instead")
+    args = parser.parse_args()
+
+    if args.dicom_out:
+        jobs = find_jobs(args.dataset_root, args.dicom_out, args.splits, args.planes, dicom=True)
+    else:
+        jobs = find_jobs(args.dataset_root, args.cache_root, args.splits, args.planes)
+    todo = [
+        job for job in jobs
+        if args.force or not is_up_to_date(*job)
+    ]
+    print(f"{len(jobs)} series found, {len(jobs) - len(todo)} up to date, {len(todo)} to convert")
+
+    started = time.perf_counter()
+    num_slices, num_bytes, failed = 0, 0, 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(convert, *job): job for job in todo}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                slices, size = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Failed to convert {futures[future][0]}: {e}")
+                continue
+            num_slices += slices
+            num_bytes += size
+    elapsed = time.perf_counter() - started
+
+    # the label index is built too: opening a series in the viewer then memory-maps it and reads the cache,
+    # with no histogram, pyramid or label pass
+    for split in ([] if args.dicom_out else args.splits):
+        get_label_index(args.dataset_root, split, os.path.join(args.cache_root, f"{split}_cache"))
+
+    if todo:
+        print(
+            "{} series ({} failed), {} slices in {:.1f}s: {:.1f} series/s, {:.0f} slices/s, {:.1f} MB/s".format(
+                len(todo), failed, num_slices, elapsed, (len(todo) - failed) / elapsed,
+                num_slices / elapsed, num_bytes / elapsed / 2**20
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
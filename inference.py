@@ -0,0 +1,273 @@
+import os
+import time
+import asyncio
+import importlib.util
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+TASKS = ("abnormal", "acl", "meniscus")
+
+DEFAULT_MODEL_PATH = os.environ.get("MRI_MODEL_PATH", "")
+DEFAULT_BATCH_SIZE = int(os.environ.get("MRI_BATCH_SIZE", 16))
+DEFAULT_NUM_WORKERS = int(os.environ.get("MRI_INFERENCE_WORKERS", 1))
+DEFAULT_NUM_THREADS = int(os.environ.get("MRI_INFERENCE_THREADS", 2))
+# how long the batcher waits for more slices (from any client) before running a partial batch
+MAX_BATCH_WAIT = 0.005
+
+
+###################################################################
+# Worker process.
+# The model is loaded once by the initializer and kept for the life of the process.
+_session = None
+
+
+def init_worker(model_path: str, num_threads: int) -> None:
+    global _session
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    options.inter_op_num_threads = 1
+    _session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+
+def get_batch_shape(model_shape: list, items: list, batch_size: int) -> tuple:
+    """
+    The (batch, c, h, w) shape of the tensor of items. A dim the model fixes (an int) is kept,
+    and the slices are resized to its h, w. A symbolic or unknown dim (a str or None) is taken from the batch:
+    batch_size, one channel, and the size of the first slice.
+    """
+    if len(model_shape) != 4:
+        raise ValueError(f"Expected a (batch, c, h, w) model input, got {model_shape}")
+    h, w = items[0][0].shape
+    shape = tuple(
+        dim if isinstance(dim, int) else default for dim, default in zip(model_shape, (batch_size, 1, h, w))
+    )
+    if len(items) > shape[0]:
+        raise ValueError(f"{len(items)} slices do not fit in the model batch of {shape[0]}")
+    return shape
+
+
+def run_batch(items: list, batch_size: int) -> list:
+    """
+    Pack the slices into one fixed-size (batch, c, h, w) float32 tensor and run the model.
+    items is a list of (slice, lo, hi), and lo/hi is the intensity range of its volume.
+    Return the per-slice outputs of every model output, in the order of items.
+    """
+    import cv2
+
+    model_input = _session.get_inputs()[0]
+    batch = np.zeros(get_batch_shape(model_input.shape, items, batch_size), dtype=np.float32)
+    h, w = batch.shape[2:]
+    for i, (img, lo, hi) in enumerate(items):
+        if img.shape != (h, w):
+            img = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
+        batch[i] = (img.astype(np.float32) - lo) / max(hi - lo, 1e-6)
+    outputs = _session.run(None, {model_input.name: batch})
+    return [[output[i] for output in outputs] for i in range(len(items))]
+
+
+###################################################################
+# Inference Model
+class MRIKneePredictor:
+    """
+    This Class predicts abnormal / acl / meniscus of a volume with an ONNX model on CPU.
+
+    Model contract: input (batch, c, h, w) float32 in [0, 1], first output (batch, 3) per-slice logits.
+    Dims of the input may be symbolic: they are then taken from the batch (get_batch_shape).
+    The volume prediction is sigmoid(max over slices), as MRNet does.
+    An optional second output (batch, 3, h', w') is the Grad-CAM map of each task,
+    which is used by saliency().
+
+    The slices of every pending request are put into one queue, and the batcher packs them
+    into fixed-size batches, so requests from several clients share a batch.
+    The batches run on a process pool whose workers keep the model loaded.
+    When no model (MRI_MODEL_PATH) or no onnxruntime is available, the predictor is disabled
+    and predict() returns None.
+    """
+    def __init__(
+        self, model_path: str = DEFAULT_MODEL_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+        num_workers: int = DEFAULT_NUM_WORKERS, num_threads: int = DEFAULT_NUM_THREADS
+    ):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.enabled = (
+            bool(model_path) and os.path.exists(model_path)
+            and importlib.util.find_spec("onnxruntime") is not None
+        )
+        # cached results are keyed by this, so replacing the model file invalidates them
+        self.model_version = (
+            "{}@{}".format(os.path.basename(model_path), int(os.path.getmtime(model_path)))
+            if self.enabled else "none"
+        )
+        self.pool = None
+        self.queue = None
+        self.batcher = None
+        self.in_flight = None
+        # running batches, referenced here so a batch is never garbage-collected mid-flight
+        self.batches = set()
+
+        self.latencies = deque(maxlen=1024)
+        self.num_volumes = 0
+        # every slice run by the model: the slices of the predictions and the Grad-CAM slices
+        self.num_slices = 0
+        self.num_batches = 0
+        # wall-clock time during which at least one batch was running (not summed over the workers)
+        self.busy_time = 0.0
+        self.running = 0
+        self.running_since = 0.0
+
+    def start(self) -> None:
+        """ Start the worker processes and the batcher (called in the running event loop) """
+        if not self.enabled or self.pool is not None:
+            return
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.model_path, self.num_threads),
+        )
+        self.queue = asyncio.Queue()
+        self.in_flight = asyncio.Semaphore(self.num_workers * 2)
+        self.batcher = asyncio.create_task(self.batch_loop())
+
+    async def stop(self) -> None:
+        """ Stop the batcher and the running batches, and fail every pending request so no predict() hangs """
+        tasks = list(self.batches)
+        if self.batcher is not None:
+            tasks.append(self.batcher)
+            self.batcher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.queue is not None:
+            while not self.queue.empty():
+                self.fail([self.queue.get_nowait()])
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def infer(self, slices: list, lo: float, hi: float) -> list:
+        """ Queue the slices for the batcher and return the model outputs of each slice """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for img in slices:
+            future = loop.create_future()
+            self.queue.put_nowait((img, lo, hi, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def predict(self, volume: np.ndarray) -> dict | None:
+        """ Return the probability of each task and the timing of this volume """
+        if not self.enabled or self.pool is None:
+            return None
+        started = time.perf_counter()
+        lo, hi = float(volume.min()), float(volume.max())
+        outputs = await self.infer(list(volume), lo, hi)
+
+        logits = np.stack([output[0] for output in outputs]).max(axis=0)
+        probs = 1.0 / (1.0 + np.exp(-logits))
+        elapsed = time.perf_counter() - started
+        self.latencies.append(elapsed)
+        self.num_volumes += 1
+
+        prediction = {task: float(p) for task, p in zip(TASKS, probs)}
+        prediction["inference_ms"] = elapsed * 1000
+        prediction["slices_per_sec"] = volume.shape[0] / elapsed
+        return prediction
+
+    async def saliency(self, img: np.ndarray, lo: float, hi: float) -> np.ndarray | None:
+        """ 
+        Return the Grad-CAM map of the most likely task as a uint8 slice of the same size,
+        or None when the model has no Grad-CAM output.
+        """
+        if not self.enabled or self.pool is None:
+            return None
+        output = (await self.infer([img], lo, hi))[0]
+        if len(output) < 2:
+            return None
+        import cv2
+
+        cam = np.maximum(output[1][int(np.argmax(output[0]))], 0).astype(np.float32)
+        cam = cv2.resize(cam, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_LINEAR)
+        cam_max = cam.max()
+        if cam_max > 0:
+            cam *= 255.0 / cam_max
+        return cam.astype(np.uint8)
+
+    async def batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = []
+            try:
+                items.append(await self.queue.get())
+                deadline = loop.time() + MAX_BATCH_WAIT
+                while len(items) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self.in_flight.acquire()
+            except asyncio.CancelledError:
+                # stopped while the batch was being packed
+                self.fail(items)
+                raise
+            task = asyncio.create_task(self.run(items))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def run(self, items: list) -> None:
+        loop = asyncio.get_running_loop()
+        if not self.running:
+            self.running_since = time.perf_counter()
+        self.running += 1
+        try:
+            outputs = await loop.run_in_executor(
+                self.pool, run_batch, [(img, lo, hi) for img, lo, hi, _ in items], self.batch_size
+            )
+        except Exception as e:
+            self.fail(items, e)
+        else:
+            self.num_slices += len(items)
+            for (*_, future), output in zip(items, outputs):
+                if not future.done():
+                    future.set_result(output)
+        finally:
+            # cancelled by stop()
+            self.fail(items)
+            self.running -= 1
+            if not self.running:
+                self.busy_time += time.perf_counter() - self.running_since
+            self.num_batches += 1
+            self.in_flight.release()
+
+    @staticmethod
+    def fail(items: list, error: Exception | None = None) -> None:
+        """ Resolve the futures of the items which are still pending """
+        for *_, future in items:
+            if not future.done():
+                future.set_exception(error or RuntimeError("The predictor was stopped"))
+
+    def stats(self) -> dict:
+        """ Throughput (slices per second of busy wall-clock time) and latency percentiles of the recent volumes """
+        latencies = np.array(self.latencies) * 1000
+        busy_time = self.busy_time + (time.perf_counter() - self.running_since if self.running else 0.0)
+        return {
+            "enabled": self.enabled,
+            "volumes": self.num_volumes,
+            "slices": self.num_slices,
+            "batches": self.num_batches,
+            "batch_size": self.batch_size,
+            "slices_per_sec": self.num_slices / busy_time if busy_time else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            "latency_p95_ms": float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+        }
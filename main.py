@@ -1,13 +1,32 @@
 import sys
-import qdarktheme
-from PySide6.QtWidgets import QApplication
 
-from src.main_window import MainWindow
+from src.startup import StartupTimer, is_profile_enabled
 
 
 if __name__ == "__main__":
+    # python main.py --startup-profile: print the time to the first event loop turn and quit
+    timer = StartupTimer("viewer", is_profile_enabled())
+    timer.import_modules("numpy", "PySide6.QtWidgets", "qdarktheme", "src.main_window")
+
+    import qdarktheme
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+
+    from src.main_window import MainWindow
+
     app = QApplication(sys.argv)
+    timer.mark("QApplication")
     qdarktheme.setup_theme()
+    timer.mark("theme")
     main_window = MainWindow()
+    timer.mark("MainWindow")
     main_window.show()
+    timer.mark("show")
+
+    if timer.enabled:
+        def finish_profile():
+            timer.mark("first event loop turn (time-to-window)")
+            timer.report()
+            app.quit()
+        QTimer.singleShot(0, finish_profile)
     app.exec()
@@ -0,0 +1,173 @@
+from PySide6.QtCore import Slot, Signal, Qt, QAbstractTableModel, QModelIndex, QThreadPool
+from PySide6.QtWidgets import (
+    QWidget, QPushButton, QLineEdit, QComboBox, QTableView, QLabel,
+    QVBoxLayout, QHBoxLayout, QFileDialog, QAbstractItemView
+)
+
+import os
+
+import numpy as np
+
+from src.catalog import SPLITS, PLANES, DatasetCatalog, get_catalog
+from src.ingest import IngestTask
+from src.label_index import TASKS
+
+
+class CatalogTask(IngestTask):
+    """ Load the catalog of the dataset root and sync it with the files (headers only) """
+    def __init__(self, dataset_root: str):
+        super().__init__()
+        self.dataset_root = dataset_root
+
+    def process(self) -> dict:
+        return {"catalog": get_catalog(self.dataset_root)}
+
+
+class CaseTableModel(QAbstractTableModel):
+    """
+    Table of the filtered catalog rows.
+    Cells are formatted only when the view asks for them, so a long catalog costs nothing to show.
+    """
+    COLUMNS = ("case", "split", "plane", "slices", "shape", "dtype", "size (MB)") + TASKS
+
+    def __init__(self):
+        super().__init__()
+        self.catalog = None
+        self.rows = np.zeros(0, dtype=np.int64)
+
+    def set_rows(self, catalog: DatasetCatalog, rows: np.ndarray) -> None:
+        self.beginResetModel()
+        self.catalog = catalog
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else int(self.rows.shape[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        record = self.catalog.records[self.rows[index.row()]]
+        column = index.column()
+        if column == 0:
+            return os.path.splitext(str(record["file_name"]))[0]
+        if column == 1:
+            return SPLITS[record["split"]]
+        if column == 2:
+            return PLANES[record["plane"]]
+        if column == 3:
+            return int(record["shape"][0])
+        if column == 4:
+            return "x".join(str(v) for v in record["shape"])
+        if column == 5:
+            return np.dtype(str(record["dtype"])).name
+        if column == 6:
+            return f"{record['nbytes'] / 2**20:.1f}"
+        label = int(record["labels"][column - 7])
+        return "" if label < 0 else label
+
+    def get_path(self, row: int) -> str:
+        return self.catalog.get_path(self.rows[row])
+
+
+class CaseBrowser(QWidget):
+    """
+    Searchable list of every series of a dataset root, built from the catalog.
+    Double-clicking a row emits case_selected with the series path, so opening a case
+    does not scan any directory.
+    """
+    case_selected = Signal(str)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setWindowTitle("Knee MRI Viewer - Cases")
+        self.resize(760, 600)
+        self.catalog = None
+        self.task = None
+
+        main_layout = QVBoxLayout()
+        filter_layout = QHBoxLayout()
+        open_btn = QPushButton("Open Dataset")
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("case id")
+        self.split_combo = QComboBox()
+        self.split_combo.addItems(("all splits",) + SPLITS)
+        self.plane_combo = QComboBox()
+        self.plane_combo.addItems(("all planes",) + PLANES)
+        self.task_combo = QComboBox()
+        self.task_combo.addItems(("any label",) + TASKS)
+        filter_layout.addWidget(open_btn)
+        filter_layout.addWidget(self.search_edit)
+        filter_layout.addWidget(self.split_combo)
+        filter_layout.addWidget(self.plane_combo)
+        filter_layout.addWidget(self.task_combo)
+        main_layout.addLayout(filter_layout)
+
+        self.model = CaseTableModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        main_layout.addWidget(self.table)
+        self.status_label = QLabel("Open a dataset root")
+        main_layout.addWidget(self.status_label)
+        self.setLayout(main_layout)
+
+        open_btn.clicked.connect(self.select_dataset)
+        self.search_edit.textChanged.connect(self.apply_filter)
+        self.split_combo.currentIndexChanged.connect(self.apply_filter)
+        self.plane_combo.currentIndexChanged.connect(self.apply_filter)
+        self.task_combo.currentIndexChanged.connect(self.apply_filter)
+        self.table.doubleClicked.connect(self.open_case)
+
+    def select_dataset(self):
+        dataset_root = QFileDialog.getExistingDirectory(self, "Dataset Root")
+        if dataset_root:
+            self.open_dataset(dataset_root)
+
+    def open_dataset(self, dataset_root: str) -> None:
+        """ The catalog is loaded and updated on the thread pool """
+        if self.task is not None:
+            self.task.cancel()
+        self.status_label.setText(f"Reading {dataset_root} ...")
+        self.task = CatalogTask(dataset_root)
+        self.task.signals.finished.connect(self.set_catalog)
+        self.task.signals.failed.connect(self.fail_catalog)
+        QThreadPool.globalInstance().start(self.task)
+
+    @Slot(dict)
+    def set_catalog(self, result: dict):
+        self.task = None
+        self.catalog = result["catalog"]
+        self.apply_filter()
+
+    @Slot(str)
+    def fail_catalog(self, message: str):
+        self.task = None
+        self.status_label.setText(f"Failed: {message}")
+
+    def apply_filter(self):
+        if self.catalog is None:
+            return
+        rows = self.catalog.filter(
+            self.search_edit.text().strip(),
+            self.split_combo.currentIndex() - 1,
+            self.plane_combo.currentIndex() - 1,
+            self.task_combo.currentIndex() - 1,
+        )
+        self.model.set_rows(self.catalog, rows)
+        self.status_label.setText(
+            f"{self.catalog.dataset_root}: {rows.shape[0]} / {len(self.catalog)} series"
+        )
+
+    def open_case(self, index: QModelIndex):
+        self.case_selected.emit(self.model.get_path(index.row()))
@@ -0,0 +1,188 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.label_index import TASKS, LabelIndex
+from src.volume_store import SERIES_EXTENSIONS, get_cache_root, read_series_header
+
+
+SPLITS = ("train", "valid")
+PLANES = ("axial", "coronal", "sagittal")
+
+CATALOG_DTYPE = np.dtype([
+    ("file_name", "U32"),
+    ("case_id", np.int32),
+    ("split", np.uint8),  # index of SPLITS
+    ("plane", np.uint8),  # index of PLANES
+    ("shape", np.int32, (3,)),
+    ("dtype", "U8"),
+    ("nbytes", np.int64),
+    ("mtime", np.float64),
+    ("labels", np.int8, (len(TASKS),)),
+])
+
+
+def scan_series(dataset_root: str) -> list:
+    """ List (split_idx, plane_idx, file_name, size, mtime) of every .npy/DICOM series (one stat per file) """
+    series = []
+    for split_idx, split in enumerate(SPLITS):
+        for plane_idx, plane in enumerate(PLANES):
+            plane_dir = os.path.join(dataset_root, split, plane)
+            if not os.path.isdir(plane_dir):
+                continue
+            with os.scandir(plane_dir) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(SERIES_EXTENSIONS) and entry.is_file():
+                        stat = entry.stat()
+                        series.append((split_idx, plane_idx, entry.name, stat.st_size, stat.st_mtime))
+    return series
+
+
+class DatasetCatalog:
+    """
+    This Class is the list of every series of a dataset root, as one structured array (CATALOG_DTYPE).
+
+    Only the .npy (or DICOM) headers are read (in parallel) to get the shape and dtype, never the pixels.
+    update() re-reads the headers of the new or changed files only (by size and mtime),
+    and the labels are joined again only when one of the csvs changes.
+    """
+    def __init__(self, dataset_root: str, records: np.ndarray, label_mtimes: np.ndarray = None):
+        self.dataset_root = dataset_root
+        self.records = records
+        self.label_mtimes = label_mtimes if label_mtimes is not None else np.zeros(0)
+
+    def get_csv_paths(self) -> list:
+        return [p for split in SPLITS for p in LabelIndex.get_csv_paths(self.dataset_root, split)]
+
+    def __len__(self) -> int:
+        return self.records.shape[0]
+
+    def get_path(self, row: int) -> str:
+        record = self.records[row]
+        return os.path.join(
+            self.dataset_root, SPLITS[record["split"]], PLANES[record["plane"]], str(record["file_name"])
+        )
+
+    def update(self, num_workers: int = 8) -> bool:
+        """ Sync with the files on disk. Return True if anything changed. """
+        known = {
+            (int(r["split"]), int(r["plane"]), str(r["file_name"])): (int(r["nbytes"]), float(r["mtime"]), row)
+            for row, r in enumerate(self.records)
+        }
+        series = scan_series(self.dataset_root)
+        keep, changed = [], []
+        for split_idx, plane_idx, file_name, size, mtime in series:
+            old = known.get((split_idx, plane_idx, file_name))
+            if old is not None and old[0] == size and old[1] == mtime:
+                keep.append(old[2])
+            else:
+                changed.append((split_idx, plane_idx, file_name, size, mtime))
+        label_mtimes = LabelIndex.get_mtimes(self.get_csv_paths())
+        if not changed and len(keep) == len(self.records):
+            if np.array_equal(label_mtimes, self.label_mtimes):
+                return False
+            self.join_labels()
+            return True
+
+        new_records = np.zeros(len(changed), dtype=CATALOG_DTYPE)
+        paths = [
+            os.path.join(self.dataset_root, SPLITS[s], PLANES[p], f) for s, p, f, _, _ in changed
+        ]
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            headers = list(pool.map(read_series_header, paths))
+        for record, (split_idx, plane_idx, file_name, size, mtime), (shape, dtype) in zip(
+            new_records, changed, headers
+        ):
+            record["file_name"] = file_name
+            case_name = os.path.splitext(file_name)[0]
+            record["case_id"] = int(case_name) if case_name.isdigit() else -1
+            record["split"] = split_idx
+            record["plane"] = plane_idx
+            record["shape"] = (tuple(shape) + (0, 0, 0))[:3]
+            record["dtype"] = dtype.str
+            record["nbytes"] = size
+            record["mtime"] = mtime
+
+        records = np.concatenate([self.records[np.array(keep, dtype=np.int64)], new_records])
+        records = records[np.lexsort((records["case_id"], records["plane"], records["split"]))]
+        self.records = records
+        self.join_labels()
+        return True
+
+    def join_labels(self) -> None:
+        """ Fill the labels column from the csvs of each split """
+        self.label_mtimes = LabelIndex.get_mtimes(self.get_csv_paths())
+        self.records["labels"] = -1
+        for split_idx, split in enumerate(SPLITS):
+            index = LabelIndex.build(LabelIndex.get_csv_paths(self.dataset_root, split), self.dataset_root)
+            mask = self.records["split"] == split_idx
+            if not mask.any() or index.case_ids.size == 0:
+                continue
+            case_ids = self.records["case_id"][mask]
+            rows = np.clip(np.searchsorted(index.case_ids, case_ids), 0, index.case_ids.size - 1)
+            found = index.case_ids[rows] == case_ids
+            labels = np.full((case_ids.shape[0], len(TASKS)), -1, dtype=np.int8)
+            labels[found] = index.labels[rows[found]]
+            self.records["labels"][mask] = labels
+
+    def filter(self, text: str = "", split: int = -1, plane: int = -1, task: int = -1) -> np.ndarray:
+        """ Return the rows matching the case id text, split/plane index and positive task (-1: any) """
+        mask = np.ones(len(self), dtype=bool)
+        if split >= 0:
+            mask &= self.records["split"] == split
+        if plane >= 0:
+            mask &= self.records["plane"] == plane
+        if task >= 0:
+            mask &= self.records["labels"][:, task] == 1
+        if text:
+            mask &= np.char.find(self.records["file_name"], text) >= 0
+        return np.flatnonzero(mask)
+
+    def save(self, catalog_path: str) -> None:
+        os.makedirs(os.path.dirname(catalog_path) or ".", exist_ok=True)
+        tmp_path = catalog_path + ".tmp.npz"
+        np.savez(tmp_path, records=self.records, label_mtimes=self.label_mtimes)
+        os.replace(tmp_path, catalog_path)
+
+    @classmethod
+    def load(cls, dataset_root: str, catalog_path: str) -> "DatasetCatalog":
+        with np.load(catalog_path) as data:
+            records, label_mtimes = data["records"], data["label_mtimes"]
+        if records.dtype != CATALOG_DTYPE:
+            raise ValueError("catalog format changed")
+        return cls(dataset_root, records, label_mtimes)
+
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def get_catalog_path(dataset_root: str) -> str:
+    key = hashlib.md5(dataset_root.encode()).hexdigest()[:12]
+    return os.path.join(get_cache_root(), "catalog_cache", f"{key}.npz")
+
+
+def get_catalog(dataset_root: str) -> DatasetCatalog:
+    """
+    Get the catalog of the dataset root, kept in memory and on disk (catalog_cache/).
+    It is updated incrementally on every call, so only new or changed files are read.
+    """
+    dataset_root = os.path.abspath(dataset_root)
+    catalog_path = get_catalog_path(dataset_root)
+
+    with _lock:
+        catalog = _catalogs.get(dataset_root)
+        if catalog is None and os.path.exists(catalog_path):
+            try:
+                catalog = DatasetCatalog.load(dataset_root, catalog_path)
+            except (OSError, ValueError, KeyError):
+                catalog = None
+        if catalog is None:
+            catalog = DatasetCatalog(dataset_root, np.zeros(0, dtype=CATALOG_DTYPE))
+        if catalog.update():
+            catalog.save(catalog_path)
+        _catalogs[dataset_root] = catalog
+        return catalog
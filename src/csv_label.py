@@ -0,0 +1,182 @@
+from PySide6.QtCore import Slot, QSize, Qt, QThreadPool
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QFrame, QLabel, QVBoxLayout
+
+import os
+
+from src.dataset_stats import SPLITS, PLANES, DatasetStats, get_dataset_stats
+from src.ingest import IngestTask
+from src.label_index import TASKS
+
+
+class StatsTask(IngestTask):
+    """ Compute (or load the cached) statistics of the dataset of the dropped csv """
+    def __init__(self, file_path: str):
+        super().__init__()
+        self.file_path = file_path
+
+    def process(self) -> dict:
+        file_name = os.path.basename(self.file_path)
+        dataset_root = self.file_path if os.path.isdir(self.file_path) else os.path.dirname(self.file_path)
+        split = "valid" if file_name.startswith("valid") else "train"
+        return {"file_name": file_name, "split": split, "stats": get_dataset_stats(dataset_root)}
+
+
+class CSVLabel(QFrame):
+    """
+    Drop a label csv (or the dataset root) to show the statistics of its dataset.
+    view="labels": positive cases of every task in both splits, co-occurrence in the tooltip.
+    view="slices": slice-count histogram of every plane of the split of the csv.
+    QtCharts is loaded and the chart is made on the first drop, not at startup.
+    """
+    def __init__(self, view: str = "labels"):
+        super().__init__()
+        self.view = view
+        self.setAcceptDrops(True)
+        self.setFixedSize(300, 370)
+        self.task = None
+
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.setAlignment(Qt.AlignTop)
+        self.title = QLabel("Drop csv file Here")
+        self.title.setFixedSize(280, 70)
+        self.chart = None
+        self.chart_view = None
+        self.chart_frame = QFrame()
+        self.chart_frame.setFixedSize(QSize(280, 300))
+        chart_layout = QVBoxLayout()
+        chart_layout.setContentsMargins(0, 0, 0, 0)
+        self.chart_frame.setLayout(chart_layout)
+
+        main_layout.addWidget(self.title)
+        main_layout.addWidget(self.chart_frame)
+        self.setLayout(main_layout)
+
+        self.title.setAlignment(Qt.AlignCenter)
+        self.title.setText("\n\n Drop csv file Here \n\n")
+        self.title.setStyleSheet(
+            """
+            QLabel{
+                border: 3px dashed #aaa
+            }
+        """
+        )
+
+        self.title.dragEnterEvent = self.dragEnterEvent
+        self.title.dragMoveEvent = self.dragMoveEvent
+        self.title.dropEvent = self.dropEvent
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasImage:
+            event.accept()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasImage:
+            event.accept()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        if event.mimeData().hasImage:
+            event.setDropAction(Qt.CopyAction)
+            file_path = event.mimeData().urls()[0].toLocalFile()
+            self.preprocess(file_path)
+            event.accept()
+        else:
+            event.ignore()
+
+    def preprocess(self, file_path: str):
+        """ The statistics are computed on the thread pool, the chart is drawn when they are ready """
+        if self.task is not None:
+            self.task.cancel()
+        self.title.setText("\n\n Computing statistics... \n\n")
+        self.task = StatsTask(file_path)
+        self.task.signals.finished.connect(self.show_stats)
+        self.task.signals.failed.connect(self.fail_stats)
+        QThreadPool.globalInstance().start(self.task)
+
+    def create_chart(self) -> None:
+        from PySide6.QtCharts import QChart, QChartView
+
+        self.chart = QChart()
+        self.chart.setAnimationOptions(QChart.SeriesAnimations)
+        self.chart_view = QChartView(self.chart)
+        self.chart_view.setRenderHint(QPainter.Antialiasing)
+        self.chart_frame.layout().addWidget(self.chart_view)
+
+    @Slot(str)
+    def fail_stats(self, message: str):
+        self.task = None
+        self.title.setText(f"\n\n Failed: {message} \n\n")
+
+    @Slot(dict)
+    def show_stats(self, result: dict):
+        self.task = None
+        stats = result["stats"]
+        if self.chart is None:
+            self.create_chart()
+        # the former series and axes are removed, so the chart does not grow on every drop
+        self.chart.removeAllSeries()
+        for axis in self.chart.axes():
+            self.chart.removeAxis(axis)
+
+        if self.view == "slices":
+            summary = self.draw_slice_histogram(stats, result["split"])
+        else:
+            summary = self.draw_label_counts(stats)
+        self.title.setText(f"File Name: {result['file_name']}\n{summary}")
+        self.chart.legend().setVisible(True)
+        self.chart_view.update()
+
+    def draw_label_counts(self, stats: DatasetStats) -> str:
+        from PySide6.QtCharts import QBarSeries, QBarSet
+
+        series = QBarSeries()
+        for split_idx, split in enumerate(SPLITS):
+            bar_set = QBarSet(split)
+            bar_set.append([int(v) for v in stats.label_counts[split_idx, :, 2]])
+            series.append(bar_set)
+        self.add_series(series, list(TASKS), int(stats.label_counts[..., 2].max()))
+
+        self.chart_view.setToolTip("\n".join(
+            "{} positive co-occurrence\n{}".format(split, "\n".join(
+                "{}: {}".format(task, " ".join(f"{int(v):5d}" for v in row))
+                for task, row in zip(TASKS, stats.co_occurrence[split_idx])
+            ))
+            for split_idx, split in enumerate(SPLITS)
+        ))
+        num_cases = stats.label_counts.sum(axis=2).max(axis=1)
+        return ", ".join(f"{split}: {int(n)} cases" for split, n in zip(SPLITS, num_cases))
+
+    def draw_slice_histogram(self, stats: DatasetStats, split: str) -> str:
+        from PySide6.QtCharts import QBarSeries, QBarSet
+
+        histogram, edges = stats.slice_histogram(split)
+        series = QBarSeries()
+        for plane in PLANES:
+            bar_set = QBarSet(plane)
+            bar_set.append([int(v) for v in histogram[plane]])
+            series.append(bar_set)
+        categories = [f"{int(lo)}-{int(hi)}" for lo, hi in zip(edges[:-1], edges[1:])]
+        self.add_series(series, categories, max(int(c.max()) for c in histogram.values()))
+
+        num_series = sum(stats.slice_counts[(split, plane)].size for plane in PLANES)
+        self.chart_view.setToolTip("")
+        return f"{split}: {num_series} series, slices per series"
+
+    def add_series(self, series, categories: list, max_value: int):
+        from PySide6.QtCharts import QBarCategoryAxis, QValueAxis
+
+        self.chart.addSeries(series)
+        axis_x = QBarCategoryAxis()
+        axis_x.append(categories)
+        self.chart.addAxis(axis_x, Qt.AlignBottom)
+        series.attachAxis(axis_x)
+        axis_y = QValueAxis()
+        axis_y.setRange(0, max(max_value, 1))
+        axis_y.setLabelFormat("%d")
+        self.chart.addAxis(axis_y, Qt.AlignLeft)
+        series.attachAxis(axis_y)
@@ -0,0 +1,165 @@
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+from src.catalog import SPLITS, PLANES, DatasetCatalog, get_catalog
+from src.label_index import TASKS, LabelIndex
+from src.volume_store import get_cache_root
+
+
+LABEL_VALUES = (-1, 0, 1)  # missing, normal, abnormal
+
+
+class DatasetStats:
+    """
+    This Class keeps the label and slice-count statistics of a whole dataset root.
+
+    label_counts[split, task, value] counts the cases of each label value (-1: missing, 0, 1),
+    co_occurrence[split, i, j] counts the cases positive for both task i and task j,
+    and slice_counts[(split, plane)] is the number of slices of every series, taken from the
+    catalog (.npy headers only). Everything is computed in one pass over the label array of both splits.
+    """
+    def __init__(self, dataset_root: str, signature: np.ndarray, label_counts: np.ndarray,
+                 co_occurrence: np.ndarray, slice_counts: dict):
+        self.dataset_root = dataset_root
+        self.signature = signature
+        self.label_counts = label_counts
+        self.co_occurrence = co_occurrence
+        self.slice_counts = slice_counts
+
+    @staticmethod
+    def get_signature(catalog: DatasetCatalog) -> np.ndarray:
+        """
+        Digest of the name, size and mtime of every series and of the csv mtimes, all read by the catalog.
+        Changed when a series is added, removed, renamed or rewritten (a directory mtime misses rewrites)
+        """
+        records = catalog.records
+        order = np.lexsort((records["file_name"], records["plane"], records["split"]))
+        digest = hashlib.md5(np.ascontiguousarray(catalog.label_mtimes, dtype=np.float64).tobytes())
+        for name in ("split", "plane", "file_name", "nbytes", "mtime"):
+            digest.update(np.ascontiguousarray(records[name][order]).tobytes())
+        return np.array(digest.hexdigest())
+
+    @classmethod
+    def build(cls, dataset_root: str, catalog: DatasetCatalog | None = None) -> "DatasetStats":
+        catalog = catalog if catalog is not None else get_catalog(dataset_root)
+        labels, split_ids = [], []
+        for split_idx, split in enumerate(SPLITS):
+            index = LabelIndex.build(LabelIndex.get_csv_paths(dataset_root, split), dataset_root)
+            labels.append(index.labels)
+            split_ids.append(np.full(index.labels.shape[0], split_idx))
+        labels = np.concatenate(labels).astype(np.int64)
+        split_ids = np.concatenate(split_ids)
+
+        # one bincount over (split, task, value) for the distributions of every task and split
+        num_tasks, num_values = len(TASKS), len(LABEL_VALUES)
+        bins = (split_ids[:, None] * num_tasks + np.arange(num_tasks)) * num_values + labels + 1
+        label_counts = np.bincount(
+            bins.reshape(-1), minlength=len(SPLITS) * num_tasks * num_values
+        ).reshape(len(SPLITS), num_tasks, num_values)
+
+        positive = (labels == 1).astype(np.int64)
+        co_occurrence = np.stack([
+            positive[split_ids == split_idx].T @ positive[split_ids == split_idx]
+            for split_idx in range(len(SPLITS))
+        ])
+
+        records = catalog.records
+        slice_counts = {
+            (split, plane): records["shape"][
+                (records["split"] == split_idx) & (records["plane"] == plane_idx), 0
+            ].astype(np.int32)
+            for split_idx, split in enumerate(SPLITS) for plane_idx, plane in enumerate(PLANES)
+        }
+
+        return cls(dataset_root, cls.get_signature(catalog), label_counts, co_occurrence, slice_counts)
+
+    def slice_histogram(self, split: str, num_bins: int = 8) -> tuple:
+        """ Histogram of the slice counts of every plane of the split on shared bins: ({plane: counts}, edges) """
+        counts = [self.slice_counts[(split, plane)] for plane in PLANES]
+        merged = np.concatenate(counts)
+        if merged.size == 0:
+            return {plane: np.zeros(num_bins, dtype=np.int64) for plane in PLANES}, np.arange(num_bins + 1)
+        edges = np.histogram_bin_edges(merged, bins=num_bins)
+        return {plane: np.histogram(c, bins=edges)[0] for plane, c in zip(PLANES, counts)}, edges
+
+    def save(self, stats_path: str) -> None:
+        os.makedirs(os.path.dirname(stats_path) or ".", exist_ok=True)
+        tmp_path = stats_path + ".tmp.npz"
+        np.savez(
+            tmp_path, dataset_root=np.array(self.dataset_root), signature=self.signature,
+            label_counts=self.label_counts, co_occurrence=self.co_occurrence,
+            **{f"slices_{split}_{plane}": counts for (split, plane), counts in self.slice_counts.items()}
+        )
+        os.replace(tmp_path, stats_path)
+
+    @classmethod
+    def load(cls, stats_path: str) -> "DatasetStats":
+        with np.load(stats_path) as data:
+            slice_counts = {
+                (split, plane): data[f"slices_{split}_{plane}"] for split in SPLITS for plane in PLANES
+            }
+            return cls(
+                str(data["dataset_root"]), data["signature"], data["label_counts"],
+                data["co_occurrence"], slice_counts
+            )
+
+
+# dataset root -> (quick key, stats)
+_stats = {}
+_lock = threading.Lock()
+
+
+def get_stats_path(dataset_root: str) -> str:
+    key = hashlib.md5(dataset_root.encode()).hexdigest()[:12]
+    return os.path.join(get_cache_root(), "stats_cache", f"{key}.npz")
+
+
+def get_quick_key(dataset_root: str) -> tuple:
+    """
+    mtimes of the plane directories and of the csvs: a dozen stats instead of one per series.
+    A directory mtime changes when a series is added, removed or renamed in it, not when one is rewritten in place
+    """
+    paths = [os.path.join(dataset_root, split, plane) for split in SPLITS for plane in PLANES]
+    paths += [p for split in SPLITS for p in LabelIndex.get_csv_paths(dataset_root, split)]
+    return tuple(LabelIndex.get_mtimes(paths))
+
+
+def get_dataset_stats(dataset_root: str) -> DatasetStats:
+    """
+    Get the statistics of the dataset root, computed once per dataset.
+    They are kept in memory and on disk (stats_cache/). While the quick key (directory and csv mtimes)
+    of the dataset is unchanged, the stats in memory are returned without any scan. Otherwise, and on the
+    first call of a process, they are checked against the signature (per-file size and mtime, from the catalog
+    which is updated first), so a series rewritten in place is picked up after a restart.
+    """
+    dataset_root = os.path.abspath(dataset_root)
+    # taken before the scan, so a file added during the scan changes the key of the next call
+    quick_key = get_quick_key(dataset_root)
+    with _lock:
+        entry = _stats.get(dataset_root)
+        if entry is not None and entry[0] == quick_key:
+            return entry[1]
+
+    catalog = get_catalog(dataset_root)
+    signature = DatasetStats.get_signature(catalog)
+    stats_path = get_stats_path(dataset_root)
+
+    with _lock:
+        stats = entry[1] if entry is not None else None
+        if stats is None and os.path.exists(stats_path):
+            try:
+                stats = DatasetStats.load(stats_path)
+            except (OSError, ValueError, KeyError):
+                stats = None
+        if (
+            stats is None
+            or stats.dataset_root != dataset_root
+            or not np.array_equal(stats.signature, signature)
+        ):
+            stats = DatasetStats.build(dataset_root, catalog)
+            stats.save(stats_path)
+        _stats[dataset_root] = (quick_key, stats)
+        return stats
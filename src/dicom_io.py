@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+
+
+DICOM_EXTENSIONS = (".dcm", ".dicom")
+# Multi-frame Grayscale Byte / Word Secondary Capture Image Storage
+SOP_CLASS_UIDS = {8: "1.2.840.10008.5.1.4.1.1.7.2", 16: "1.2.840.10008.5.1.4.1.1.7.3"}
+PIXEL_DATA_TAG = 0x7FE00010
+
+
+def is_dicom_path(path: str) -> bool:
+    return path.lower().endswith(DICOM_EXTENSIONS)
+
+
+def get_image_info(ds) -> tuple:
+    """
+    (shape, dtype) of the frames. dtype is the stored (raw) pixel type:
+    rescale slope/intercept are not applied, so no bit depth is lost.
+    """
+    if "Rows" not in ds or "Columns" not in ds or "BitsAllocated" not in ds:
+        raise ValueError("Not a DICOM image")
+    if int(ds.get("SamplesPerPixel", 1)) != 1:
+        raise ValueError("Only grayscale DICOM is supported")
+    bits = int(ds.BitsAllocated)
+    if bits not in (8, 16, 32):
+        raise ValueError(f"Unsupported BitsAllocated: {bits}")
+    kind = "i" if int(ds.get("PixelRepresentation", 0)) == 1 else "u"
+    shape = (int(ds.get("NumberOfFrames", 1) or 1), int(ds.Rows), int(ds.Columns))
+    return shape, np.dtype(f"<{kind}{bits // 8}")
+
+
+def is_compressed(ds) -> bool:
+    transfer_syntax = getattr(getattr(ds, "file_meta", None), "TransferSyntaxUID", None)
+    return bool(transfer_syntax is not None and transfer_syntax.is_compressed)
+
+
+class DicomSeries:
+    """
+    This Class reads the frames of a multi-frame DICOM file lazily.
+
+    For uncompressed transfer syntaxes, the frames are a memmap of the pixel data in the file,
+    so a frame is read only when it is indexed. Compressed pixel data is decoded frame by frame
+    when it is indexed (pydicom.pixels.iter_pixels).
+    The values are the stored values with their own dtype (8/16/32-bit).
+    """
+    def __init__(self, path: str):
+        import pydicom
+
+        self.path = path
+        self.ds = pydicom.dcmread(path, defer_size=1024, force=True)
+        self.shape, self.dtype = get_image_info(self.ds)
+        self.frames = None
+
+        # the deferred pixel data is not read, only its offset in the file is needed
+        pixel_data = self.ds.get_item(PIXEL_DATA_TAG, keep_deferred=True)
+        if pixel_data is None:
+            raise ValueError("The DICOM file has no pixel data")
+        if not is_compressed(self.ds):
+            self.frames = np.memmap(
+                path, dtype=self.dtype, mode="r", offset=pixel_data.value_tell, shape=self.shape
+            )
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def ndim(self) -> int:
+        return 3
+
+    def __getitem__(self, key):
+        if self.frames is not None:
+            return self.frames[key]
+        if isinstance(key, (int, np.integer)):
+            return self.read_frame(int(key))
+        return np.asarray(self)[key]
+
+    def read_frame(self, idx: int) -> np.ndarray:
+        from pydicom.pixels import iter_pixels
+
+        idx = idx % self.shape[0]
+        return next(iter_pixels(self.path, indices=[idx], raw=True)).astype(self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        volume = self.frames if self.frames is not None else np.stack([self.read_frame(i) for i in range(len(self))])
+        return np.asarray(volume, dtype=dtype)
+
+
+def open_dicom(path: str) -> np.ndarray | DicomSeries:
+    """ Memmap of the frames when it is uncompressed, otherwise the lazy series """
+    series = DicomSeries(path)
+    return series.frames if series.frames is not None else series
+
+
+def read_dicom_header(path: str) -> tuple:
+    """ Read (shape, dtype) without reading the pixel data """
+    import pydicom
+
+    return get_image_info(pydicom.dcmread(path, stop_before_pixels=True, force=True))
+
+
+def read_dicom_bytes(fp) -> np.ndarray:
+    """ Read every frame of a DICOM file object (an upload) into an array of its stored dtype """
+    import pydicom
+
+    ds = pydicom.dcmread(fp, force=True)
+    shape, dtype = get_image_info(ds)
+    if "PixelData" not in ds:
+        raise ValueError("The DICOM file has no pixel data")
+    if is_compressed(ds):
+        return ds.pixel_array.reshape(shape).astype(dtype)
+    return np.frombuffer(ds.PixelData, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def write_dicom(
+    volume: np.ndarray, fp, patient_name: str = "Anonymous", patient_id: str = "",
+    study_description: str = "MRI Study", series_description: str = ""
+) -> None:
+    """
+    Write the (slices, h, w) volume as one multi-frame DICOM with its own bit depth
+    (8/16-bit, signed or unsigned). fp is a path or a writable file object.
+    """
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    volume = np.asarray(volume)
+    if volume.ndim != 3:
+        raise ValueError(f"Expected a (slices, h, w) volume, got shape {volume.shape}")
+    if volume.dtype.kind not in "ui" or volume.dtype.itemsize not in (1, 2):
+        raise ValueError(f"Only 8/16-bit integer volumes can be written, got {volume.dtype}")
+    bits = volume.dtype.itemsize * 8
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SOP_CLASS_UIDS[bits]
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = FileDataset(fp if isinstance(fp, str) else "", {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.Modality = "MR"
+    ds.PatientName = patient_name
+    ds.PatientID = patient_id
+    ds.StudyDescription = study_description
+    ds.SeriesDescription = series_description
+
+    ds.NumberOfFrames = volume.shape[0]
+    ds.Rows, ds.Columns = volume.shape[1:]
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = bits
+    ds.BitsStored = bits
+    ds.HighBit = bits - 1
+    ds.PixelRepresentation = 1 if volume.dtype.kind == "i" else 0
+    ds.PixelData = np.ascontiguousarray(volume, dtype=volume.dtype.newbyteorder("<")).tobytes()
+    ds.save_as(fp)
+
+
+def export_dicom(src_path: str, dst_path: str) -> tuple:
+    """ Export one .npy series as DICOM (used by the worker pool). Return (number of slices, bytes written) """
+    volume = np.load(src_path, mmap_mode="r")
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    tmp_path = dst_path + ".tmp"
+    case_id = os.path.splitext(os.path.basename(src_path))[0]
+    write_dicom(volume, tmp_path, patient_id=case_id, series_description=os.path.basename(os.path.dirname(src_path)))
+    os.replace(tmp_path, dst_path)
+    return volume.shape[0], os.path.getsize(dst_path)
@@ -0,0 +1,364 @@
+from PySide6.QtCore import Slot, Signal, QObject
+
+import os
+import json
+import atexit
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.ingest import IngestSignals, IngestCancelled
+from src.stream_frame import decode_frame
+
+
+# responses worth another try for an idempotent request
+RETRY_STATUS = (502, 503, 504)
+
+
+def decode_array(headers, body: bytes) -> np.ndarray:
+    """ Decode a raw slice/volume response (X-Image-Shape / X-Image-Dtype headers) without copying """
+    shape = tuple(int(s) for s in headers["X-Image-Shape"].split(","))
+    dtype = np.dtype(headers["X-Image-Dtype"])
+    return np.frombuffer(body, dtype=dtype).reshape(shape)
+
+
+class AsyncHttpClient:
+    """
+    This Class runs one pooled keep-alive aiohttp session on a background asyncio loop.
+
+    Coroutines are submitted from any thread with submit(), which returns a concurrent Future,
+    so a stale request is dropped with future.cancel() (the asyncio task is cancelled too).
+    GET requests are retried with a backoff on connection errors, timeouts and 502/503/504.
+    Results reach the widgets through Qt signals emitted from the loop thread (queued connections).
+    aiohttp is imported when the first client is made, so it does not slow down the start of the viewer.
+    """
+    def __init__(self, base_url: str, max_connections: int = 8, timeout: float = 30.0, retries: int = 2):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="http-client", daemon=True)
+        self.thread.start()
+        self.session = self.submit(self.create_session()).result()
+
+    async def create_session(self):
+        import aiohttp
+
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=None, connect=5, sock_read=self.timeout),
+        )
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self) -> None:
+        if not self.loop.is_running():
+            return
+        try:
+            self.submit(self.session.close()).result(timeout=5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+
+    async def get(self, path: str, params: dict = None, headers: dict = None) -> tuple:
+        """ GET with retries. Return (headers, body). """
+        import aiohttp
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session.get(self.base_url + path, params=params, headers=headers) as response:
+                    if response.status in RETRY_STATUS and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+                    response.raise_for_status()
+                    return response.headers, await response.read()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries or (
+                    isinstance(e, aiohttp.ClientResponseError) and e.status not in RETRY_STATUS
+                ):
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def fetch_slice(self, case: str, plane: str, idx: int, method: str = "original") -> np.ndarray:
+        headers, body = await self.get(
+            f"/result/{plane}/{idx}/{method}", params={"case": case},
+            headers={"Accept": "application/octet-stream"}
+        )
+        return decode_array(headers, body)
+
+    async def fetch_volume(self, case: str, plane: str, method: str = "original") -> np.ndarray:
+        headers, body = await self.get(f"/volume/{plane}", params={"method": method, "case": case})
+        return decode_array(headers, body)
+
+    async def upload(self, file_path: str, params: dict, content_type: str, on_progress=None,
+                     chunk_size: int = 1 << 20) -> dict:
+        """ Stream the file to /preprocess (not retried: the body is consumed) """
+        loop = asyncio.get_running_loop()
+        total = os.path.getsize(file_path)
+
+        async def iter_body():
+            sent = 0
+            with open(file_path, "rb") as f:
+                while chunk := await loop.run_in_executor(None, f.read, chunk_size):
+                    yield chunk
+                    sent += len(chunk)
+                    if on_progress is not None:
+                        on_progress(sent, total)
+
+        async with self.session.post(
+            self.base_url + "/preprocess", params=params, data=iter_body(),
+            headers={"Content-Type": content_type}
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+class HttpTask:
+    """
+    Counterpart of IngestTask for the async client: process() is a coroutine run on the client loop.
+    cancel() cancels the running request at once, and nothing is emitted after it.
+    """
+    def __init__(self, client: AsyncHttpClient):
+        self.client = client
+        self.signals = IngestSignals()
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def start(self) -> None:
+        self.future = self.client.submit(self.run())
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise IngestCancelled()
+
+    async def process(self) -> dict:
+        raise NotImplementedError
+
+    async def run(self):
+        try:
+            info = await self.process()
+        except (IngestCancelled, asyncio.CancelledError):
+            return
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.failed.emit(str(e) or type(e).__name__)
+            return
+        if not self.is_cancelled():
+            self.signals.finished.emit(info)
+
+
+class SliceStream(QObject):
+    """
+    This Class is a subscription to the /stream WebSocket of the backend.
+
+    After subscribe(), set_cursor() only sends the new index: the server pushes the slice
+    and its neighbours, nearest first, and drops the frames queued for the former cursor.
+    Every frame is acked as soon as it is received, which is what lets the server send more.
+    Frames of a former subscription are dropped.
+    failed is emitted on an error message, and when the socket is closed by anything but close().
+    """
+    subscribed = Signal(int)
+    slice_ready = Signal(int, object)
+    failed = Signal(str)
+
+    def __init__(self, client: AsyncHttpClient, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.ws = None
+        self.reader = None
+        self.subscription = None
+        self.lock = None
+        self.closing = False
+
+    def subscribe(self, case: str, plane: str, method: str = "original", idx: int = 0) -> None:
+        self.client.submit(self.send({"type": "subscribe", "case": case, "plane": plane, "method": method, "idx": idx}))
+
+    def set_cursor(self, idx: int) -> None:
+        self.client.submit(self.send({"type": "cursor", "idx": idx}))
+
+    def close(self) -> None:
+        self.client.submit(self.close_connection())
+
+    async def open_connection(self) -> None:
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.ws is None or self.ws.closed:
+                self.closing = False
+                self.ws = await self.client.session.ws_connect(self.client.base_url + "/stream")
+                self.reader = asyncio.ensure_future(self.read())
+
+    async def send(self, message: dict) -> None:
+        import aiohttp
+
+        try:
+            await self.open_connection()
+            if message["type"] == "subscribe":
+                self.subscription = None
+            await self.ws.send_json(message)
+        except (aiohttp.ClientError, ConnectionError) as e:
+            self.failed.emit(str(e) or type(e).__name__)
+
+    async def close_connection(self) -> None:
+        self.closing = True
+        if self.reader is not None:
+            self.reader.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def read(self) -> None:
+        import aiohttp
+
+        try:
+            async for message in self.ws:
+                if message.type == aiohttp.WSMsgType.BINARY:
+                    subscription, idx, img = decode_frame(message.data)
+                    await self.ws.send_json({"type": "ack", "count": 1})
+                    if subscription == self.subscription:
+                        self.slice_ready.emit(idx, img)
+                elif message.type == aiohttp.WSMsgType.TEXT:
+                    data = json.loads(message.data)
+                    if data["type"] == "subscribed":
+                        self.subscription = data["subscription"]
+                        self.subscribed.emit(data["length"])
+                    elif data["type"] == "error":
+                        self.failed.emit(data["detail"])
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    self.failed.emit(str(self.ws.exception()))
+                    return
+        except (aiohttp.ClientError, ConnectionError) as e:
+            if not self.closing:
+                self.failed.emit(str(e) or type(e).__name__)
+            return
+        # the server closed the socket (restart, crash): the owner falls back to GET requests
+        if not self.closing:
+            self.failed.emit(f"The stream was closed by the server (code {self.ws.close_code})")
+
+
+class RemoteSeries(QObject):
+    """
+    The slices of one (case, plane) on the backend.
+    Until the whole volume is downloaded, request() fetches single slices and cancels the fetches
+    of the slices the user has scrolled past, so only the current one is waited for.
+    With push=True the slices come from a SliceStream instead (no round trip per scroll step),
+    and it falls back to GET requests if the WebSocket fails.
+    """
+    slice_ready = Signal(int, object)
+    volume_ready = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, client: AsyncHttpClient, case: str, plane: str, method: str = "original",
+                 push: bool = False, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.case = case
+        self.plane = plane
+        self.method = method
+        self.pending = {}
+        self.download_future = None
+        self.pushed = {}
+        self.stream = None
+        if push:
+            self.stream = SliceStream(client, parent=self)
+            self.stream.slice_ready.connect(self.on_pushed)
+            self.stream.failed.connect(self.on_stream_failed)
+            # the stream is closed on the GUI thread, where close_stream() may also run
+            self.volume_ready.connect(self.on_volume_ready)
+        self.last_idx = None
+
+    def download(self) -> None:
+        self.download_future = self.client.submit(self.client.fetch_volume(self.case, self.plane, self.method))
+        self.download_future.add_done_callback(self.on_volume)
+
+    def request(self, idx: int) -> None:
+        first_request = self.last_idx is None
+        self.last_idx = idx
+        if self.stream is not None:
+            if idx in self.pushed:
+                self.slice_ready.emit(idx, self.pushed[idx])
+            if first_request:
+                self.stream.subscribe(self.case, self.plane, self.method, idx)
+            else:
+                self.stream.set_cursor(idx)
+            return
+        for pending_idx in [i for i in self.pending if i != idx]:
+            self.pending.pop(pending_idx).cancel()
+        if idx in self.pending and not self.pending[idx].done():
+            return
+        future = self.client.submit(self.client.fetch_slice(self.case, self.plane, idx, self.method))
+        self.pending[idx] = future
+        future.add_done_callback(lambda f: self.on_slice(idx, f))
+
+    def cancel(self) -> None:
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        if self.download_future is not None:
+            self.download_future.cancel()
+        self.close_stream()
+
+    def close_stream(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.pushed.clear()
+
+    @Slot(int, object)
+    def on_pushed(self, idx: int, img: np.ndarray) -> None:
+        self.pushed[idx] = img
+        self.slice_ready.emit(idx, img)
+
+    @Slot(object)
+    def on_volume_ready(self, volume: np.ndarray) -> None:
+        """ Every slice is in memory now, so nothing more has to be pushed """
+        self.close_stream()
+
+    @Slot(str)
+    def on_stream_failed(self, message: str) -> None:
+        self.close_stream()
+        if self.last_idx is not None:
+            self.request(self.last_idx)
+
+    def on_slice(self, idx: int, future: Future) -> None:
+        """ Called on the loop thread, the signal is queued to the GUI thread """
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed.emit(str(future.exception()))
+            return
+        self.slice_ready.emit(idx, future.result())
+
+    def on_volume(self, future: Future) -> None:
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed.emit(str(future.exception()))
+            return
+        self.volume_ready.emit(future.result())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(base_url: str) -> AsyncHttpClient:
+    """ The shared client of the process, started on first use and closed at exit """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncHttpClient(base_url)
+            atexit.register(_client.close)
+        return _client
@@ -0,0 +1,69 @@
+from PySide6.QtCore import Signal, QObject, QRunnable
+
+import threading
+
+import numpy as np
+
+from src.dicom_io import write_dicom
+
+
+class IngestSignals(QObject):
+    progress = Signal(int, int)
+    first_slice = Signal(object)
+    finished = Signal(dict)
+    failed = Signal(str)
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+class IngestTask(QRunnable):
+    """
+    Base class of a dataset ingest job running on the QThreadPool.
+    Subclasses implement process(), which reports through self.signals and
+    should call check_cancelled() between steps.
+    Nothing is emitted after cancel() is called, so a stale job never touches the widgets.
+    """
+    def __init__(self):
+        super().__init__()
+        self.signals = IngestSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise IngestCancelled()
+
+    def process(self) -> dict:
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            info = self.process()
+        except IngestCancelled:
+            return
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.failed.emit(str(e))
+            return
+        if not self.is_cancelled():
+            self.signals.finished.emit(info)
+
+
+class DicomExportTask(IngestTask):
+    """ Write a raw series as one multi-frame DICOM with its own bit depth """
+    def __init__(self, volume: np.ndarray, dcm_path: str, patient_id: str = ""):
+        super().__init__()
+        self.volume = volume
+        self.dcm_path = dcm_path
+        self.patient_id = patient_id
+
+    def process(self) -> dict:
+        write_dicom(self.volume, self.dcm_path, patient_id=self.patient_id)
+        return {"dcm_path": self.dcm_path}
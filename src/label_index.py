@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+
+
+TASKS = ("abnormal", "acl", "meniscus")
+
+
+class LabelIndex:
+    """
+    This Class keeps the labels of every case of one split (train/valid) in a compact array.
+
+    labels[row] = [abnormal, acl, meniscus] (-1 when the case is missing in a csv)
+    The row of a case id is found by a dict, so a lookup is O(1) without pandas.
+    The index is saved as a .npz file next to the volume cache with the mtimes of the csvs,
+    and it is rebuilt only when one of the csvs changes.
+    """
+    def __init__(self, case_ids: np.ndarray, labels: np.ndarray, mtimes: np.ndarray, dataset_root: str = ""):
+        self.case_ids = case_ids
+        self.labels = labels
+        self.mtimes = mtimes
+        self.dataset_root = dataset_root
+        self.rows = {int(case_id): row for row, case_id in enumerate(case_ids)}
+
+    def get(self, case_id: int) -> tuple:
+        """ Get (abnormal, acl, meniscus) of the given case id """
+        row = self.rows.get(int(case_id))
+        if row is None:
+            return (-1,) * len(TASKS)
+        return tuple(int(v) for v in self.labels[row])
+
+    @staticmethod
+    def get_csv_paths(dataset_root: str, split: str) -> list:
+        return [os.path.join(dataset_root, f"{split}_{task}.csv") for task in TASKS]
+
+    @staticmethod
+    def get_mtimes(csv_paths: list) -> np.ndarray:
+        return np.array(
+            [os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in csv_paths],
+            dtype=np.float64
+        )
+
+    @classmethod
+    def build(cls, csv_paths: list, dataset_root: str = "") -> "LabelIndex":
+        """ Read the csvs (no header, "case_id,label" rows) and merge them by case id """
+        columns = []
+        for csv_path in csv_paths:
+            if os.path.exists(csv_path):
+                rows = np.loadtxt(csv_path, delimiter=",", dtype=np.int64, ndmin=2)
+            else:
+                rows = np.empty((0, 2), dtype=np.int64)
+            columns.append(rows)
+
+        case_ids = np.unique(np.concatenate([rows[:, 0] for rows in columns]))
+        labels = np.full((case_ids.shape[0], len(TASKS)), -1, dtype=np.int8)
+        for task_idx, rows in enumerate(columns):
+            labels[np.searchsorted(case_ids, rows[:, 0]), task_idx] = rows[:, 1]
+        return cls(case_ids.astype(np.int32), labels, cls.get_mtimes(csv_paths), dataset_root)
+
+    def save(self, index_path: str) -> None:
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        tmp_path = index_path + ".tmp.npz"
+        np.savez(
+            tmp_path, case_ids=self.case_ids, labels=self.labels, 
+            mtimes=self.mtimes, dataset_root=np.array(self.dataset_root)
+        )
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path: str) -> "LabelIndex":
+        with np.load(index_path) as data:
+            return cls(data["case_ids"], data["labels"], data["mtimes"], str(data["dataset_root"]))
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_label_index(dataset_root: str, split: str, cache_dir: str) -> LabelIndex:
+    """
+    Get the label index of the split, built once per dataset root.
+    It is kept in memory and on disk (cache_dir/labels.npz), and is invalidated by the csv mtimes.
+    """
+    csv_paths = LabelIndex.get_csv_paths(dataset_root, split)
+    mtimes = LabelIndex.get_mtimes(csv_paths)
+    dataset_root = os.path.abspath(dataset_root)
+    key = (dataset_root, split)
+    index_path = os.path.join(cache_dir, "labels.npz")
+
+    with _lock:
+        index = _indexes.get(key)
+        if index is None and os.path.exists(index_path):
+            try:
+                index = LabelIndex.load(index_path)
+            except (OSError, ValueError, KeyError):
+                index = None
+        if (
+            index is None 
+            or index.dataset_root != dataset_root 
+            or not np.array_equal(index.mtimes, mtimes)
+        ):
+            index = LabelIndex.build(csv_paths, dataset_root)
+            index.save(index_path)
+        _indexes[key] = index
+        return index
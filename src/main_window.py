@@ -1,152 +1,143 @@
-
-from PySide6.QtCore import Slot, QSize, Signal, QObject, Qt
-from PySide6.QtGui import QCloseEvent, QIcon, QPixmap, QImage, QPainter
+from PySide6.QtCore import Slot, QSize, Signal, QObject, Qt, QTimer, QThreadPool
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QFrame, QPushButton,
-    QVBoxLayout, QLabel, QHBoxLayout, QFileDialog
-)
-from PySide6.QtCharts import (
-    QBarCategoryAxis, QBarSeries, QBarSet, QChart,
-    QChartView, QLineSeries, QValueAxis
+    QVBoxLayout, QLabel, QHBoxLayout, QFileDialog, QSpinBox
 )
 
 
 import os
-from collections import Counter
+from functools import partial
 
-import cv2
-from tqdm import tqdm
 import numpy as np
-import pandas as pd
-from glob import glob
 
+from src.case_browser import CaseBrowser
+from src.csv_label import CSVLabel
+from src.ingest import IngestTask, DicomExportTask
+from src.label_index import get_label_index
+from src.plane_view import PLANES, PlaneView
+from src.prefetcher import SlicePrefetcher
+from src.reslice import Reslicer
+from src.slice_canvas import SliceCanvas
+from src.window_level import WindowLevel
+from src.thumbnail_strip import ThumbnailStrip
+from src.volume_store import (
+    get_cache_path, get_cache_root, read_series_header, open_series, get_window_level, load_window_level,
+    iter_build_pyramid, is_pyramid_fresh, open_pyramid, PYRAMID_FACTORS
+)
 
 
 class Signals(QObject):
     wheel_controller = Signal(int)
+    window_level_controller = Signal(int, int)
+    window_level_reset = Signal()
     current_file_info = Signal(dict)
 
 signal = Signals()
 
 
-class ImageLabel(QLabel):
-    def __init__(self, obj_name: str):
+class VolumeIngestTask(IngestTask):
+    """ 
+    Open a dropped .npy or DICOM series and make everything its display reads, off the GUI thread:
+    the window/level of the raw series (its histogram is cached), the reslicer and the thumbnail pyramid.
+    The first slice is shown before the histogram pass over the whole series, through the window of that slice,
+    and shown again through the window/level of the series once it is made (at once when it is cached).
+    The finished info carries "volume", "window_level" and "reslicer" with the labels.
+    """
+    def __init__(self, file_path: str, dataset_root: str, split: str, info: dict):
         super().__init__()
-        self.setFixedSize(640, 640)
-        self.setAcceptDrops(True)
-        self.setAlignment(Qt.AlignCenter)
-        self.setText("\n\n Drop Image Here \n\n")
-        self.setStyleSheet(
-            """
-            QLabel{
-                border: 3px dashed #aaa
-            }
-        """
-        )
-        # all_signals.image_size.emit("")
-        self.setObjectName(obj_name)
-
-    def setPixmap(self, image):
-        super().setPixmap(image)
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasImage:
-            event.accept()
-        else:
-            event.ignore()
-
-    def dragMoveEvent(self, event):
-        if event.mimeData().hasImage:
-            event.accept()
-        else:
-            event.ignore()
+        self.file_path = file_path
+        self.dataset_root = dataset_root
+        self.split = split
+        self.info = info
 
-    def dropEvent(self, event):
-        if event.mimeData().hasImage:
-            event.setDropAction(Qt.CopyAction)
-            file_path = event.mimeData().urls()[0].toLocalFile()
-            self.preprocess(file_path)
-            event.accept()
-        else:
-            event.ignore()
+    def process(self) -> dict:
+        save_path = self.info["save_path"]
+        volume = open_series(self.file_path)
+        window_level = load_window_level(volume, self.file_path, save_path)
+        if window_level is None:
+            self.check_cancelled()
+            if volume.shape[0]:
+                first = np.asarray(volume[0])
+                self.signals.first_slice.emit(WindowLevel(first).apply(first))
+            window_level = get_window_level(volume, self.file_path, save_path)
+        self.check_cancelled()
+        if volume.shape[0]:
+            self.signals.first_slice.emit(window_level.apply(np.asarray(volume[0])))
 
-    def wheelEvent(self, event):
-        signal.wheel_controller.emit(event.angleDelta().y())
+        # the thumbnails of the strip (1/4 and 1/16 scale), made once per series
+        if not is_pyramid_fresh(self.file_path, save_path):
+            for done, total in iter_build_pyramid(volume, window_level, save_path):
+                self.check_cancelled()
+                self.signals.progress.emit(done, total)
+        self.check_cancelled()
+        label_index = get_label_index(self.dataset_root, self.split, self.info["cache_dir"])
+        file_name = self.info["file_name"]
+        self.info["labels"] = label_index.get(int(file_name)) if file_name.isdigit() else (-1, -1, -1)
+        self.info.update(volume=volume, window_level=window_level, reslicer=Reslicer(volume))
+        return self.info
 
-    def preprocess(self, file_path: str):
-        root_path = '/'.join(os.path.dirname(__file__).split('\\')[:-1])
+    @classmethod
+    def from_file_path(cls, file_path: str) -> "VolumeIngestTask":
+        """ Parse ${DATASET_ROOT}/{train,valid}/<plane>/<case>.npy (or .dcm) into the file info """
+        root_path = get_cache_root()
         method = ""
-        csv_paths = None
         if "train" in file_path:
+            split = "train"
             new_csv_path = file_path.split("train/")[0]
             new_file_path = file_path.split("train/")[-1]
-            method = "train_jpg"
-            csv_paths = sorted(glob(os.path.join(new_csv_path, "train*.csv")))
+            method = "train_cache"
         else:
+            split = "valid"
             new_csv_path = file_path.split("valid/")[0]
             new_file_path = file_path.split("valid/")[-1]
-            method = "valid_jpg"
-            csv_paths = sorted(glob(os.path.join(new_csv_path, "valid*.csv")))
+            method = "valid_cache"
         
         plane = new_file_path.split("/")[0]
-        file_name = new_file_path.split("/")[-1].replace('.npy', '')
-        save_path = os.path.join(root_path, method, plane, file_name)
-        np_img = np.load(file_path)
+        file_name = os.path.splitext(new_file_path.split("/")[-1])[0]
+        cache_dir = os.path.join(root_path, method)
+        save_path = get_cache_path(os.path.join(cache_dir, plane), file_name)
+        shape, _ = read_series_header(file_path)
         
-        if not os.path.exists(save_path):
-            os.makedirs(save_path)
-            for idx in range(np_img.shape[0]):
-                img = np_img[idx, :, :]
-                img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
-                cv2.imwrite(os.path.join(save_path, f'{idx}.jpg'), img)
-                
-        csvs = [pd.read_csv(csv_path) for csv_path in csv_paths]
         _info =  {
             "plane": plane,
             "save_path": save_path,
+            "cache_dir": cache_dir,
+            "file_path": file_path,
             "file_name": file_name,
             "method": method,
-            "length": np_img.shape[0],
-            "csvs": csvs,
+            "length": shape[0],
         }
-        signal.current_file_info.emit(_info)
+        return cls(file_path, new_csv_path, split, _info)
 
 
-class CSVLabel(QFrame):
-    def __init__(self):
+class ImageLabel(SliceCanvas):
+    """
+    This Class is the drop target and slice canvas of a viewer.
+    Drops, wheel and window/level mouse events are only emitted: the owner (window or pane) connects them
+    """
+    file_info = Signal(dict)
+    file_dropped = Signal(str)
+    wheel_moved = Signal(int)
+    window_level_dragged = Signal(int, int)
+    window_level_reset = Signal()
+
+    def __init__(self, obj_name: str, size: int = 640):
         super().__init__()
+        self.setFixedSize(size, size)
         self.setAcceptDrops(True)
-        self.setFixedSize(300, 370)
-        
-        main_layout = QVBoxLayout()
-        main_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.setAlignment(Qt.AlignTop)
-        self.title = QLabel("Drop csv file Here")
-        self.title.setFixedSize(280, 70)
-        self.chart = QChart()
-        self.chart.setAnimationOptions(QChart.SeriesAnimations)
-
-        self.chart_view = QChartView(self.chart)
-        self.chart_view.setFixedSize(QSize(280, 300))
-        self.chart_view.setRenderHint(QPainter.Antialiasing)
-        
-        main_layout.addWidget(self.title)
-        main_layout.addWidget(self.chart_view)
-        self.setLayout(main_layout)
-                 
-        self.title.setAlignment(Qt.AlignCenter)
-        self.title.setText("\n\n Drop csv file Here \n\n")
-        self.title.setStyleSheet(
+        self.setAlignment(Qt.AlignCenter)
+        self.setText("\n\n Drop Image Here \n\n")
+        self.setStyleSheet(
             """
             QLabel{
                 border: 3px dashed #aaa
             }
         """
         )
-        
-        self.title.dragEnterEvent = self.dragEnterEvent
-        self.title.dragMoveEvent = self.dragMoveEvent
-        self.title.dropEvent = self.dropEvent
+        self.setObjectName(obj_name)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.ingest_task = None
+        self.drag_pos = None
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasImage:
@@ -164,32 +155,80 @@ class CSVLabel(QFrame):
         if event.mimeData().hasImage:
             event.setDropAction(Qt.CopyAction)
             file_path = event.mimeData().urls()[0].toLocalFile()
-            self.preprocess(file_path)
+            self.file_dropped.emit(file_path)
             event.accept()
         else:
             event.ignore()
-            
+
+    def wheelEvent(self, event):
+        self.wheel_moved.emit(event.angleDelta().y())
+
+    def mousePressEvent(self, event):
+        self.drag_pos = event.position().toPoint()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton and self.drag_pos is not None:
+            pos = event.position().toPoint()
+            delta = pos - self.drag_pos
+            self.drag_pos = pos
+            self.window_level_dragged.emit(delta.x(), delta.y())
+
+    def mouseReleaseEvent(self, event):
+        self.drag_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.window_level_reset.emit()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape and self.ingest_task is not None:
+            self.cancel_ingest()
+            self.setText("\n\n Canceled. Drop Image Here \n\n")
+        else:
+            super().keyPressEvent(event)
+
+    def cancel_ingest(self) -> None:
+        if self.ingest_task is not None:
+            self.ingest_task.cancel()
+            self.ingest_task = None
+
+    @Slot(int, int)
+    def show_progress(self, done: int, total: int):
+        if not self.has_slice():
+            self.setText(f"\n\n Converting... {done}/{total} \n\n")
+
+    @Slot(object)
+    def show_first_slice(self, img: np.ndarray):
+        self.set_slice(img)
+
+    @Slot(dict)
+    def finish_ingest(self, info: dict):
+        self.ingest_task = None
+        self.file_info.emit(info)
+
+    @Slot(str)
+    def fail_ingest(self, message: str):
+        self.ingest_task = None
+        self.setText(f"\n\n Failed: {message} \n\n")
+
+    def start_ingest(self, task: IngestTask) -> None:
+        """ Run the ingest task on the thread pool, cancelling the former one """
+        self.cancel_ingest()
+        self.clear_slice()
+        self.setFocus()
+        self.ingest_task = task
+        task.signals.progress.connect(self.show_progress)
+        task.signals.first_slice.connect(self.show_first_slice)
+        task.signals.finished.connect(self.finish_ingest)
+        task.signals.failed.connect(self.fail_ingest)
+        QThreadPool.globalInstance().start(task)
+
     def preprocess(self, file_path: str):
-        csv_file = pd.read_csv(file_path)
-        self.title.setText(f"File Name: {file_path.split('/')[-1]}")
-        res = [csv_file.iloc[i, 1] for i in range(csv_file.shape[0])]
-        res = Counter(res)
-        keys, values = list(res.keys()), list(res.values())
-        cat_dict = {0: "Normal", 1: "Abnormal"}
- 
-        self.set0 = QBarSet("Dignosis")
-        self.set0.append(values)
-        self.bar_series = QBarSeries()
-        self.bar_series.append(self.set0)
-        self.chart.addSeries(self.bar_series)
-        self.chart.createDefaultAxes()
-        self.chart.legend().setVisible(True)
-        
-        self.categories = [cat_dict[key] for key in keys]
-        self.axis_x = QBarCategoryAxis()
-        self.axis_x.append(self.categories)
-        self.chart.setAxisX(self.axis_x)
-        self.chart_view.update()
+        """ 
+        Convert the dropped series on the thread pool. 
+        The window keeps responding, and the first slice is shown as soon as it is converted.
+        Dropping another file or pressing Esc cancels the running job.
+        """
+        self.start_ingest(VolumeIngestTask.from_file_path(file_path))
 
 
 class MainWindow(QMainWindow):
@@ -199,7 +238,7 @@ class MainWindow(QMainWindow):
         self.initial_window()
 
     def initial_window(self) -> None:
-        self.setFixedSize(QSize(1020, 800))
+        self.setFixedSize(QSize(1020, 900))
         main_widget = QWidget()
         main_layout = QHBoxLayout()
         
@@ -215,19 +254,38 @@ class MainWindow(QMainWindow):
         img_layout.addWidget(self.original_label)
         img_frame.setLayout(img_layout)
         left_layout.addWidget(img_frame)
+        self.thumbnail_strip = ThumbnailStrip()
+        left_layout.addWidget(self.thumbnail_strip)
         
         btn_frame = QFrame()
         btn_layout = QHBoxLayout()
         formal_btn = QPushButton("<")
         next_btn = QPushButton(">")
+        planes_btn = QPushButton("3 Planes")
+        cases_btn = QPushButton("Cases")
+        export_btn = QPushButton("Export DICOM")
+        # orientation of the resliced plane, 0 / 0 is the stored axis
+        self.yaw_spin = QSpinBox()
+        self.pitch_spin = QSpinBox()
+        for spin, name in ((self.yaw_spin, "yaw"), (self.pitch_spin, "pitch")):
+            spin.setRange(-90, 90)
+            spin.setSingleStep(5)
+            spin.setPrefix(f"{name} ")
+            spin.setSuffix("°")
+            spin.valueChanged.connect(self.change_orientation)
         btn_layout.addWidget(formal_btn)
         btn_layout.addWidget(next_btn)
+        btn_layout.addWidget(planes_btn)
+        btn_layout.addWidget(cases_btn)
+        btn_layout.addWidget(export_btn)
+        btn_layout.addWidget(self.yaw_spin)
+        btn_layout.addWidget(self.pitch_spin)
         btn_frame.setLayout(btn_layout)
         left_layout.addWidget(btn_frame)  
         
         right_layout = QVBoxLayout()
-        csv_label1 = CSVLabel()
-        csv_label2 = CSVLabel()
+        csv_label1 = CSVLabel("labels")
+        csv_label2 = CSVLabel("slices")
         right_layout.addWidget(csv_label1)
         right_layout.addWidget(csv_label2)
         
@@ -238,33 +296,79 @@ class MainWindow(QMainWindow):
         
         formal_btn.clicked.connect(self.formal_img)
         next_btn.clicked.connect(self.next_img)
+        planes_btn.clicked.connect(self.open_multi_plane)
+        cases_btn.clicked.connect(self.open_case_browser)
+        export_btn.clicked.connect(self.export_dicom)
+        self.thumbnail_strip.slice_selected.connect(self.select_slice)
+        self.original_label.file_dropped.connect(self.original_label.preprocess)
+        self.original_label.wheel_moved.connect(signal.wheel_controller)
+        self.original_label.window_level_dragged.connect(signal.window_level_controller)
+        self.original_label.window_level_reset.connect(signal.window_level_reset)
+        self.original_label.file_info.connect(signal.current_file_info)
         signal.wheel_controller.connect(self.change_idx)
+        signal.window_level_controller.connect(self.change_window)
+        signal.window_level_reset.connect(self.reset_window)
         signal.current_file_info.connect(self.set_current_img_folder)
+        self.multi_plane_window = None
+        self.case_browser = None
+        
+        # slices are decoded in the background, and a burst of wheel events is
+        # coalesced by the paint timer so only the final index is painted.
+        self.prefetcher = SlicePrefetcher(self)
+        self.prefetcher.ready.connect(self.show_slice)
+        self.prefetcher.failed.connect(self.fail_slice)
+        self.paint_timer = QTimer(self)
+        self.paint_timer.setSingleShot(True)
+        self.paint_timer.setInterval(15)
+        self.paint_timer.timeout.connect(self.set_img)
         
     @Slot(dict)
     def set_current_img_folder(self, folder_name: dict):
         self.file_name = folder_name["file_name"]
+        self.file_path = folder_name["file_path"]
         self.plane = folder_name["plane"]
         self.save_path = folder_name["save_path"]
         self.length = folder_name["length"]
-        self.labels = []
-        for csv in folder_name["csvs"]:
-            new_data = {
-                csv.columns[0]: int(csv.columns[0]),
-                csv.columns[1]: csv.columns[1]
-            }
-            csv.loc[len(csv)] = new_data
-            csv.columns = ["file_name", "label"]
-            csv = csv.sort_values(by="file_name")
-            print(csv)
-            self.labels.append(
-                csv.loc[csv["file_name"] == int(self.file_name), 'label'].values[0]
-            )
+        self.labels = folder_name["labels"]
         self.current_idx = 0
+        # slices are shown from the raw series through the window/level LUT (no dynamic range is lost)
+        self.volume = folder_name["volume"]
+        self.window_level = folder_name["window_level"]
+        self.reslicer = folder_name["reslicer"]
+        try:
+            self.pyramid = open_pyramid(self.save_path, PYRAMID_FACTORS[-1])
+        except (OSError, ValueError):
+            self.pyramid = None
+        self.thumbnail_strip.set_level(self.pyramid)
+        for spin in (self.yaw_spin, self.pitch_spin):
+            spin.blockSignals(True)
+            spin.setValue(0)
+            spin.blockSignals(False)
+        self.prefetcher.reset(partial(self.load_slice, self.reslicer, self.window_level), self.length)
+        self.set_img()
+
+    @staticmethod
+    def load_slice(volume: np.ndarray | Reslicer, window_level: WindowLevel, idx: int) -> np.ndarray:
+        """ 
+        Called on a worker thread by the prefetcher. 
+        volume[idx] is a view of the memmap, or an oblique slice sampled (and cached) by the reslicer.
+        """
+        return window_level.apply(volume[idx])
+
+    def change_orientation(self):
+        """ Reslice the series at the yaw / pitch of the spin boxes, keeping the relative position """
+        if getattr(self, "reslicer", None) is None:
+            return
+        position = self.current_idx / max(self.length - 1, 1)
+        self.reslicer.set_orientation(self.yaw_spin.value(), self.pitch_spin.value())
+        self.length = len(self.reslicer)
+        self.current_idx = round(position * (self.length - 1))
+        # the thumbnails are slices of the stored axis only
+        self.thumbnail_strip.set_level(self.pyramid if self.reslicer.orientation == (0.0, 0.0) else None)
+        self.prefetcher.reset(self.prefetcher.loader, self.length)
         self.set_img()
 
     def set_img(self):
-        _file_name = os.path.join(self.save_path, f'{self.current_idx}.jpg')
         self.title_label.setText(
             "Plane: {}, File Name: {}, Length: {}, Index: {}, abnormal: {}, acl: {}, meniscus: {}" \
                 .format(
@@ -272,21 +376,140 @@ class MainWindow(QMainWindow):
                     self.labels[0], self.labels[1], self.labels[2]
                 )
         )
-        self.original_label.setPixmap(QPixmap(QImage(_file_name).scaled(640, 640)))
+        img = self.prefetcher.request(self.current_idx)
+        if img is not None:
+            self.original_label.set_slice(img)
+        self.thumbnail_strip.set_current(self.current_idx)
+
+    @Slot(int)
+    def select_slice(self, idx: int):
+        """ A thumbnail was clicked: only that slice is loaded at full resolution """
+        self.current_idx = idx
+        self.set_img()
+
+    @Slot(int, object)
+    def show_slice(self, idx: int, img: np.ndarray):
+        if idx == self.current_idx:
+            self.original_label.set_slice(img)
+
+    @Slot(int, str)
+    def fail_slice(self, idx: int, message: str):
+        if idx == self.current_idx:
+            self.original_label.setText(f"\n\n Failed to load slice {idx}: {message} \n\n")
 
     def next_img(self):
         if self.current_idx < self.length-1:
             self.current_idx += 1
-            self.set_img()
+            self.paint_timer.start()
 
     def formal_img(self):
         if self.current_idx > 0:
             self.current_idx -= 1
-            self.set_img()
+            self.paint_timer.start()
+
+    @Slot(int, int)
+    def change_window(self, dx: int, dy: int):
+        """ Rebuild the LUT, repaint the current slice at once and re-decode the prefetched ones """
+        if getattr(self, "window_level", None) is None:
+            return
+        self.window_level.adjust(dx, dy)
+        self.apply_window()
+
+    @Slot()
+    def reset_window(self):
+        if getattr(self, "window_level", None) is None:
+            return
+        self.window_level.reset()
+        self.apply_window()
+
+    def apply_window(self):
+        self.prefetcher.reset(self.prefetcher.loader, self.length)
+        self.original_label.set_slice(self.prefetcher.loader(self.current_idx))
 
     @Slot(int)    
     def change_idx(self, value: int):
         if value > 0:
             self.next_img()
         else:
-            self.formal_img()
\ No newline at end of file
+            self.formal_img()
+
+    def open_multi_plane(self):
+        """ Open every plane of the current case in the three-pane window """
+        if self.multi_plane_window is None:
+            self.multi_plane_window = MultiPlaneWindow()
+        self.multi_plane_window.show()
+        if hasattr(self, "file_path"):
+            self.multi_plane_window.open_case(self.file_path)
+
+    def open_case_browser(self):
+        """ The series picked in the case list is opened like a dropped file """
+        if self.case_browser is None:
+            self.case_browser = CaseBrowser()
+            self.case_browser.case_selected.connect(self.original_label.preprocess)
+        self.case_browser.show()
+
+    def export_dicom(self):
+        """ Save the raw series of the current plane as a multi-frame DICOM on the thread pool """
+        volume = getattr(self, "volume", None)
+        if volume is None:
+            return
+        dcm_path, _ = QFileDialog.getSaveFileName(self, "Export DICOM", "", "DICOM (*.dcm)")
+        if not dcm_path:
+            return
+        task = DicomExportTask(volume, dcm_path, self.file_name)
+        task.signals.finished.connect(lambda info: self.title_label.setText(f"Exported {info['dcm_path']}"))
+        task.signals.failed.connect(lambda message: self.title_label.setText(f"Export failed: {message}"))
+        self.export_task = task
+        QThreadPool.globalInstance().start(task)
+
+
+class MultiPlaneWindow(QMainWindow):
+    """ 
+    Show axial, coronal and sagittal series of a case side by side.
+    Each plane is converted by its own ingest task, so the three planes are loaded in parallel
+    on the thread pool, and each pane keeps its own index and cache.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.setWindowTitle("Knee MRI Viewer - 3 Planes")
+        main_widget = QWidget()
+        main_layout = QVBoxLayout()
+        self.title_label = QLabel("Drop a .npy or .dcm file of any plane")
+        self.title_label.setStyleSheet("font-size: 15px;")
+        self.title_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(self.title_label)
+
+        pane_layout = QHBoxLayout()
+        self.panes = {}
+        for plane in PLANES:
+            image_label = ImageLabel(plane, 400)
+            pane = PlaneView(image_label, plane)
+            image_label.file_dropped.connect(self.open_case)
+            image_label.file_info.connect(self.set_current_img_folder)
+            pane_layout.addWidget(pane)
+            self.panes[plane] = pane
+        main_layout.addLayout(pane_layout)
+        main_widget.setLayout(main_layout)
+        self.setCentralWidget(main_widget)
+
+    def open_case(self, file_path: str):
+        """ Find the other planes of the case (${DATASET_ROOT}/<split>/<plane>/<case>.npy) and load all of them """
+        case_dir = os.path.dirname(os.path.dirname(file_path))
+        case_file = os.path.basename(file_path)
+        for plane, pane in self.panes.items():
+            plane_path = os.path.join(case_dir, plane, case_file).replace('\\', '/')
+            if not os.path.exists(plane_path):
+                pane.image_label.setText(f"\n\n No {plane} series \n\n")
+                continue
+            pane.image_label.start_ingest(VolumeIngestTask.from_file_path(plane_path))
+
+    @Slot(dict)
+    def set_current_img_folder(self, folder_name: dict):
+        pane = self.panes[folder_name["plane"]]
+        pane.set_volume(folder_name["volume"], folder_name["window_level"])
+        labels = folder_name["labels"]
+        self.title_label.setText(
+            "File Name: {}, abnormal: {}, acl: {}, meniscus: {}".format(
+                folder_name["file_name"], labels[0], labels[1], labels[2]
+            )
+        )
@@ -1,38 +1,103 @@
-
-from PySide6.QtCore import Slot, QSize, Signal, QObject, Qt
-from PySide6.QtGui import QCloseEvent, QIcon, QPixmap, QImage, QPainter
+from PySide6.QtCore import Slot, QSize, Signal, QObject, Qt, QTimer, QThreadPool
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QFrame, QPushButton,
     QVBoxLayout, QLabel, QHBoxLayout, QFileDialog
 )
-from PySide6.QtCharts import (
-    QBarCategoryAxis, QBarSeries, QBarSet, QChart,
-    QChartView, QLineSeries, QValueAxis
-)
 
 import os
-import cv2
+import uuid
+import asyncio
 import numpy as np
-import pandas as pd
-import requests
-from collections import Counter
+from functools import partial
 
-import aiohttp
-import asyncio
+from src.case_browser import CaseBrowser
+from src.csv_label import CSVLabel
+from src.dicom_io import is_dicom_path
+from src.http_client import HttpTask, RemoteSeries, get_client
+from src.ingest import DicomExportTask
+from src.plane_view import PLANES, PlaneView
+from src.prefetcher import SlicePrefetcher
+from src.slice_canvas import SliceCanvas
+from src.volume_store import get_series_cache_path, get_window_level, open_series
+from src.window_level import WindowLevel
 
 
 class Signals(QObject):
     wheel_controller = Signal(int)
+    window_level_controller = Signal(int, int)
+    window_level_reset = Signal()
     current_file_info = Signal(dict)
     
 signal = Signals()
 
+BACKEND_URL = "http://localhost:8000"
+# prefix of the case keys, so the volumes of this client never collide with other clients
+SESSION_ID = uuid.uuid4().hex[:8]
+
+
+def get_plane(file_path: str) -> str:
+    """ ${DATASET_ROOT}/<split>/<plane>/<case>.npy -> plane (sagittal if the folder is not a plane) """
+    plane = os.path.basename(os.path.dirname(file_path))
+    return plane if plane in PLANES else "sagittal"
+
+
+class UploadTask(HttpTask):
+    """ 
+    Upload a .npy or DICOM file to /preprocess on the client loop.
+    The raw file is streamed in chunks (the server parses it while it arrives), 
+    so the progress is reported in bytes and cancel() aborts the request at once.
+    The window/level is made from the local file on a worker thread while it is uploaded
+    (its histogram is cached like the local viewer's), so every slice shown before the volume
+    is downloaded goes through the same LUT as the slices shown after.
+    The volume is not downloaded here: the window shows single slices until it arrives.
+    """
+    def __init__(self, file_path: str, plane: str):
+        super().__init__(get_client(BACKEND_URL))
+        self.file_path = file_path
+        self.plane = plane
+        self.case = "{}-{}".format(SESSION_ID, os.path.splitext(os.path.basename(file_path))[0])
+
+    def make_window_level(self) -> WindowLevel:
+        """ Called on a worker thread """
+        return get_window_level(open_series(self.file_path), self.file_path, get_series_cache_path(self.file_path))
+
+    async def process(self) -> dict:
+        loop = asyncio.get_running_loop()
+        result, window_level = await asyncio.gather(
+            self.client.upload(
+                self.file_path, {"plane": self.plane, "case": self.case},
+                "application/dicom" if is_dicom_path(self.file_path) else "application/octet-stream",
+                on_progress=self.signals.progress.emit
+            ),
+            loop.run_in_executor(None, self.make_window_level),
+        )
+        self.check_cancelled()
+        img = await self.client.fetch_slice(self.case, self.plane, 0)
+        self.signals.first_slice.emit(window_level.apply(img))
+        return {
+            "file_path": self.file_path,
+            "case": self.case,
+            "plane": self.plane,
+            "length": result["length"],
+            "prediction": result.get("prediction"),
+            "window_level": window_level,
+        }
+
 
+class ImageLabel(SliceCanvas):
+    """
+    This Class is the drop target and slice canvas of a viewer.
+    Drops, wheel and window/level mouse events are only emitted: the owner (window or pane) connects them
+    """
+    file_info = Signal(dict)
+    file_dropped = Signal(str)
+    wheel_moved = Signal(int)
+    window_level_dragged = Signal(int, int)
+    window_level_reset = Signal()
 
-class ImageLabel(QLabel):
-    def __init__(self, obj_name: str):
+    def __init__(self, obj_name: str, size: int = 640):
         super().__init__()
-        self.setFixedSize(640, 640)
+        self.setFixedSize(size, size)
         self.setAcceptDrops(True)
         self.setAlignment(Qt.AlignCenter)
         self.setText("\n\n Drop Image Here \n\n")
@@ -44,9 +109,9 @@ class ImageLabel(QLabel):
         """
         )
         self.setObjectName(obj_name)
-
-    def setPixmap(self, image):
-        super().setPixmap(image)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.ingest_task = None
+        self.drag_pos = None
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasImage:
@@ -64,111 +129,88 @@ class ImageLabel(QLabel):
         if event.mimeData().hasImage:
             event.setDropAction(Qt.CopyAction)
             file_path = event.mimeData().urls()[0].toLocalFile()
-            self.preprocess(file_path)
+            self.file_dropped.emit(file_path)
             event.accept()
         else:
             event.ignore()
             
     def wheelEvent(self, event):
-        signal.wheel_controller.emit(event.angleDelta().y())
-        
-    def preprocess(self, file_path: str):
-        result = requests.post(
-            "http://localhost:8000/preprocess", 
-            files={ 
-                "file": open(file_path, "rb"),
-                "plane": "sagittal"
-            }
-        )
-        # print(result.json()["message"])
-        signal.current_file_info.emit(result.json())
+        self.wheel_moved.emit(event.angleDelta().y())
 
+    def mousePressEvent(self, event):
+        self.drag_pos = event.position().toPoint()
 
-class CSVLabel(QFrame):
-    def __init__(self):
-        super().__init__()
-        self.setAcceptDrops(True)
-        self.setFixedSize(300, 370)
-        
-        main_layout = QVBoxLayout()
-        main_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.setAlignment(Qt.AlignTop)
-        self.title = QLabel("Drop csv file Here")
-        self.title.setFixedSize(280, 70)
-        self.chart = QChart()
-        self.chart.setAnimationOptions(QChart.SeriesAnimations)
-
-        self.chart_view = QChartView(self.chart)
-        self.chart_view.setFixedSize(QSize(280, 300))
-        self.chart_view.setRenderHint(QPainter.Antialiasing)
-        
-        main_layout.addWidget(self.title)
-        main_layout.addWidget(self.chart_view)
-        self.setLayout(main_layout)
-                 
-        self.title.setAlignment(Qt.AlignCenter)
-        self.title.setText("\n\n Drop csv file Here \n\n")
-        self.title.setStyleSheet(
-            """
-            QLabel{
-                border: 3px dashed #aaa
-            }
-        """
-        )
-        
-        self.title.dragEnterEvent = self.dragEnterEvent
-        self.title.dragMoveEvent = self.dragMoveEvent
-        self.title.dropEvent = self.dropEvent
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton and self.drag_pos is not None:
+            pos = event.position().toPoint()
+            delta = pos - self.drag_pos
+            self.drag_pos = pos
+            self.window_level_dragged.emit(delta.x(), delta.y())
 
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasImage:
-            event.accept()
-        else:
-            event.ignore()
+    def mouseReleaseEvent(self, event):
+        self.drag_pos = None
 
-    def dragMoveEvent(self, event):
-        if event.mimeData().hasImage:
-            event.accept()
-        else:
-            event.ignore()
+    def mouseDoubleClickEvent(self, event):
+        self.window_level_reset.emit()
 
-    def dropEvent(self, event):
-        if event.mimeData().hasImage:
-            event.setDropAction(Qt.CopyAction)
-            file_path = event.mimeData().urls()[0].toLocalFile()
-            self.preprocess(file_path)
-            event.accept()
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape and self.ingest_task is not None:
+            self.cancel_ingest()
+            self.setText("\n\n Canceled. Drop Image Here \n\n")
         else:
-            event.ignore()
-            
-    def preprocess(self, file_path: str):
-        csv_file = pd.read_csv(file_path)
-        self.title.setText(f"File Name: {file_path.split('/')[-1]}")
-        res = [csv_file.iloc[i, 1] for i in range(csv_file.shape[0])]
-        res = Counter(res)
-        keys, values = list(res.keys()), list(res.values())
-        cat_dict = {0: "Normal", 1: "Abnormal"}
- 
-        self.set0 = QBarSet("Dignosis")
-        self.set0.append(values)
-        self.bar_series = QBarSeries()
-        self.bar_series.append(self.set0)
-        self.chart.addSeries(self.bar_series)
-        self.chart.createDefaultAxes()
-        self.chart.legend().setVisible(True)
+            super().keyPressEvent(event)
+
+    def cancel_ingest(self) -> None:
+        if self.ingest_task is not None:
+            self.ingest_task.cancel()
+            self.ingest_task = None
+
+    @Slot(int, int)
+    def show_progress(self, sent: int, total: int):
+        self.setText(f"\n\n Uploading... {sent // 1024} / {total // 1024} KB \n\n")
+
+    @Slot(object)
+    def show_first_slice(self, img: np.ndarray):
+        self.set_slice(img)
+
+    @Slot(dict)
+    def finish_ingest(self, response: dict):
+        self.ingest_task = None
+        self.file_info.emit(response)
+
+    @Slot(str)
+    def fail_ingest(self, message: str):
+        self.ingest_task = None
+        self.setText(f"\n\n Failed: {message} \n\n")
         
-        self.categories = [cat_dict[key] for key in keys]
-        self.axis_x = QBarCategoryAxis()
-        self.axis_x.append(self.categories)
-        self.chart.setAxisX(self.axis_x)
-        self.chart_view.update()
+    def start_ingest(self, task: UploadTask) -> None:
+        """ Run the upload task on the client loop, cancelling the former one """
+        self.cancel_ingest()
+        self.setFocus()
+        self.ingest_task = task
+        task.signals.progress.connect(self.show_progress)
+        task.signals.first_slice.connect(self.show_first_slice)
+        task.signals.finished.connect(self.finish_ingest)
+        task.signals.failed.connect(self.fail_ingest)
+        task.start()
         
+    def preprocess(self, file_path: str):
+        """ Upload in the background. Dropping another file or pressing Esc cancels it. """
+        self.start_ingest(UploadTask(file_path, get_plane(file_path)))
 
 
 class MainWindow(QMainWindow):
     def __init__(self) -> None:
         super().__init__()
         self.setWindowTitle("Knee MRI Viewer")
+        # plane -> (slices, h, w) array fetched once by /volume/{plane}
+        self.volume_cache = {}
+        self.remote = None
+        self.volume = None
+        self.remote_slice = None
+        self.window_level = None
+        self.multi_plane_window = None
+        self.case_browser = None
         self.initial_window()
         
     def initial_window(self) -> None:
@@ -192,14 +234,20 @@ class MainWindow(QMainWindow):
         btn_layout = QHBoxLayout()
         formal_btn = QPushButton("<")
         next_btn = QPushButton(">")
+        planes_btn = QPushButton("3 Planes")
+        cases_btn = QPushButton("Cases")
+        export_btn = QPushButton("Export DICOM")
         btn_layout.addWidget(formal_btn)
         btn_layout.addWidget(next_btn)
+        btn_layout.addWidget(planes_btn)
+        btn_layout.addWidget(cases_btn)
+        btn_layout.addWidget(export_btn)
         btn_frame.setLayout(btn_layout)
         left_layout.addWidget(btn_frame)  
         
         right_layout = QVBoxLayout()
-        csv_label1 = CSVLabel()
-        csv_label2 = CSVLabel()
+        csv_label1 = CSVLabel("labels")
+        csv_label2 = CSVLabel("slices")
         right_layout.addWidget(csv_label1)
         right_layout.addWidget(csv_label2)
         
@@ -210,38 +258,213 @@ class MainWindow(QMainWindow):
         
         formal_btn.clicked.connect(self.formal_img)
         next_btn.clicked.connect(self.next_img)
+        planes_btn.clicked.connect(self.open_multi_plane)
+        cases_btn.clicked.connect(self.open_case_browser)
+        export_btn.clicked.connect(self.export_dicom)
+        self.original_label.file_dropped.connect(self.original_label.preprocess)
+        self.original_label.wheel_moved.connect(signal.wheel_controller)
+        self.original_label.window_level_dragged.connect(signal.window_level_controller)
+        self.original_label.window_level_reset.connect(signal.window_level_reset)
+        self.original_label.file_info.connect(signal.current_file_info)
         signal.wheel_controller.connect(self.change_idx)
+        signal.window_level_controller.connect(self.change_window)
+        signal.window_level_reset.connect(self.reset_window)
         signal.current_file_info.connect(self.set_current_img_folder)
         
+        # slices are decoded in the background, and a burst of wheel events is
+        # coalesced by the paint timer so only the final index is painted.
+        self.prefetcher = SlicePrefetcher(self)
+        self.prefetcher.ready.connect(self.show_slice)
+        self.prefetcher.failed.connect(self.fail_slice)
+        self.paint_timer = QTimer(self)
+        self.paint_timer.setSingleShot(True)
+        self.paint_timer.setInterval(15)
+        self.paint_timer.timeout.connect(self.set_img)
+        
     @Slot(dict)
     def set_current_img_folder(self, response: dict):
-        self.plane = "sagittal"
+        self.file_path = response["file_path"]
+        self.plane = response["plane"]
         self.length = response["length"]
         self.current_idx = 0
+        self.volume = None
+        self.remote_slice = None
+        self.window_level = response["window_level"]
+        self.prefetcher.reset(None, 0)
+        # slices are pushed around the cursor while the whole plane is downloaded once,
+        # then every slice is served from memory
+        if self.remote is not None:
+            self.remote.cancel()
+        self.remote = RemoteSeries(get_client(BACKEND_URL), response["case"], self.plane, push=True, parent=self)
+        self.remote.slice_ready.connect(partial(self.show_remote_slice, self.remote))
+        self.remote.volume_ready.connect(partial(self.set_volume, self.remote))
+        self.remote.failed.connect(self.fail_remote)
+        self.remote.download()
+        self.set_title(response.get("prediction"))
+        self.set_img()
+
+    def set_volume(self, remote: RemoteSeries, volume: np.ndarray):
+        if remote is not self.remote:
+            return
+        self.volume_cache[self.plane] = volume
+        self.volume = volume
+        self.remote_slice = None
+        self.prefetcher.reset(partial(self.load_slice, volume, self.window_level), self.length)
         self.set_img()
 
+    def show_remote_slice(self, remote: RemoteSeries, idx: int, img: np.ndarray):
+        """ Until the volume is downloaded, the raw slices go through the window/level of the upload """
+        if remote is self.remote and idx == self.current_idx and self.volume is None:
+            self.remote_slice = img
+            self.original_label.set_slice(self.window_level.apply(img))
+
+    @Slot(str)
+    def fail_remote(self, message: str):
+        self.title_label.setText(f"Failed: {message}")
+
+    def set_title(self, prediction: dict | None):
+        text = "Plane: {}, Length: {}".format(self.plane, self.length)
+        if prediction is not None:
+            text += ", abnormal: {:.2f}, acl: {:.2f}, meniscus: {:.2f}".format(
+                prediction["abnormal"], prediction["acl"], prediction["meniscus"]
+            )
+        self.title_label.setText(text)
+
+    @staticmethod
+    def load_slice(volume: np.ndarray, window_level: WindowLevel, idx: int) -> np.ndarray:
+        """ Called on a worker thread by the prefetcher """
+        return window_level.apply(volume[idx])
+
     def set_img(self):
-        _file_name = requests.get(
-            "http://localhost:8000/result/{}/{}/{}/".format(self.plane, self.current_idx, "original")
-        )
-        img = np.array(_file_name.json()["img"], dtype=np.uint8)
-        _h, _w = img.shape
-        qimg = QImage(img, _w, _h, _w*1, QImage.Format_Grayscale8)
-        self.original_label.setPixmap(QPixmap.fromImage(qimg.scaled(640, 640)))
+        if self.volume is None:
+            if self.remote is not None:
+                self.remote.request(self.current_idx)
+            return
+        img = self.prefetcher.request(self.current_idx)
+        if img is not None:
+            self.original_label.set_slice(img)
+
+    @Slot(int, object)
+    def show_slice(self, idx: int, img: np.ndarray):
+        if idx == self.current_idx:
+            self.original_label.set_slice(img)
+
+    @Slot(int, str)
+    def fail_slice(self, idx: int, message: str):
+        if idx == self.current_idx:
+            self.original_label.setText(f"\n\n Failed to load slice {idx}: {message} \n\n")
 
     def next_img(self):
         if self.current_idx < self.length-1:
             self.current_idx += 1
-            self.set_img()
+            self.paint_timer.start()
         
     def formal_img(self):
         if self.current_idx > 0:
             self.current_idx -= 1
-            self.set_img()
+            self.paint_timer.start()
             
+    @Slot(int, int)
+    def change_window(self, dx: int, dy: int):
+        """ Rebuild the LUT, repaint the current slice at once and re-decode the prefetched ones """
+        if getattr(self, "window_level", None) is None:
+            return
+        self.window_level.adjust(dx, dy)
+        self.apply_window()
+
+    @Slot()
+    def reset_window(self):
+        if getattr(self, "window_level", None) is None:
+            return
+        self.window_level.reset()
+        self.apply_window()
+
+    def apply_window(self):
+        if self.volume is None:
+            if self.remote_slice is not None:
+                self.original_label.set_slice(self.window_level.apply(self.remote_slice))
+            return
+        self.prefetcher.reset(self.prefetcher.loader, self.length)
+        self.original_label.set_slice(self.prefetcher.loader(self.current_idx))
+
     @Slot(int)    
     def change_idx(self, value: int):
         if value > 0:
             self.next_img()
         else:
-            self.formal_img()
\ No newline at end of file
+            self.formal_img()
+
+    def open_multi_plane(self):
+        """ Upload every plane of the current case in the three-pane window """
+        if self.multi_plane_window is None:
+            self.multi_plane_window = MultiPlaneWindow()
+        self.multi_plane_window.show()
+        if hasattr(self, "file_path"):
+            self.multi_plane_window.open_case(self.file_path)
+
+    def open_case_browser(self):
+        """ The series picked in the case list is opened like a dropped file """
+        if self.case_browser is None:
+            self.case_browser = CaseBrowser()
+            self.case_browser.case_selected.connect(self.original_label.preprocess)
+        self.case_browser.show()
+
+    def export_dicom(self):
+        """ Save the raw series of the current plane as a multi-frame DICOM on the thread pool """
+        volume = self.volume_cache.get(getattr(self, "plane", None))
+        if volume is None:
+            return
+        dcm_path, _ = QFileDialog.getSaveFileName(self, "Export DICOM", "", "DICOM (*.dcm)")
+        if not dcm_path:
+            return
+        task = DicomExportTask(volume, dcm_path, os.path.splitext(os.path.basename(self.file_path))[0])
+        task.signals.finished.connect(lambda info: self.title_label.setText(f"Exported {info['dcm_path']}"))
+        task.signals.failed.connect(lambda message: self.title_label.setText(f"Export failed: {message}"))
+        self.export_task = task
+        QThreadPool.globalInstance().start(task)
+
+
+class MultiPlaneWindow(QMainWindow):
+    """ 
+    Show axial, coronal and sagittal series of a case side by side.
+    The three planes are uploaded to /preprocess concurrently on the client loop,
+    and each pane keeps its own index and volume.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.setWindowTitle("Knee MRI Viewer - 3 Planes")
+        main_widget = QWidget()
+        main_layout = QHBoxLayout()
+        self.panes = {}
+        self.remotes = {}
+        for plane in PLANES:
+            image_label = ImageLabel(plane, 400)
+            pane = PlaneView(image_label, plane)
+            image_label.file_dropped.connect(self.open_case)
+            image_label.file_info.connect(self.set_current_img_folder)
+            main_layout.addWidget(pane)
+            self.panes[plane] = pane
+        main_widget.setLayout(main_layout)
+        self.setCentralWidget(main_widget)
+
+    def open_case(self, file_path: str):
+        """ Find the other planes of the case (${DATASET_ROOT}/<split>/<plane>/<case>.npy) and upload all of them """
+        case_dir = os.path.dirname(os.path.dirname(file_path))
+        case_file = os.path.basename(file_path)
+        for plane, pane in self.panes.items():
+            plane_path = os.path.join(case_dir, plane, case_file)
+            if not os.path.exists(plane_path):
+                pane.image_label.setText(f"\n\n No {plane} series \n\n")
+                continue
+            pane.image_label.start_ingest(UploadTask(plane_path, plane))
+
+    @Slot(dict)
+    def set_current_img_folder(self, response: dict):
+        plane = response["plane"]
+        if plane in self.remotes:
+            self.remotes[plane].cancel()
+        remote = RemoteSeries(get_client(BACKEND_URL), response["case"], plane, parent=self)
+        remote.volume_ready.connect(partial(self.panes[plane].set_volume, window_level=response["window_level"]))
+        remote.failed.connect(self.panes[plane].image_label.setText)
+        remote.download()
+        self.remotes[plane] = remote
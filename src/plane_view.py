@@ -0,0 +1,129 @@
+from PySide6.QtCore import Slot, QTimer, Qt
+from PySide6.QtWidgets import QFrame, QLabel, QPushButton, QVBoxLayout, QHBoxLayout
+
+from functools import partial
+
+import numpy as np
+
+from src.catalog import PLANES
+from src.prefetcher import SlicePrefetcher
+from src.slice_canvas import SliceCanvas
+from src.window_level import WindowLevel
+
+
+class PlaneView(QFrame):
+    """
+    This Class is one pane of the multi-plane viewer.
+    It owns the slice index, the volume and the prefetcher of its plane,
+    so every pane scrolls independently.
+    The image label is created by the caller (local or fastapi ImageLabel),
+    and its wheel and window/level signals are connected to this pane.
+    """
+    def __init__(self, image_label: SliceCanvas, plane: str):
+        super().__init__()
+        self.plane = plane
+        self.image_label = image_label
+        self.image_label.wheel_moved.connect(self.scroll)
+        self.image_label.window_level_dragged.connect(self.change_window)
+        self.image_label.window_level_reset.connect(self.reset_window)
+        self.volume = None
+        self.window_level = None
+        self.length = 0
+        self.current_idx = 0
+
+        main_layout = QVBoxLayout()
+        self.title_label = QLabel(plane)
+        self.title_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(self.title_label)
+        main_layout.addWidget(self.image_label)
+
+        btn_layout = QHBoxLayout()
+        formal_btn = QPushButton("<")
+        next_btn = QPushButton(">")
+        btn_layout.addWidget(formal_btn)
+        btn_layout.addWidget(next_btn)
+        main_layout.addLayout(btn_layout)
+        self.setLayout(main_layout)
+
+        formal_btn.clicked.connect(self.formal_img)
+        next_btn.clicked.connect(self.next_img)
+
+        self.prefetcher = SlicePrefetcher(self)
+        self.prefetcher.ready.connect(self.show_slice)
+        self.prefetcher.failed.connect(self.fail_slice)
+        self.paint_timer = QTimer(self)
+        self.paint_timer.setSingleShot(True)
+        self.paint_timer.setInterval(15)
+        self.paint_timer.timeout.connect(self.set_img)
+
+    def set_volume(self, volume: np.ndarray, window_level: WindowLevel) -> None:
+        """ window_level is made by the ingest or upload task, off the GUI thread """
+        self.volume = volume
+        self.window_level = window_level
+        self.length = volume.shape[0]
+        self.current_idx = 0
+        self.prefetcher.reset(partial(self.load_slice, volume, self.window_level), self.length)
+        self.set_img()
+
+    @staticmethod
+    def load_slice(volume: np.ndarray, window_level: WindowLevel, idx: int) -> np.ndarray:
+        """ Called on a worker thread by the prefetcher """
+        return window_level.apply(volume[idx])
+
+    @Slot(int, int)
+    def change_window(self, dx: int, dy: int) -> None:
+        if self.window_level is None:
+            return
+        self.window_level.adjust(dx, dy)
+        self.apply_window()
+
+    @Slot()
+    def reset_window(self) -> None:
+        if self.window_level is None:
+            return
+        self.window_level.reset()
+        self.apply_window()
+
+    def apply_window(self) -> None:
+        self.prefetcher.reset(self.prefetcher.loader, self.length)
+        self.image_label.set_slice(self.prefetcher.loader(self.current_idx))
+
+    def set_img(self):
+        if self.volume is None:
+            return
+        self.title_label.setText(
+            "Plane: {}, Length: {}, Index: {}".format(self.plane, self.length, self.current_idx)
+        )
+        img = self.prefetcher.request(self.current_idx)
+        if img is not None:
+            self.image_label.set_slice(img)
+
+    @Slot(int, object)
+    def show_slice(self, idx: int, img: np.ndarray):
+        if idx == self.current_idx:
+            self.image_label.set_slice(img)
+
+    @Slot(int, str)
+    def fail_slice(self, idx: int, message: str):
+        if idx == self.current_idx:
+            self.image_label.setText(f"\n\n Failed to load slice {idx}: {message} \n\n")
+
+    def next_img(self):
+        if self.current_idx < self.length-1:
+            self.current_idx += 1
+            self.paint_timer.start()
+
+    def formal_img(self):
+        if self.current_idx > 0:
+            self.current_idx -= 1
+            self.paint_timer.start()
+
+    @Slot(int)
+    def scroll(self, delta: int):
+        if delta > 0:
+            self.next_img()
+        else:
+            self.formal_img()
+
+    def wheelEvent(self, event):
+        self.scroll(event.angleDelta().y())
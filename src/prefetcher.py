@@ -0,0 +1,132 @@
+from PySide6.QtCore import Slot, Signal, QObject, QRunnable, QThreadPool
+
+from collections import OrderedDict, deque
+from typing import Callable
+
+import numpy as np
+
+
+class PrefetchSignals(QObject):
+    loaded = Signal(int, int, object)
+    failed = Signal(int, int, str)
+
+
+class LoadTask(QRunnable):
+    """ Decode one slice into a uint8 array on a worker thread """
+    def __init__(self, loader: Callable[[int], np.ndarray], idx: int, generation: int, signals: PrefetchSignals):
+        super().__init__()
+        self.loader = loader
+        self.idx = idx
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        try:
+            img = self.loader(self.idx)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, self.idx, str(e))
+            return
+        self.signals.loaded.emit(self.generation, self.idx, img)
+
+
+class SlicePrefetcher(QObject):
+    """
+    This Class decodes slices on the QThreadPool ahead of the current index.
+
+    The scroll direction is predicted from the last few requested index deltas,
+    and the next `read_ahead` slices in that direction are decoded in the background.
+    The decoded uint8 slices (ready for SliceCanvas.set_slice) are kept in a bounded LRU,
+    so the memory stays flat on long series.
+
+    `ready` is emitted when a requested slice, which was not cached, finishes loading,
+    and `failed` when it could not be loaded (a failed read-ahead is only dropped).
+    """
+    ready = Signal(int, object)
+    failed = Signal(int, str)
+
+    def __init__(self, parent: QObject = None, read_ahead: int = 4, capacity: int = 64):
+        super().__init__(parent)
+        self.read_ahead = read_ahead
+        self.capacity = capacity
+        self.pool = QThreadPool.globalInstance()
+        self.signals = PrefetchSignals()
+        self.signals.loaded.connect(self.on_loaded)
+        self.signals.failed.connect(self.on_failed)
+
+        self.loader = None
+        self.length = 0
+        self.generation = 0
+        self.wanted_idx = -1
+        self.last_idx = None
+        self.deltas = deque(maxlen=4)
+        self.cache = OrderedDict()
+        self.pending = set()
+
+    def reset(self, loader: Callable[[int], np.ndarray], length: int) -> None:
+        """ Switch to a new series. Loads of the former series still running are dropped. """
+        self.generation += 1
+        self.loader = loader
+        self.length = length
+        self.wanted_idx = -1
+        self.last_idx = None
+        self.deltas.clear()
+        self.cache.clear()
+        self.pending.clear()
+
+    def direction(self) -> int:
+        """ Predict the scroll direction by recent deltas (1: forward, -1: backward) """
+        return -1 if sum(self.deltas) < 0 else 1
+
+    def request(self, idx: int) -> np.ndarray | None:
+        """
+        Return the slice of idx if it is cached, otherwise load it and emit `ready` later.
+        In both cases, slices ahead of idx are scheduled.
+        """
+        if self.last_idx is not None and idx != self.last_idx:
+            self.deltas.append(idx - self.last_idx)
+        self.last_idx = idx
+        self.wanted_idx = idx
+
+        img = self.cache.get(idx)
+        if img is not None:
+            self.cache.move_to_end(idx)
+        else:
+            self.schedule(idx, priority=1)
+
+        step = self.direction()
+        for i in range(1, self.read_ahead + 1):
+            self.schedule(idx + step * i)
+        self.schedule(idx - step)
+        return img
+
+    def schedule(self, idx: int, priority: int = 0) -> None:
+        if self.loader is None or not 0 <= idx < self.length:
+            return
+        if idx in self.cache or idx in self.pending:
+            return
+        self.pending.add(idx)
+        self.pool.start(LoadTask(self.loader, idx, self.generation, self.signals), priority)
+
+    @Slot(int, int, object)
+    def on_loaded(self, generation: int, idx: int, img: np.ndarray | None) -> None:
+        if generation != self.generation:
+            return
+        self.pending.discard(idx)
+        if img is None:
+            return
+
+        self.cache[idx] = img
+        self.cache.move_to_end(idx)
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+        if idx == self.wanted_idx:
+            self.ready.emit(idx, img)
+
+    @Slot(int, int, str)
+    def on_failed(self, generation: int, idx: int, message: str) -> None:
+        if generation != self.generation:
+            return
+        self.pending.discard(idx)
+        if idx == self.wanted_idx:
+            self.failed.emit(idx, message)
@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def get_plane_basis(yaw: float, pitch: float) -> np.ndarray:
+    """
+    Rows (normal, up, right) of the slice plane in (z, y, x) voxel space.
+    yaw = pitch = 0 is the native axis 0 of the array, pitch = 90 is axis 1 and yaw = 90 is axis 2.
+    """
+    p, y = np.radians(pitch), np.radians(yaw)
+    rotate_pitch = np.array([[np.cos(p), -np.sin(p), 0], [np.sin(p), np.cos(p), 0], [0, 0, 1]])
+    rotate_yaw = np.array([[np.cos(y), 0, -np.sin(y)], [0, 1, 0], [np.sin(y), 0, np.cos(y)]])
+    basis = (rotate_yaw @ rotate_pitch).T
+    # exact axes for the orthogonal planes, so they take the transposed-view path
+    basis[np.abs(basis) < 1e-9] = 0.0
+    return basis
+
+
+def sample_trilinear(volume: np.ndarray, coords: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    """ Sample the contiguous volume at coords (3, h, w) in voxel units with trilinear interpolation (float32) """
+    dims = np.array(volume.shape).reshape(3, 1, 1)
+    inside = np.all((coords >= 0) & (coords <= dims - 1), axis=0)
+    # the lower corner is kept inside the volume, so the upper one is too (frac is 1 on the last voxel)
+    base = np.clip(np.floor(coords), 0, np.maximum(dims - 2, 0))
+    frac = (coords - base).astype(np.float32)
+    base = base.astype(np.intp)
+
+    # 8 gathers from the flat array, the corners are fixed strides away from the lower one
+    flat = volume.reshape(-1)
+    strides = [volume.shape[1] * volume.shape[2], volume.shape[2], 1]
+    lower = base[0] * strides[0] + base[1] * strides[1] + base[2]
+    steps = [strides[axis] if volume.shape[axis] > 1 else 0 for axis in range(3)]
+
+    out = np.zeros(coords.shape[1:], dtype=np.float32)
+    for dz in (0, 1):
+        wz = frac[0] if dz else 1 - frac[0]
+        for dy in (0, 1):
+            wzy = wz * (frac[1] if dy else 1 - frac[1])
+            for dx in (0, 1):
+                w = wzy * (frac[2] if dx else 1 - frac[2])
+                out += w * flat.take(lower + (dz * steps[0] + dy * steps[1] + dx * steps[2]))
+    out[~inside] = fill
+    return out
+
+
+class Reslicer:
+    """
+    This Class makes slices of any orientation (multiplanar reformatting) from one volume.
+
+    The slices of an orientation (yaw, pitch) are parallel planes through the volume, one voxel apart,
+    sized to cover the whole volume. The orthogonal orientations are transposed/flipped views of
+    the array (no interpolation, a memmap stays a memmap), the oblique ones are sampled with
+    vectorized trilinear interpolation. Sampled slices are kept in a bounded LRU,
+    so scrolling back over an oblique plane costs one dict lookup. It is safe to use from worker threads.
+
+    Indexing (reslicer[idx], len(reslicer)) follows the orientation set by set_orientation(),
+    while get_slice() / get_length() take the orientation with every call (one reslicer, many clients).
+    """
+    def __init__(self, volume: np.ndarray, capacity: int = 256, num_geometries: int = 8):
+        self.volume = volume
+        self.capacity = capacity
+        self.num_geometries = num_geometries
+        self.dense = None
+        self.fill = 0.0
+        self.cache = OrderedDict()
+        self.geometries = OrderedDict()
+        self.lock = threading.Lock()
+        self.set_orientation(0.0, 0.0)
+
+    def set_orientation(self, yaw: float, pitch: float) -> None:
+        """ The geometry is replaced at once, so a worker thread never sees half of it """
+        self.geometry = self.get_geometry(yaw, pitch)
+
+    def get_length(self, yaw: float, pitch: float) -> int:
+        return self.get_geometry(yaw, pitch)["shape"][0]
+
+    def get_slice(self, yaw: float, pitch: float, idx: int) -> np.ndarray:
+        return self.get_from(self.get_geometry(yaw, pitch), idx)
+
+    @property
+    def orientation(self) -> tuple:
+        return self.geometry["orientation"]
+
+    @property
+    def shape(self) -> tuple:
+        return self.geometry["shape"]
+
+    def get_geometry(self, yaw: float, pitch: float) -> dict:
+        """ The sampling grid of the orientation, the recent ones are kept """
+        key = (float(yaw), float(pitch))
+        with self.lock:
+            geometry = self.geometries.get(key)
+            if geometry is not None:
+                self.geometries.move_to_end(key)
+                return geometry
+        geometry = self.make_geometry(yaw, pitch)
+        with self.lock:
+            self.geometries[key] = geometry
+            while len(self.geometries) > self.num_geometries:
+                self.geometries.popitem(last=False)
+        return geometry
+
+    def make_geometry(self, yaw: float, pitch: float) -> dict:
+        basis = get_plane_basis(yaw, pitch)
+        geometry = {"orientation": (float(yaw), float(pitch)), "view": self.get_orthogonal_view(basis)}
+        if geometry["view"] is not None:
+            geometry["shape"] = geometry["view"].shape
+            return geometry
+
+        # half extents of the volume along the normal, up and right axes
+        size = (np.array(self.volume.shape[:3]) - 1) / 2
+        shape = tuple(int(np.floor(2 * h + 1e-6)) + 1 for h in np.abs(basis) @ size)
+        offsets = [np.arange(n, dtype=np.float32) - (n - 1) / 2 for n in shape]
+        center = size.astype(np.float32)
+        normal, up, right = basis.astype(np.float32)
+        geometry.update(
+            shape=shape,
+            normal=normal[:, None, None],
+            slice_offsets=offsets[0],
+            # coordinates of the central slice, the others are shifted along the normal
+            grid=(
+                center[:, None, None]
+                + up[:, None, None] * offsets[1][None, :, None]
+                + right[:, None, None] * offsets[2][None, None, :]
+            ),
+        )
+        return geometry
+
+    def get_orthogonal_view(self, basis: np.ndarray) -> np.ndarray | None:
+        if not np.all(np.isin(basis, (-1.0, 0.0, 1.0))):
+            return None
+        if np.array_equal(basis, np.eye(3)):
+            # the native axis: the volume itself (a lazy DICOM series is not read as a whole)
+            return self.volume
+        axes = np.argmax(np.abs(basis), axis=1)
+        view = np.transpose(self.volume, axes)
+        for axis, sign in enumerate(basis[np.arange(3), axes]):
+            if sign < 0:
+                view = np.flip(view, axis)
+        return view
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        return self.get_from(self.geometry, idx)
+
+    def get_from(self, geometry: dict, idx: int) -> np.ndarray:
+        if geometry["view"] is not None:
+            return geometry["view"][idx]
+        key = geometry["orientation"] + (int(idx),)
+        with self.lock:
+            img = self.cache.get(key)
+            if img is not None:
+                self.cache.move_to_end(key)
+                return img
+        img = self.sample(geometry, int(idx))
+        with self.lock:
+            self.cache[key] = img
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return img
+
+    def sample(self, geometry: dict, idx: int) -> np.ndarray:
+        with self.lock:
+            if self.dense is None:
+                # oblique planes read voxels all over the volume, so it is read into memory once
+                dense = np.ascontiguousarray(np.asarray(self.volume))
+                self.fill = float(dense.min()) if dense.size else 0.0
+                self.dense = dense
+        coords = geometry["grid"] + geometry["normal"] * geometry["slice_offsets"][idx]
+        img = sample_trilinear(self.dense, coords, self.fill)
+        dtype = self.dense.dtype
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            return np.clip(np.rint(img), info.min, info.max).astype(dtype)
+        return img.astype(dtype)
@@ -0,0 +1,324 @@
+import os
+import json
+import uuid
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+INDEX_FILE = "index.sqlite3"
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    case_id TEXT NOT NULL, plane TEXT NOT NULL, method TEXT NOT NULL,
+    path TEXT NOT NULL, nbytes INTEGER NOT NULL, spilled INTEGER NOT NULL,
+    PRIMARY KEY (case_id, plane, method)
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    case_id TEXT NOT NULL, plane TEXT NOT NULL, prediction TEXT,
+    PRIMARY KEY (case_id, plane)
+);
+CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY);
+"""
+
+
+def get_default_shared_dir() -> str:
+    """ A tmpfs when there is one (the files are then shared memory), else the temp directory """
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(root, "mri_viewer_shared")
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedVolumeStore:
+    """
+    This Class is the volume store of a backend run by several worker processes (uvicorn --workers N).
+    It has the interface of VolumeStore, so any worker serves the volumes uploaded to any other one.
+
+    Every volume is a .npy file in shared_dir (a tmpfs such as /dev/shm, so it is shared memory),
+    and every worker reads it memory-mapped: a slice is served without copying the volume into the worker.
+    The index (key -> file) and the predictions are a small SQLite database in shared_dir.
+    A worker keeps its own copy of the index and reads it again only when another worker
+    has changed it (PRAGMA data_version), so a read costs one pragma and one dict lookup.
+
+    A file is written before it is indexed and replaced instead of written in place,
+    so a worker which still maps the former file keeps a valid view of it.
+    When memory_budget is exceeded, the oldest uploads are moved to spill_dir (on disk).
+    Unlike VolumeStore, this is upload order and not LRU: tracking the reads would make
+    every read of every worker a write to the shared index.
+    """
+    def __init__(self, shared_dir: str, memory_budget: int, spill_dir: str):
+        self.shared_dir = shared_dir
+        self.volume_dir = os.path.join(shared_dir, "volumes")
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        os.makedirs(self.volume_dir, exist_ok=True)
+        self.__connection = sqlite3.connect(
+            os.path.join(shared_dir, INDEX_FILE), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(INDEX_SCHEMA)
+        self.__lock = threading.RLock()
+        self.__version = None
+        self.__index = {}
+        self.__mapped = {}
+        self.predictions = SharedPredictions(self)
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+
+    def put(self, key: tuple, volume: np.ndarray) -> None:
+        path = self.__new_path(self.volume_dir)
+        # written before it is indexed, so no worker maps a partial file
+        np.save(path, np.ascontiguousarray(volume))
+        with self.__transaction() as db:
+            removed = [row[0] for row in db.execute(
+                "SELECT path FROM volumes WHERE case_id = ? AND plane = ? AND method = ?", key
+            )]
+            db.execute("INSERT OR REPLACE INTO volumes VALUES (?, ?, ?, ?, ?, 0)", (*key, path, volume.nbytes))
+            evicted = self.__select_evicted(db)
+        self.__remove_files(removed)
+        self.__spill(evicted)
+
+    def get(self, key: tuple) -> np.ndarray:
+        """ Raise KeyError when the key is not stored """
+        with self.__lock:
+            for _ in range(3):
+                self.__refresh()
+                entry = self.__index.get(key)
+                if entry is None:
+                    break
+                path, spilled = entry
+                mapped = self.__mapped.get(key)
+                if mapped is None or mapped[0] != path:
+                    try:
+                        mapped = (path, np.load(path, mmap_mode="r"))
+                    except FileNotFoundError:
+                        # replaced by another worker after the index was read
+                        self.__version = None
+                        continue
+                    self.__mapped[key] = mapped
+                if spilled:
+                    self.spill_hits += 1
+                else:
+                    self.hits += 1
+                return mapped[1]
+            self.misses += 1
+            raise KeyError(key)
+
+    def __contains__(self, key: tuple) -> bool:
+        with self.__lock:
+            self.__refresh()
+            return key in self.__index
+
+    def keys(self) -> list:
+        with self.__lock:
+            self.__refresh()
+            return list(self.__index)
+
+    def delete(self, key: tuple) -> None:
+        with self.__transaction() as db:
+            removed = [row[0] for row in db.execute(
+                "SELECT path FROM volumes WHERE case_id = ? AND plane = ? AND method = ?", key
+            )]
+            db.execute("DELETE FROM volumes WHERE case_id = ? AND plane = ? AND method = ?", key)
+        self.__remove_files(removed)
+
+    def clear(self) -> None:
+        """ Remove every volume and prediction, of every worker """
+        with self.__transaction() as db:
+            removed = self.__delete_all(db)
+        self.__remove_files(removed)
+
+    def attach(self) -> None:
+        """ Register this worker. The first worker of a run removes what a former run left behind """
+        with self.__transaction() as db:
+            alive = [
+                pid for (pid,) in db.execute("SELECT pid FROM workers").fetchall()
+                if pid != os.getpid() and is_process_alive(pid)
+            ]
+            db.execute("DELETE FROM workers")
+            db.executemany("INSERT INTO workers VALUES (?)", [(pid,) for pid in alive + [os.getpid()]])
+            removed = [] if alive else self.__delete_all(db, orphans=True)
+        self.__remove_files(removed)
+
+    def detach(self) -> bool:
+        """ Unregister this worker. The last one removes every volume, then return True """
+        with self.__transaction() as db:
+            db.execute("DELETE FROM workers WHERE pid = ?", (os.getpid(),))
+            alive = [pid for (pid,) in db.execute("SELECT pid FROM workers").fetchall() if is_process_alive(pid)]
+            removed = [] if alive else self.__delete_all(db)
+        self.__remove_files(removed)
+        with self.__lock:
+            self.__mapped.clear()
+        return not alive
+
+    def memory_usage(self) -> int:
+        """ Bytes of the volumes held in shared memory (spilled volumes are not counted) """
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT COALESCE(SUM(nbytes), 0) FROM volumes WHERE spilled = 0"
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        """ The volumes are those of every worker, the reads are those of this worker """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT spilled, COUNT(*), COALESCE(SUM(nbytes), 0) FROM volumes GROUP BY spilled"
+            ).fetchall()
+        counts = {bool(spilled): (count, nbytes) for spilled, count, nbytes in rows}
+        return {
+            "memory_bytes": counts.get(False, (0, 0))[1],
+            "memory_budget_bytes": self.memory_budget,
+            "memory_volumes": counts.get(False, (0, 0))[0],
+            "spilled_volumes": counts.get(True, (0, 0))[0],
+            "hits": self.hits,
+            "spill_hits": self.spill_hits,
+            "misses": self.misses,
+        }
+
+    def get_prediction(self, key: tuple) -> dict | None:
+        """ Raise KeyError when no prediction was stored for (case, plane) """
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT prediction FROM predictions WHERE case_id = ? AND plane = ?", key
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def set_prediction(self, key: tuple, prediction: dict | None) -> None:
+        with self.__transaction() as db:
+            db.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", (*key, json.dumps(prediction)))
+
+    def delete_prediction(self, key: tuple | None = None) -> None:
+        """ Delete the prediction of (case, plane), or every prediction when key is None """
+        with self.__transaction() as db:
+            if key is None:
+                db.execute("DELETE FROM predictions")
+            else:
+                db.execute("DELETE FROM predictions WHERE case_id = ? AND plane = ?", key)
+
+    @contextmanager
+    def __transaction(self):
+        with self.__lock:
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.__connection
+            except BaseException:
+                self.__connection.execute("ROLLBACK")
+                raise
+            self.__connection.execute("COMMIT")
+            # data_version does not change for the commits of this connection
+            self.__version = None
+
+    def __refresh(self) -> None:
+        version = self.__connection.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.__version:
+            return
+        rows = self.__connection.execute("SELECT case_id, plane, method, path, spilled FROM volumes").fetchall()
+        self.__index = {tuple(row[:3]): (row[3], bool(row[4])) for row in rows}
+        # the maps of the replaced or deleted volumes are dropped (their files are removed)
+        self.__mapped = {
+            key: mapped for key, mapped in self.__mapped.items()
+            if key in self.__index and self.__index[key][0] == mapped[0]
+        }
+        self.__version = version
+
+    def __select_evicted(self, db: sqlite3.Connection) -> list:
+        """
+        The files of the oldest uploads (by rowid, which INSERT OR REPLACE renews on every upload)
+        to move to spill_dir until the budget is met
+        """
+        rows = db.execute("SELECT path, nbytes FROM volumes WHERE spilled = 0 ORDER BY rowid").fetchall()
+        nbytes = sum(row[1] for row in rows)
+        evicted = []
+        # the newest volume stays in memory
+        for path, size in rows[:-1]:
+            if nbytes <= self.memory_budget:
+                break
+            evicted.append(path)
+            nbytes -= size
+        return evicted
+
+    def __spill(self, paths: list) -> None:
+        """
+        Copy the files to spill_dir out of any transaction, so the other workers are not locked out
+        of the index for the copy, then swap the paths in a short one.
+        A volume replaced, deleted or spilled by another worker during the copy keeps its row, and the copy is removed.
+        """
+        if not paths:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        copies = []
+        for path in paths:
+            spill_path = self.__new_path(self.spill_dir)
+            try:
+                shutil.copyfile(path, spill_path)
+            except OSError:
+                self.__remove_files([spill_path])
+                continue
+            copies.append((path, spill_path))
+        removed = []
+        with self.__transaction() as db:
+            for path, spill_path in copies:
+                swapped = db.execute(
+                    "UPDATE volumes SET path = ?, spilled = 1 WHERE path = ? AND spilled = 0", (spill_path, path)
+                ).rowcount
+                removed.append(path if swapped else spill_path)
+        self.__remove_files(removed)
+
+    def __delete_all(self, db: sqlite3.Connection, orphans: bool = False) -> list:
+        """
+        Delete every row. Return the files to remove, with the files of no row when orphans is set
+        (left by a worker which died between writing and indexing a volume).
+        """
+        removed = [row[0] for row in db.execute("SELECT path FROM volumes")]
+        db.execute("DELETE FROM volumes")
+        db.execute("DELETE FROM predictions")
+        if orphans:
+            removed += [os.path.join(self.volume_dir, name) for name in os.listdir(self.volume_dir)]
+        return removed
+
+    @staticmethod
+    def __new_path(directory: str) -> str:
+        return os.path.join(directory, f"{uuid.uuid4().hex}.npy")
+
+    @staticmethod
+    def __remove_files(paths: list) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SharedPredictions:
+    """ The predictions of a SharedVolumeStore, used like the dict {(case, plane): prediction} """
+    def __init__(self, store: SharedVolumeStore):
+        self.store = store
+
+    def __getitem__(self, key: tuple) -> dict | None:
+        return self.store.get_prediction(key)
+
+    def __setitem__(self, key: tuple, prediction: dict | None) -> None:
+        self.store.set_prediction(key, prediction)
+
+    def pop(self, key: tuple, default=None) -> None:
+        """ Only used to delete: the prediction is not returned """
+        self.store.delete_prediction(key)
+        return default
+
+    def clear(self) -> None:
+        self.store.delete_prediction()
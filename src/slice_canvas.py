@@ -0,0 +1,59 @@
+from PySide6.QtCore import Signal
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtWidgets import QLabel
+
+import numpy as np
+
+
+class SliceCanvas(QLabel):
+    """
+    QLabel which draws a 2D uint8 slice from a numpy buffer it keeps referenced.
+
+    The slice is copied into a persistent buffer wrapped by a persistent QImage
+    (both are reallocated only when the slice shape changes), and it is scaled to the
+    widget by the paint transform, so showing a new slice allocates nothing.
+    The QLabel text (drop hint, progress) is shown while no slice is set.
+    slice_painted is emitted when a slice given to set_slice has been drawn (once per set_slice).
+    """
+    slice_painted = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = None
+        self.image = None
+        self.paint_pending = False
+
+    def set_slice(self, img: np.ndarray) -> None:
+        if self.buffer is None or self.buffer.shape != img.shape:
+            _h, _w = img.shape
+            self.buffer = np.zeros((_h, _w), dtype=np.uint8)
+            self.image = QImage(self.buffer.data, _w, _h, _w, QImage.Format_Grayscale8)
+        np.copyto(self.buffer, img, casting="unsafe")
+        if self.text():
+            super().setText("")
+        self.paint_pending = True
+        self.update()
+
+    def clear_slice(self) -> None:
+        self.buffer = None
+        self.image = None
+        self.update()
+
+    def has_slice(self) -> bool:
+        return self.image is not None
+
+    def setText(self, text: str) -> None:
+        self.clear_slice()
+        super().setText(text)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.image is None:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(self.contentsRect(), self.image)
+        painter.end()
+        if self.paint_pending:
+            self.paint_pending = False
+            self.slice_painted.emit()
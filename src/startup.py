@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import importlib
+
+
+def is_profile_enabled() -> bool:
+    """ Startup measurement mode: MRI_STARTUP_PROFILE=1, or --startup-profile for main.py """
+    return os.environ.get("MRI_STARTUP_PROFILE", "") == "1" or "--startup-profile" in sys.argv
+
+
+class StartupTimer:
+    """
+    This Class measures the startup of the viewer or the backend, phase by phase.
+
+    import_modules() imports the heavy modules one by one and records what each one adds
+    (a module already pulled in by a former one costs nothing), which is the import-time breakdown.
+    mark() records the end of a startup phase. When it is disabled, nothing is imported or recorded,
+    and the modules are imported by the usual import statements.
+    Run with python -X importtime for the tree of every module.
+    """
+    def __init__(self, name: str, enabled: bool):
+        self.name = name
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def import_modules(self, *module_names: str) -> None:
+        if not self.enabled:
+            return
+        for module_name in module_names:
+            importlib.import_module(module_name)
+            self.mark(f"import {module_name}")
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, file=sys.stderr) -> dict:
+        """ Print the phases and return them in milliseconds """
+        if not self.enabled:
+            return {}
+        total = (self.last - self.started) * 1000
+        print(f"{self.name} startup: {total:.1f} ms", file=file)
+        for phase, seconds in self.phases:
+            print(f"  {seconds * 1000:8.1f} ms  {phase}", file=file)
+        return {"total_ms": total, "phases": {phase: seconds * 1000 for phase, seconds in self.phases}}
@@ -0,0 +1,21 @@
+import struct
+
+import numpy as np
+
+
+# binary frames of the /stream WebSocket: subscription, slice index, height, width, dtype (numpy dtype.str, e.g. "|u1")
+FRAME_HEADER = struct.Struct("<IiII8s")
+
+
+def encode_frame(subscription: int, idx: int, img: np.ndarray) -> bytes:
+    """ One binary WebSocket message: FRAME_HEADER followed by the raw pixels """
+    img = np.ascontiguousarray(img)
+    header = FRAME_HEADER.pack(subscription, idx, img.shape[0], img.shape[1], img.dtype.str.encode())
+    return header + img.tobytes()
+
+
+def decode_frame(data: bytes) -> tuple:
+    """ Decode a /stream frame into (subscription, idx, slice) without copying """
+    subscription, idx, h, w, dtype = FRAME_HEADER.unpack_from(data)
+    img = np.frombuffer(data, dtype=np.dtype(dtype.rstrip(b"\0").decode()), offset=FRAME_HEADER.size)
+    return subscription, idx, img.reshape(h, w)
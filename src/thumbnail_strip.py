@@ -0,0 +1,86 @@
+from PySide6.QtCore import Signal, Qt, QAbstractListModel, QModelIndex, QSize, QItemSelectionModel
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QListView, QAbstractItemView
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    One row per slice of a pyramid level (slices, h, w) uint8.
+    A thumbnail is made only when the view asks for it (a visible row),
+    and the recent ones are kept in a bounded LRU.
+    """
+    def __init__(self, capacity: int = 128):
+        super().__init__()
+        self.level = None
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()
+
+    def set_level(self, level: np.ndarray | None) -> None:
+        self.beginResetModel()
+        self.level = level
+        self.pixmaps.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.level is None else int(self.level.shape[0])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self.level is None:
+            return None
+        if role == Qt.DisplayRole:
+            return str(index.row())
+        if role == Qt.DecorationRole:
+            return self.get_pixmap(index.row())
+        return None
+
+    def get_pixmap(self, row: int) -> QPixmap:
+        pixmap = self.pixmaps.get(row)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(row)
+            return pixmap
+        img = np.ascontiguousarray(self.level[row])
+        h, w = img.shape
+        pixmap = QPixmap.fromImage(QImage(img.data, w, h, w, QImage.Format_Grayscale8))
+        self.pixmaps[row] = pixmap
+        while len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+
+class ThumbnailStrip(QListView):
+    """
+    Horizontal strip of the thumbnails of a series, drawn from a downsampled pyramid level.
+    Only the visible thumbnails are made (uniform item sizes, so the view never asks for the others),
+    and clicking one emits slice_selected, so only that slice is loaded at full resolution.
+    """
+    slice_selected = Signal(int)
+
+    def __init__(self, icon_size: int = 64):
+        super().__init__()
+        self.thumbnails = ThumbnailModel()
+        self.setModel(self.thumbnails)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setUniformItemSizes(True)
+        self.setIconSize(QSize(icon_size, icon_size))
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setFixedHeight(icon_size + 44)
+        self.clicked.connect(lambda index: self.slice_selected.emit(index.row()))
+
+    def set_level(self, level: np.ndarray | None) -> None:
+        self.thumbnails.set_level(level)
+
+    def set_current(self, idx: int) -> None:
+        """ Follow the slice shown by the viewer (no slice_selected is emitted) """
+        if not 0 <= idx < self.thumbnails.rowCount():
+            return
+        index = self.thumbnails.index(idx)
+        self.selectionModel().setCurrentIndex(index, QItemSelectionModel.ClearAndSelect)
+        self.scrollTo(index, QAbstractItemView.EnsureVisible)
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+
+from src.dicom_io import DICOM_EXTENSIONS, is_dicom_path, open_dicom, read_dicom_header
+from src.window_level import WindowLevel
+
+
+SERIES_EXTENSIONS = (".npy",) + DICOM_EXTENSIONS
+# downsampling factors of the thumbnail pyramid: 1/4 and 1/16 of the pixels (128 and 64 px for MRNet)
+PYRAMID_FACTORS = (2, 4)
+
+
+def get_cache_root() -> str:
+    """ 
+    The caches (train_cache, valid_cache, catalog_cache, stats_cache) are made at the root of the repository,
+    or under MRI_CACHE_ROOT when it is set
+    """
+    return os.environ.get("MRI_CACHE_ROOT") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_cache_path(save_dir: str, file_name: str) -> str:
+    """ 
+    Base path of the cache files of a series, e.g. train_cache/axial/0000.npy for
+    0000.wl.npz (window/level histogram) and 0000.x2.npy / 0000.x4.npy (thumbnail pyramid).
+    The slices themselves are not cached: the raw series is memory-mapped and mapped by the window/level LUT
+    """
+    return os.path.join(save_dir, f"{file_name}.npy")
+
+
+def get_series_cache_path(file_path: str) -> str:
+    """ ${DATASET_ROOT}/{train,valid}/<plane>/<case>.npy -> <cache root>/{train,valid}_cache/<plane>/<case>.npy """
+    method = "train_cache" if "train" in file_path else "valid_cache"
+    plane = os.path.basename(os.path.dirname(file_path))
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    return get_cache_path(os.path.join(get_cache_root(), method, plane), file_name)
+
+
+def read_npy_header(path: str) -> tuple:
+    """ Read (shape, dtype) of a .npy file from its header only """
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    return shape, dtype
+
+
+def read_series_header(path: str) -> tuple:
+    """ (shape, dtype) of a .npy or DICOM series, without reading the pixels """
+    if is_dicom_path(path):
+        return read_dicom_header(path)
+    return read_npy_header(path)
+
+
+def open_series(path: str) -> np.ndarray:
+    """ Open a .npy or multi-frame DICOM series lazily (memmap, or frames decoded on indexing) """
+    if is_dicom_path(path):
+        return open_dicom(path)
+    return np.load(path, mmap_mode="r")
+
+
+def is_newer(path: str, src_path: str) -> bool:
+    """ path exists and was written after src_path """
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(src_path)
+    except OSError:
+        return False
+
+
+def get_window_level_path(cache_path: str) -> str:
+    """ e.g. train_cache/axial/0000.npy -> train_cache/axial/0000.wl.npz """
+    return f"{os.path.splitext(cache_path)[0]}.wl.npz"
+
+
+def load_window_level(volume: np.ndarray, src_path: str, cache_path: str) -> WindowLevel | None:
+    """ The cached window/level of the series, or None when there is no cache newer than the source """
+    wl_path = get_window_level_path(cache_path)
+    if is_newer(wl_path, src_path):
+        try:
+            with np.load(wl_path) as state:
+                return WindowLevel(volume, dict(state))
+        except (OSError, ValueError, KeyError):
+            pass
+    return None
+
+
+def get_window_level(volume: np.ndarray, src_path: str, cache_path: str) -> WindowLevel:
+    """ 
+    The window/level of the series. Its histogram is read from the cache when it is newer than the source,
+    otherwise it is computed from the volume and saved.
+    """
+    window_level = load_window_level(volume, src_path, cache_path)
+    if window_level is not None:
+        return window_level
+    wl_path = get_window_level_path(cache_path)
+    window_level = WindowLevel(volume)
+    os.makedirs(os.path.dirname(wl_path) or ".", exist_ok=True)
+    tmp_path = wl_path[:-len(".npz")] + ".tmp.npz"
+    np.savez_compressed(tmp_path, **window_level.get_state())
+    os.replace(tmp_path, wl_path)
+    return window_level
+
+
+def get_pyramid_path(cache_path: str, factor: int) -> str:
+    """ e.g. train_cache/axial/0000.npy -> train_cache/axial/0000.x4.npy """
+    return f"{os.path.splitext(cache_path)[0]}.x{factor}.npy"
+
+
+def downsample_volume(volume: np.ndarray, factor: int) -> np.ndarray:
+    """ Mean of every factor x factor block of every uint8 slice, in one vectorized pass """
+    s, h, w = volume.shape
+    h, w = max(h - h % factor, factor), max(w - w % factor, factor)
+    blocks = np.asarray(volume[:, :h, :w]).reshape(s, h // factor, factor, w // factor, factor)
+    total = blocks.sum(axis=(2, 4), dtype=np.uint32)
+    return ((total + factor * factor // 2) // (factor * factor)).astype(np.uint8)
+
+
+def iter_build_pyramid(
+    volume: np.ndarray, window_level: WindowLevel, cache_path: str,
+    factors: tuple = PYRAMID_FACTORS, chunk_size: int = 8
+):
+    """
+    Map the raw series through the window of window_level (the slices look like the viewer shows them)
+    chunk by chunk, and downsample every level from the previous one.
+    Yield (done, total) after each chunk. The levels are saved (atomic replace) only when the generator
+    is exhausted, so closing it early (cancel) leaves nothing behind.
+    """
+    total = volume.shape[0]
+    levels = {factor: [] for factor in factors}
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        level, previous = window_level.apply(np.asarray(volume[start:stop])), 1
+        for factor in factors:
+            level, previous = downsample_volume(level, factor // previous), factor
+            levels[factor].append(level)
+        yield stop, total
+
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    for factor, chunks in levels.items():
+        pyramid_path = get_pyramid_path(cache_path, factor)
+        tmp_path = pyramid_path[:-len(".npy")] + ".tmp.npy"
+        np.save(tmp_path, np.concatenate(chunks))
+        os.replace(tmp_path, pyramid_path)
+
+
+def build_pyramid(
+    volume: np.ndarray, window_level: WindowLevel, cache_path: str, factors: tuple = PYRAMID_FACTORS
+) -> None:
+    for _ in iter_build_pyramid(volume, window_level, cache_path, factors):
+        pass
+
+
+def is_pyramid_fresh(src_path: str, cache_path: str, factors: tuple = PYRAMID_FACTORS) -> bool:
+    """ Every level is newer than the source and has as many slices """
+    try:
+        num_slices = read_series_header(src_path)[0][0]
+        for factor in factors:
+            pyramid_path = get_pyramid_path(cache_path, factor)
+            if not is_newer(pyramid_path, src_path) or read_npy_header(pyramid_path)[0][0] != num_slices:
+                return False
+        return True
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def is_cache_fresh(src_path: str, cache_path: str) -> bool:
+    """ Everything the viewer reads at open time (window/level histogram and pyramid) is up to date """
+    return is_newer(get_window_level_path(cache_path), src_path) and is_pyramid_fresh(src_path, cache_path)
+
+
+def open_pyramid(cache_path: str, factor: int) -> np.ndarray:
+    """ Memory-map one level of the pyramid (slices, h / factor, w / factor) """
+    return np.load(get_pyramid_path(cache_path, factor), mmap_mode="r")
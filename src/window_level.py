@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class WindowLevel:
+    """
+    This Class maps the raw values of a volume to uint8 for display by a window (center, width).
+
+    The histogram of the whole volume is computed once, and the default window is its
+    0.5-99.5 percentile range, so every slice uses the same mapping (no flicker between slices).
+    The mapping is a 65536 entry LUT indexed by the raw value (8/16-bit data) or by the value
+    quantized to 16 bits (float or wider data), so applying it is one take per slice.
+    Changing the window only rebuilds the LUT, the volume is never normalized again.
+
+    The pass over the volume is skipped when the state (get_state()) of a former run is given,
+    so a series opened again (or pre-built by convert.py) costs no histogram.
+    """
+    LUT_SIZE = 65536
+
+    def __init__(self, volume: np.ndarray, state: dict | None = None):
+        self.dtype = np.dtype(volume.dtype)
+        self.offset = 0
+        self.scale = None
+        self.value_min = 0.0
+        if np.issubdtype(self.dtype, np.integer) and self.dtype.itemsize <= 2:
+            self.offset = -int(np.iinfo(self.dtype).min)
+        elif state is not None:
+            self.value_min, self.scale = float(state["value_min"]), float(state["scale"])
+        else:
+            volume = np.asarray(volume)
+            self.value_min = float(volume.min())
+            value_range = float(volume.max()) - self.value_min
+            self.scale = (self.LUT_SIZE - 1) / value_range if value_range > 0 else 0.0
+
+        if state is not None:
+            self.histogram = np.asarray(state["histogram"])
+        else:
+            self.histogram = np.bincount(self.index(np.asarray(volume)).reshape(-1), minlength=self.LUT_SIZE)
+        cdf = np.cumsum(self.histogram) / max(self.histogram.sum(), 1)
+        lo = int(np.searchsorted(cdf, 0.005))
+        hi = int(np.searchsorted(cdf, 0.995))
+        self.default_window = ((lo + hi) / 2, max(hi - lo, 1))
+        self.step = max(hi - lo, 1) / 256
+        self.set_window(*self.default_window)
+
+    def get_state(self) -> dict:
+        """ What the constructor computes from the volume (saved next to the cache by the volume store) """
+        return {
+            "histogram": self.histogram,
+            "value_min": self.value_min,
+            "scale": np.nan if self.scale is None else self.scale,
+        }
+
+    def index(self, img: np.ndarray) -> np.ndarray:
+        """ Raw values -> LUT indexes """
+        if self.scale is not None:
+            return ((img.astype(np.float32) - self.value_min) * self.scale).astype(np.uint16)
+        if self.offset:
+            return img.astype(np.int32) + self.offset
+        return img
+
+    def set_window(self, center: float, width: float) -> None:
+        """ center and width are in LUT index units """
+        self.center = center
+        self.width = max(width, 1)
+        ramp = (np.arange(self.LUT_SIZE, dtype=np.float32) - (self.center - self.width / 2)) * (255.0 / self.width)
+        # replaced at once, so the worker threads always see a complete LUT
+        self.lut = np.clip(ramp, 0, 255).astype(np.uint8)
+
+    def adjust(self, dx: int, dy: int) -> None:
+        """ Mouse drag: horizontal changes the width, vertical changes the level """
+        self.set_window(self.center - dy * self.step, self.width + dx * self.step)
+
+    def reset(self) -> None:
+        self.set_window(*self.default_window)
+
+    def apply(self, img: np.ndarray) -> np.ndarray:
+        return self.lut[self.index(img)]
@@ -0,0 +1,71 @@
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+# set before backend is imported, so a test run writes nothing into the repository
+TEST_DIR = tempfile.mkdtemp(prefix="mri_viewer_test_")
+os.environ["MRI_CACHE_ROOT"] = os.path.join(TEST_DIR, "cache")
+os.environ["MRI_STORE_SPILL_DIR"] = os.path.join(TEST_DIR, "spill")
+os.environ.pop("MRI_SHARED_STORE_DIR", None)
+os.environ.pop("MRI_MODEL_PATH", None)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """ One in-process backend for the whole run: its shutdown stops the ingest pool for good """
+    from fastapi.testclient import TestClient
+
+    import backend
+
+    with TestClient(backend.app) as client:
+        yield client
+
+
+@pytest.fixture
+def volume() -> np.ndarray:
+    """ A small 12-bit series stored as uint16, like most MRI exports """
+    return np.random.default_rng(0).integers(0, 4096, size=(6, 16, 20)).astype(np.uint16)
+
+
+@pytest.fixture
+def upload(client):
+    """ POST a volume to /preprocess as a raw .npy body """
+    def upload(volume: np.ndarray, plane: str = "sagittal", case: str = "test") -> dict:
+        buf = io.BytesIO()
+        np.save(buf, volume)
+        response = client.post(
+            "/preprocess", params={"plane": plane, "case": case}, content=buf.getvalue(),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+    return upload
+
+
+@pytest.fixture
+def dataset_root(tmp_path) -> str:
+    """
+    ${DATASET_ROOT} with 3 train cases (0-2, every plane, 20 + case slices) and 2 valid cases (10, 11, sagittal),
+    and their label csvs: abnormal and meniscus are case % 2, acl is the opposite
+    """
+    from src.label_index import TASKS
+
+    root = str(tmp_path / "dataset")
+    layout = (("train", range(3), ("axial", "coronal", "sagittal")), ("valid", (10, 11), ("sagittal",)))
+    for split, cases, planes in layout:
+        for plane in planes:
+            os.makedirs(os.path.join(root, split, plane))
+            for case in cases:
+                np.save(os.path.join(root, split, plane, f"{case:04d}.npy"), np.zeros((20 + case, 4, 4), np.uint8))
+        for task_idx, task in enumerate(TASKS):
+            with open(os.path.join(root, f"{split}_{task}.csv"), "w") as f:
+                f.writelines(f"{case},{(case + task_idx % 2) % 2}\n" for case in cases)
+    return root
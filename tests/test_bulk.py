@@ -0,0 +1,34 @@
+import numpy as np
+
+from src.http_client import decode_array
+
+
+def test_slices_range(client, upload, volume):
+    upload(volume, case="slices")
+    response = client.get("/slices/sagittal", params={"case": "slices", "start": 2, "stop": 5})
+    assert response.headers["x-slice-start"] == "2"
+    assert int(response.headers["content-length"]) == volume[2:5].nbytes
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume[2:5])
+
+
+def test_slices_clamps_the_range(client, upload, volume):
+    upload(volume, case="slices")
+    response = client.get("/slices/sagittal", params={"case": "slices", "start": -3, "stop": 100})
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume)
+    response = client.get("/slices/sagittal", params={"case": "slices", "start": 5, "stop": 2})
+    assert decode_array(response.headers, response.content).shape == (0,) + volume.shape[1:]
+
+
+def test_slices_not_found(client):
+    assert client.get("/slices/sagittal", params={"case": "missing"}).status_code == 404
+
+
+def test_volume_raw(client, upload, volume):
+    upload(volume, case="volume")
+    response = client.get("/volume/sagittal", params={"case": "volume"})
+    assert response.headers["x-slice-start"] == "0"
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume)
+
+
+def test_volume_not_found(client):
+    assert client.get("/volume/sagittal", params={"case": "missing"}).status_code == 404
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import catalog as catalog_module
+from src.catalog import SPLITS, PLANES, CATALOG_DTYPE, DatasetCatalog, get_catalog
+from src.label_index import TASKS
+
+
+@pytest.fixture
+def header_reads(monkeypatch) -> list:
+    """ The paths whose header the catalog reads """
+    reads = []
+    read_series_header = catalog_module.read_series_header
+
+    def record(path):
+        reads.append(os.path.basename(path))
+        return read_series_header(path)
+    monkeypatch.setattr(catalog_module, "read_series_header", record)
+    return reads
+
+
+def find(catalog: DatasetCatalog, split: str, plane: str, file_name: str) -> np.void:
+    records = catalog.records
+    rows = np.flatnonzero(
+        (records["split"] == SPLITS.index(split)) & (records["plane"] == PLANES.index(plane))
+        & (records["file_name"] == file_name)
+    )
+    assert rows.size == 1
+    return records[rows[0]]
+
+
+def test_catalog_reads_the_headers_and_labels(dataset_root):
+    catalog = get_catalog(dataset_root)
+    assert len(catalog) == 11
+    record = find(catalog, "train", "coronal", "0001.npy")
+    assert record["case_id"] == 1
+    assert tuple(record["shape"]) == (21, 4, 4)
+    assert record["dtype"] == "|u1"
+    assert tuple(record["labels"]) == (1, 0, 1)
+    assert tuple(find(catalog, "valid", "sagittal", "0010.npy")["labels"]) == (0, 1, 0)
+
+
+def test_update_reads_only_the_changed_series(dataset_root, header_reads):
+    catalog = DatasetCatalog(dataset_root, np.zeros(0, dtype=CATALOG_DTYPE))
+    assert catalog.update()
+    assert len(header_reads) == 11
+
+    header_reads.clear()
+    assert not catalog.update()
+    assert header_reads == []
+
+    axial_dir = os.path.join(dataset_root, "train", "axial")
+    np.save(os.path.join(axial_dir, "0005.npy"), np.zeros((7, 4, 4), np.uint8))
+    np.save(os.path.join(axial_dir, "0000.npy"), np.zeros((9, 4, 4), np.uint8))
+    os.utime(os.path.join(axial_dir, "0000.npy"), (1, 1))
+    os.remove(os.path.join(axial_dir, "0002.npy"))
+    assert catalog.update()
+    assert sorted(header_reads) == ["0000.npy", "0005.npy"]
+    assert len(catalog) == 11
+    assert find(catalog, "train", "axial", "0000.npy")["shape"][0] == 9
+    assert find(catalog, "train", "axial", "0005.npy")["labels"].tolist() == [-1, -1, -1]
+    assert not (catalog.records["file_name"][catalog.records["plane"] == PLANES.index("axial")] == "0002.npy").any()
+
+
+def test_update_joins_the_labels_again_when_a_csv_changes(dataset_root, header_reads):
+    catalog = get_catalog(dataset_root)
+    header_reads.clear()
+    csv_path = os.path.join(dataset_root, "train_acl.csv")
+    with open(csv_path, "w") as f:
+        f.write("0,0\n1,1\n2,0\n")
+    os.utime(csv_path, (1, 1))
+    assert catalog.update()
+    assert header_reads == []
+    assert find(catalog, "train", "sagittal", "0001.npy")["labels"].tolist() == [1, 1, 1]
+
+
+def test_catalog_is_loaded_from_the_cache(dataset_root, header_reads):
+    get_catalog(dataset_root)
+    header_reads.clear()
+    catalog_module._catalogs.clear()
+    catalog = get_catalog(dataset_root)
+    assert header_reads == []
+    assert len(catalog) == 11
+
+
+def test_filter(dataset_root):
+    catalog = get_catalog(dataset_root)
+    assert len(catalog.filter(split=SPLITS.index("valid"))) == 2
+    assert len(catalog.filter(plane=PLANES.index("sagittal"))) == 5
+    rows = catalog.filter(text="0001", task=TASKS.index("acl"))
+    assert rows.size == 0
+    rows = catalog.filter(split=SPLITS.index("train"), task=TASKS.index("acl"))
+    assert sorted(set(catalog.records["case_id"][rows])) == [0, 2]
+
@@ -0,0 +1,19 @@
+import numpy as np
+
+from src.http_client import decode_array
+
+
+def test_reupload_replaces_the_volume(client, upload, volume):
+    upload(volume, case="replaced")
+    upload(volume[:3] + 1, case="replaced")
+    response = client.get("/result/sagittal/2/original", params={"case": "replaced"},
+                          headers={"Accept": "application/octet-stream"})
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume[2] + 1)
+    assert client.get("/result/sagittal/3/original", params={"case": "replaced"}).status_code == 404
+
+
+def test_result_gradcam_falls_back_to_original(client, upload, volume):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/4/gradcam", params={"case": "result"},
+                          headers={"Accept": "application/octet-stream"})
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume[4])
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import dataset_stats
+from src.dataset_stats import get_dataset_stats
+
+
+@pytest.fixture
+def catalog_scans(monkeypatch) -> list:
+    """ The dataset roots the stats scan with the catalog """
+    scans = []
+    get_catalog = dataset_stats.get_catalog
+
+    def record(dataset_root):
+        scans.append(dataset_root)
+        return get_catalog(dataset_root)
+    monkeypatch.setattr(dataset_stats, "get_catalog", record)
+    return scans
+
+
+def test_stats_skip_the_scan_while_the_directories_are_unchanged(dataset_root, catalog_scans):
+    stats = get_dataset_stats(dataset_root)
+    assert len(catalog_scans) == 1
+    assert get_dataset_stats(dataset_root) is stats
+    assert len(catalog_scans) == 1
+
+    np.save(os.path.join(dataset_root, "valid", "sagittal", "0012.npy"), np.zeros((5, 4, 4), np.uint8))
+    stats = get_dataset_stats(dataset_root)
+    assert len(catalog_scans) == 2
+    assert sorted(stats.slice_counts[("valid", "sagittal")]) == [5, 30, 31]
+
+
+def test_label_and_slice_counts(dataset_root):
+    stats = get_dataset_stats(dataset_root)
+    # [split, task, value]: value -1 (missing), 0, 1
+    np.testing.assert_array_equal(stats.label_counts[0], [[0, 2, 1], [0, 1, 2], [0, 2, 1]])
+    np.testing.assert_array_equal(stats.label_counts[1], [[0, 1, 1], [0, 1, 1], [0, 1, 1]])
+    # train: case 1 is abnormal and meniscus, cases 0 and 2 are acl
+    np.testing.assert_array_equal(stats.co_occurrence[0], [[1, 0, 1], [0, 2, 0], [1, 0, 1]])
+    assert sorted(stats.slice_counts[("train", "axial")]) == [20, 21, 22]
+    assert stats.slice_counts[("valid", "axial")].size == 0
+    counts, edges = stats.slice_histogram("train", num_bins=3)
+    assert all(c.sum() == 3 for c in counts.values()) and len(edges) == 4
+
+
+def test_stats_follow_a_csv_change(dataset_root):
+    get_dataset_stats(dataset_root)
+    csv_path = os.path.join(dataset_root, "train_abnormal.csv")
+    with open(csv_path, "w") as f:
+        f.write("0,1\n1,1\n2,1\n")
+    os.utime(csv_path, (1, 1))
+    assert get_dataset_stats(dataset_root).label_counts[0, 0].tolist() == [0, 0, 3]
+
+
+def test_stats_follow_a_series_rewritten_in_place_after_a_restart(dataset_root, monkeypatch):
+    get_dataset_stats(dataset_root)
+    series_path = os.path.join(dataset_root, "train", "axial", "0000.npy")
+    np.save(series_path, np.zeros((40, 4, 4), np.uint8))
+    os.utime(series_path, (1, 1))
+    # a new process: nothing in memory, the stats on disk have the former signature
+    monkeypatch.setattr(dataset_stats, "_stats", {})
+    assert sorted(get_dataset_stats(dataset_root).slice_counts[("train", "axial")]) == [21, 22, 40]
+
+
+def test_stats_are_loaded_from_the_cache(dataset_root, monkeypatch):
+    stats = get_dataset_stats(dataset_root)
+    monkeypatch.setattr(dataset_stats, "_stats", {})
+
+    def build(*args):
+        raise AssertionError("the stats on disk are up to date")
+    monkeypatch.setattr(dataset_stats.DatasetStats, "build", build)
+    loaded = get_dataset_stats(dataset_root)
+    assert loaded is not stats
+    np.testing.assert_array_equal(loaded.label_counts, stats.label_counts)
@@ -0,0 +1,88 @@
+import io
+
+import numpy as np
+import pytest
+
+from src.dicom_io import read_dicom_bytes, write_dicom
+from src.http_client import decode_array
+
+
+def test_dicom_uint16_round_trip(client, volume):
+    pytest.importorskip("pydicom")
+    buf = io.BytesIO()
+    write_dicom(volume, buf)
+    response = client.post(
+        "/preprocess", params={"plane": "axial", "case": "dicom"}, content=buf.getvalue(),
+        headers={"Content-Type": "application/dicom"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["length"] == volume.shape[0]
+
+    response = client.get("/volume/axial", params={"case": "dicom"})
+    stored = decode_array(response.headers, response.content)
+    assert stored.dtype == np.uint16
+    np.testing.assert_array_equal(stored, volume)
+
+    response = client.get("/volume/axial", params={"case": "dicom"}, headers={"Accept": "application/dicom"})
+    assert response.headers["content-type"] == "application/dicom"
+    exported = read_dicom_bytes(io.BytesIO(response.content))
+    assert exported.dtype == np.uint16
+    np.testing.assert_array_equal(exported, volume)
+
+
+def test_dicom_multipart_upload(client, volume):
+    pytest.importorskip("pydicom")
+    buf = io.BytesIO()
+    write_dicom(volume, buf)
+    response = client.post(
+        "/preprocess", params={"plane": "coronal", "case": "dicom"},
+        files={"file": ("series.dcm", buf.getvalue(), "application/octet-stream")},
+    )
+    assert response.status_code == 200, response.text
+    response = client.get("/volume/coronal", params={"case": "dicom"})
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume)
+
+
+def test_dicom_rejects_garbage(client):
+    pytest.importorskip("pydicom")
+    response = client.post(
+        "/preprocess", params={"case": "dicom"}, content=b"\0" * 256, headers={"Content-Type": "application/dicom"},
+    )
+    assert response.status_code == 400
+
+
+def test_volume_dicom_rejects_a_float_volume(client, upload):
+    upload(np.zeros((2, 4, 4), np.float32), case="float")
+    response = client.get("/volume/sagittal", params={"case": "float"}, headers={"Accept": "application/dicom"})
+    assert response.status_code == 400
+
+
+def test_open_dicom_uncompressed_is_a_memmap(tmp_path, volume):
+    pytest.importorskip("pydicom")
+    from src.dicom_io import open_dicom
+
+    path = str(tmp_path / "series.dcm")
+    write_dicom(volume, path)
+    series = open_dicom(path)
+    assert isinstance(series, np.memmap)
+    np.testing.assert_array_equal(series, volume)
+
+
+def test_open_dicom_compressed_decodes_one_frame(tmp_path, volume):
+    pydicom = pytest.importorskip("pydicom")
+    from pydicom.uid import RLELossless
+
+    from src.dicom_io import DicomSeries, open_dicom
+
+    path = str(tmp_path / "series.dcm")
+    write_dicom(volume, path)
+    ds = pydicom.dcmread(path)
+    ds.compress(RLELossless)
+    ds.save_as(path)
+
+    series = open_dicom(path)
+    assert isinstance(series, DicomSeries)
+    assert series.shape == volume.shape and series.dtype == np.uint16
+    np.testing.assert_array_equal(series[3], volume[3])
+    np.testing.assert_array_equal(series[-1], volume[-1])
+    np.testing.assert_array_equal(np.asarray(series), volume)
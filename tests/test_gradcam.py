@@ -0,0 +1,108 @@
+import asyncio
+
+import numpy as np
+
+from backend import GradCamCache
+
+
+class FakePredictor:
+    """ Grad-CAM of a slice is the slice + 1, computed in 10 ms """
+    enabled = True
+    model_version = "fake@1"
+
+    def __init__(self, has_gradcam: bool = True):
+        self.has_gradcam = has_gradcam
+        self.calls = 0
+
+    async def saliency(self, img: np.ndarray, lo: float, hi: float) -> np.ndarray | None:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return img + 1 if self.has_gradcam else None
+
+
+class FakeController:
+    def __init__(self, volume: np.ndarray):
+        self.volumes = {("0000", "sagittal"): volume}
+
+    def get_volume(self, plane: str, method: str, case: str) -> np.ndarray:
+        return self.volumes[(case, plane)]
+
+
+def make_cache(capacity: int = 64, has_gradcam: bool = True) -> GradCamCache:
+    volume = np.arange(6 * 2 * 2, dtype=np.uint8).reshape(6, 2, 2)
+    return GradCamCache(FakePredictor(has_gradcam), FakeController(volume), capacity)
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = make_cache()
+
+    async def run():
+        return await asyncio.gather(*(cache.get("sagittal", 3, "0000") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert cache.predictor.calls == 1
+    assert cache.misses == 1 and cache.hits == 0
+    for img in results:
+        np.testing.assert_array_equal(img, cache.controller.volumes[("0000", "sagittal")][3] + 1)
+
+    asyncio.run(cache.get("sagittal", 3, "0000"))
+    assert cache.predictor.calls == 1 and cache.hits == 1
+
+
+def test_prefetch_computes_the_neighbours_once():
+    cache = make_cache()
+
+    async def run():
+        await cache.get("sagittal", 0, "0000")
+        cache.prefetch("sagittal", 1, "0000", radius=2)
+        cache.prefetch("sagittal", 1, "0000", radius=2)
+        await asyncio.sleep(0.05)
+        return await cache.get("sagittal", 3, "0000")
+
+    asyncio.run(run())
+    # 0 was requested, 1-3 prefetched once each, and 3 is then a hit
+    assert cache.predictor.calls == 4
+    assert cache.hits == 1
+
+
+def test_new_upload_invalidates():
+    cache = make_cache()
+    volumes = cache.controller.volumes
+    asyncio.run(cache.get("sagittal", 0, "0000"))
+    volumes[("0000", "sagittal")] = volumes[("0000", "sagittal")] + 10
+    img = asyncio.run(cache.get("sagittal", 0, "0000"))
+    assert cache.predictor.calls == 2
+    np.testing.assert_array_equal(img, volumes[("0000", "sagittal")][0] + 1)
+
+
+def test_result_of_a_former_upload_is_not_cached():
+    cache = make_cache()
+
+    async def run():
+        pending = asyncio.ensure_future(cache.get("sagittal", 0, "0000"))
+        await asyncio.sleep(0)
+        cache.invalidate("sagittal", "0000")
+        await pending
+        await cache.get("sagittal", 0, "0000")
+
+    asyncio.run(run())
+    assert cache.predictor.calls == 2
+
+
+def test_lru_capacity():
+    cache = make_cache(capacity=2)
+
+    async def run():
+        for idx in (0, 1, 0, 2, 0, 1):
+            await cache.get("sagittal", idx, "0000")
+
+    asyncio.run(run())
+    # 1 is evicted by 2 (0 was used more recently), then requested again
+    assert cache.predictor.calls == 4
+    assert cache.hits == 2
+
+
+def test_model_without_gradcam_returns_the_slice():
+    cache = make_cache(has_gradcam=False)
+    img = asyncio.run(cache.get("sagittal", 2, "0000"))
+    np.testing.assert_array_equal(img, cache.controller.volumes[("0000", "sagittal")][2])
@@ -0,0 +1,123 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import inference
+from inference import MRIKneePredictor, get_batch_shape
+
+
+class FakeSession:
+    """ Stands for an onnxruntime session: logits are the mean of each slice, Grad-CAM is the slice itself """
+    def __init__(self, shape: list, delay: float = 0.0):
+        self.shape = shape
+        self.delay = delay
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input", shape=self.shape)]
+
+    def run(self, output_names, feeds):
+        batch = feeds["input"]
+        self.batches.append(batch.shape)
+        time.sleep(self.delay)
+        logits = np.repeat(batch.mean(axis=(1, 2, 3))[:, None], 3, axis=1)
+        return [logits, np.repeat(batch[:, :1], 3, axis=1)]
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession(["batch", 1, "height", "width"])
+    monkeypatch.setattr(inference, "_session", session)
+    return session
+
+
+@pytest.fixture
+def predictor(session):
+    predictor = MRIKneePredictor(batch_size=8)
+    predictor.enabled = True
+    return predictor
+
+
+async def start_on_threads(predictor: MRIKneePredictor, num_workers: int = 1) -> None:
+    """ predictor.start() with the batches run on threads by the fake session, instead of the process pool """
+    predictor.pool = ThreadPoolExecutor(max_workers=num_workers)
+    predictor.queue = asyncio.Queue()
+    predictor.in_flight = asyncio.Semaphore(num_workers * 2)
+    predictor.batcher = asyncio.create_task(predictor.batch_loop())
+
+
+def items(*shapes):
+    return [(np.zeros(shape, np.uint8), 0, 255) for shape in shapes]
+
+
+def test_batch_shape_of_a_static_model():
+    assert get_batch_shape([4, 3, 64, 64], items((256, 256)), 16) == (4, 3, 64, 64)
+
+
+def test_batch_shape_of_symbolic_dims():
+    assert get_batch_shape(["N", "C", "H", "W"], items((30, 40), (32, 32)), 16) == (16, 1, 30, 40)
+    assert get_batch_shape([None, 1, 64, None], items((30, 40)), 8) == (8, 1, 64, 40)
+
+
+def test_batch_shape_errors():
+    with pytest.raises(ValueError):
+        get_batch_shape(["N", 64, 64], items((64, 64)), 8)
+    with pytest.raises(ValueError):
+        get_batch_shape([2, 1, 64, 64], items(*[(64, 64)] * 3), 8)
+
+
+def test_run_batch_resizes_to_the_model(monkeypatch):
+    session = FakeSession(["N", 1, 8, 8])
+    monkeypatch.setattr(inference, "_session", session)
+    outputs = inference.run_batch([(np.full((16, 16), 255, np.uint8), 0, 255), (np.zeros((8, 8)), 0, 255)], 4)
+    assert session.batches == [(4, 1, 8, 8)]
+    assert len(outputs) == 2
+    np.testing.assert_allclose(outputs[0][0], 1.0)
+    np.testing.assert_allclose(outputs[1][0], 0.0)
+
+
+def test_predictions_share_batches(predictor, session):
+    volumes = [np.full((5, 16, 16), i, np.uint8) for i in range(3)]
+    for volume in volumes:
+        volume[0] = 0
+
+    async def run():
+        await start_on_threads(predictor)
+        try:
+            predictions = await asyncio.gather(*(predictor.predict(volume) for volume in volumes))
+            cam = await predictor.saliency(np.eye(16, dtype=np.uint8), 0, 1)
+        finally:
+            await predictor.stop()
+        return predictions, cam
+
+    predictions, cam = asyncio.run(run())
+    # 15 slices of 3 requests in batches of 8, then the Grad-CAM slice
+    assert session.batches == [(8, 1, 16, 16), (8, 1, 16, 16), (8, 1, 16, 16)]
+    assert [p["abnormal"] for p in predictions] == pytest.approx([0.5, 1 / (1 + np.exp(-1.0)), 1 / (1 + np.exp(-1.0))])
+    np.testing.assert_array_equal(cam, np.eye(16, dtype=np.uint8) * 255)
+
+    stats = predictor.stats()
+    assert stats["volumes"] == 3 and stats["slices"] == 16 and stats["batches"] == 3
+    assert stats["slices_per_sec"] == pytest.approx(16 / predictor.busy_time)
+
+
+def test_throughput_is_per_wall_clock_second(predictor, monkeypatch):
+    monkeypatch.setattr(inference, "_session", FakeSession(["batch", 1, "h", "w"], delay=0.2))
+    volume = np.ones((16, 8, 8), np.uint8)
+
+    async def run():
+        await start_on_threads(predictor, num_workers=2)
+        try:
+            await predictor.predict(volume)
+        finally:
+            await predictor.stop()
+
+    asyncio.run(run())
+    # the two batches of 8 ran side by side: the busy time is one batch, not the sum of both
+    assert predictor.stats()["batches"] == 2
+    assert 0.2 <= predictor.busy_time < 0.35
+    assert predictor.stats()["slices_per_sec"] == pytest.approx(16 / predictor.busy_time)
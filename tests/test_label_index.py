@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import label_index
+from src.label_index import LabelIndex, get_label_index
+
+
+def test_lookup(dataset_root):
+    index = LabelIndex.build(LabelIndex.get_csv_paths(dataset_root, "train"), dataset_root)
+    np.testing.assert_array_equal(index.case_ids, [0, 1, 2])
+    assert index.get(1) == (1, 0, 1)
+    assert index.get(np.int64(2)) == (0, 1, 0)
+    assert index.get(99) == (-1, -1, -1)
+
+
+def test_a_case_missing_in_a_csv(dataset_root):
+    with open(os.path.join(dataset_root, "train_acl.csv"), "a") as f:
+        f.write("7,1\n")
+    os.remove(os.path.join(dataset_root, "train_meniscus.csv"))
+    index = LabelIndex.build(LabelIndex.get_csv_paths(dataset_root, "train"), dataset_root)
+    assert index.get(7) == (-1, 1, -1)
+    assert index.get(0) == (0, 1, -1)
+
+
+@pytest.fixture
+def builds(monkeypatch) -> list:
+    builds = []
+    build = LabelIndex.build.__func__
+
+    def record(cls, csv_paths, dataset_root=""):
+        builds.append(os.path.basename(csv_paths[0]))
+        return build(cls, csv_paths, dataset_root)
+    monkeypatch.setattr(LabelIndex, "build", classmethod(record))
+    return builds
+
+
+def test_index_is_built_once_and_saved(dataset_root, tmp_path, builds, monkeypatch):
+    cache_dir = str(tmp_path / "train_cache")
+    index = get_label_index(dataset_root, "train", cache_dir)
+    assert get_label_index(dataset_root, "train", cache_dir) is index
+    assert builds == ["train_abnormal.csv"]
+    assert os.path.exists(os.path.join(cache_dir, "labels.npz"))
+
+    # a new process reads it from the cache
+    monkeypatch.setattr(label_index, "_indexes", {})
+    assert get_label_index(dataset_root, "train", cache_dir).get(1) == (1, 0, 1)
+    assert len(builds) == 1
+
+
+def test_index_is_rebuilt_when_a_csv_changes(dataset_root, tmp_path, builds):
+    cache_dir = str(tmp_path / "train_cache")
+    get_label_index(dataset_root, "train", cache_dir)
+    csv_path = os.path.join(dataset_root, "train_abnormal.csv")
+    with open(csv_path, "w") as f:
+        f.write("0,1\n1,1\n2,1\n")
+    os.utime(csv_path, (1, 1))
+    assert get_label_index(dataset_root, "train", cache_dir).get(0) == (1, 1, 0)
+    assert len(builds) == 2
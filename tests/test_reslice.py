@@ -0,0 +1,161 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.http_client import decode_array
+
+
+def test_reslice_stored_axis(client, upload, volume):
+    upload(volume, case="reslice")
+    response = client.get("/reslice/sagittal", params={"case": "reslice", "idx": 2},
+                          headers={"Accept": "application/octet-stream"})
+    assert response.headers["x-slice-count"] == str(volume.shape[0])
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume[2])
+
+
+def test_reslice_orthogonal_axes(client, upload, volume):
+    upload(volume, case="reslice")
+    accept = {"Accept": "application/octet-stream"}
+    response = client.get("/reslice/sagittal", params={"case": "reslice", "pitch": 90}, headers=accept)
+    assert response.headers["x-slice-count"] == str(volume.shape[1])
+    assert decode_array(response.headers, response.content).shape == (volume.shape[0], volume.shape[2])
+    response = client.get("/reslice/sagittal", params={"case": "reslice", "yaw": 90}, headers=accept)
+    assert response.headers["x-slice-count"] == str(volume.shape[2])
+    assert decode_array(response.headers, response.content).shape == (volume.shape[1], volume.shape[0])
+
+
+def test_reslice_png_and_json(client, upload, volume):
+    upload(volume, case="reslice")
+    response = client.get("/reslice/sagittal", params={"case": "reslice", "idx": 1}, headers={"Accept": "image/png"})
+    img = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(img, volume[1])
+    body = client.get("/reslice/sagittal", params={"case": "reslice", "idx": 1}).json()
+    assert body["length"] == volume.shape[0]
+    np.testing.assert_array_equal(np.array(body["img"]), volume[1])
+
+
+def test_reslice_follows_a_new_upload(client, upload, volume):
+    upload(volume, case="reslice-new")
+    client.get("/reslice/sagittal", params={"case": "reslice-new", "idx": 0})
+    upload(volume[::-1].copy(), case="reslice-new")
+    response = client.get("/reslice/sagittal", params={"case": "reslice-new", "idx": 0},
+                          headers={"Accept": "application/octet-stream"})
+    np.testing.assert_array_equal(decode_array(response.headers, response.content), volume[-1])
+
+
+@pytest.mark.parametrize("params", [{"case": "missing"}, {"case": "reslice", "idx": 6}, {"case": "reslice", "idx": -1}])
+def test_reslice_not_found(client, upload, volume, params):
+    upload(volume, case="reslice")
+    assert client.get("/reslice/sagittal", params=params).status_code == 404
+
+
+def linear_volume(shape=(9, 12, 14), weights=(1.0, 10.0, 100.0)) -> np.ndarray:
+    """ v(z, y, x) = 1 z + 10 y + 100 x: trilinear interpolation is exact on it """
+    z, y, x = np.meshgrid(*(np.arange(n, dtype=np.float32) for n in shape), indexing="ij")
+    return (weights[0] * z + weights[1] * y + weights[2] * x).astype(np.float32)
+
+
+@pytest.mark.parametrize("yaw, pitch", [(0, 0), (90, 0), (0, 90), (30, 0), (0, -20), (35, 25)])
+def test_plane_basis_is_orthonormal(yaw, pitch):
+    from src.reslice import get_plane_basis
+
+    basis = get_plane_basis(yaw, pitch)
+    np.testing.assert_allclose(basis @ basis.T, np.eye(3), atol=1e-9)
+
+
+def test_sample_trilinear():
+    from src.reslice import sample_trilinear
+
+    volume = linear_volume()
+    coords = np.array([[[0.0, 2.5, 8.0, 9.0]], [[0.0, 3.25, 11.0, 0.0]], [[0.0, 4.5, 13.0, 0.0]]], np.float32)
+    out = sample_trilinear(volume, coords, fill=-1)
+    np.testing.assert_allclose(out[0, :3], [0.0, 2.5 + 32.5 + 450.0, 8.0 + 110.0 + 1300.0], rtol=1e-5)
+    # outside the volume
+    assert out[0, 3] == -1
+
+
+def sample_plane(yaw: float, pitch: float, idx: int, length: int, h: int, w: int, shape: tuple) -> tuple:
+    """
+    (value of the linear volume, inside mask) at every pixel of slice idx:
+    the point center + normal * d + up * v + right * u, with d, v, u centered on the volume
+    """
+    from src.reslice import get_plane_basis
+
+    normal, up, right = get_plane_basis(yaw, pitch)
+    center = (np.array(shape) - 1) / 2
+    d = idx - (length - 1) / 2
+    v = np.arange(h) - (h - 1) / 2
+    u = np.arange(w) - (w - 1) / 2
+    coords = (
+        center[:, None, None] + normal[:, None, None] * d
+        + up[:, None, None] * v[None, :, None] + right[:, None, None] * u[None, None, :]
+    )
+    inside = np.all((coords >= -1e-4) & (coords <= np.array(shape).reshape(3, 1, 1) - 1 + 1e-4), axis=0)
+    return np.tensordot([1.0, 10.0, 100.0], coords, axes=1), inside
+
+
+@pytest.mark.parametrize("yaw, pitch", [(30, 0), (0, 25), (35, -20)])
+def test_oblique_slices_sample_the_plane(yaw, pitch):
+    from src.reslice import Reslicer
+
+    volume = linear_volume()
+    reslicer = Reslicer(volume)
+    length = reslicer.get_length(yaw, pitch)
+    h, w = reslicer.get_slice(yaw, pitch, 0).shape
+    for idx in (0, length // 2, length - 1):
+        img = reslicer.get_slice(yaw, pitch, idx)
+        expected, inside = sample_plane(yaw, pitch, idx, length, h, w, volume.shape)
+        np.testing.assert_allclose(img[inside], expected[inside], rtol=1e-4, atol=1e-2)
+        # the corners of an oblique plane are outside the volume
+        assert (~inside).any() and np.all(img[~inside] == volume.min())
+
+
+def test_oblique_slices_cover_the_volume():
+    from src.reslice import Reslicer
+
+    volume = linear_volume()
+    reslicer = Reslicer(volume)
+    slices = [reslicer.get_slice(45, 0, idx) for idx in range(reslicer.get_length(45, 0))]
+    # at 45 degrees around axis 1, the planes span the diagonal of the (z, x) section
+    assert len(slices) == int(np.floor((8 + 13) / np.sqrt(2) + 1e-6)) + 1
+    assert all(img.shape == slices[0].shape for img in slices)
+    assert slices[0].shape[0] == volume.shape[1]
+
+
+def test_integer_volume_is_rounded_to_its_dtype():
+    from src.reslice import Reslicer
+
+    volume = (linear_volume() * 10).astype(np.uint16)
+    img = Reslicer(volume).get_slice(30, 15, 3)
+    assert img.dtype == np.uint16
+    reference = Reslicer(volume.astype(np.float32)).get_slice(30, 15, 3)
+    np.testing.assert_array_equal(img, np.rint(reference).astype(np.uint16))
+
+
+def test_oblique_slices_are_cached():
+    from src.reslice import Reslicer
+
+    reslicer = Reslicer(linear_volume(), capacity=2)
+    first = reslicer.get_slice(30, 0, 1)
+    assert reslicer.get_slice(30, 0, 1) is first
+    reslicer.get_slice(30, 0, 2)
+    reslicer.get_slice(30, 0, 3)
+    assert reslicer.get_slice(30, 0, 1) is not first
+    np.testing.assert_array_equal(reslicer.get_slice(30, 0, 1), first)
+
+
+@pytest.mark.parametrize("yaw, pitch", [(0, 90), (90, 0), (180, 0), (0, -90)])
+def test_orthogonal_views_match_the_sampled_plane(yaw, pitch):
+    from src.reslice import Reslicer
+
+    volume = linear_volume()
+    reslicer = Reslicer(volume)
+    length = reslicer.get_length(yaw, pitch)
+    for idx in (0, length - 1):
+        img = reslicer.get_slice(yaw, pitch, idx)
+        expected, inside = sample_plane(yaw, pitch, idx, length, *img.shape, volume.shape)
+        assert inside.all()
+        np.testing.assert_allclose(img, expected, rtol=1e-5)
+        assert np.shares_memory(img, volume)
+    # views only: the volume is never read into memory
+    assert reslicer.dense is None
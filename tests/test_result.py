@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.http_client import decode_array
+
+
+def test_result_raw_keeps_the_bit_depth(client, upload, volume):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/2/original", params={"case": "result"},
+                          headers={"Accept": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    img = decode_array(response.headers, response.content)
+    assert img.dtype == np.uint16
+    np.testing.assert_array_equal(img, volume[2])
+
+
+def test_result_png(client, upload, volume):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/3/original", params={"case": "result"}, headers={"Accept": "image/png"})
+    assert response.headers["content-type"] == "image/png"
+    img = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(img, volume[3])
+
+
+def test_result_zstd(client, upload, volume):
+    zstandard = pytest.importorskip("zstandard")
+    upload(volume, case="result")
+    headers = {"Accept": "application/octet-stream", "Accept-Encoding": "zstd"}
+    with client.stream("GET", "/result/sagittal/1/original", params={"case": "result"}, headers=headers) as response:
+        body = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "zstd"
+    img = np.frombuffer(zstandard.ZstdDecompressor().decompress(body), np.uint16).reshape(volume.shape[1:])
+    np.testing.assert_array_equal(img, volume[1])
+
+
+def test_result_json_fallback(client, upload, volume):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/0/original", params={"case": "result"})
+    np.testing.assert_array_equal(np.array(response.json()["img"]), volume[0])
+
+
+@pytest.mark.parametrize("path", [
+    "/result/sagittal/0/original?case=missing",
+    "/result/axial/0/original?case=result",
+    "/result/sagittal/6/original?case=result",
+    "/result/sagittal/-1/original?case=result",
+])
+def test_result_not_found(client, upload, volume, path):
+    upload(volume, case="result")
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("accept, media_type", [
+    ("application/octet-stream, image/png", "application/octet-stream"),
+    ("image/png, application/octet-stream", "image/png"),
+    ("image/png;q=0.5, application/octet-stream;q=0.8", "application/octet-stream"),
+    ("image/*", "image/png"),
+    ("*/*", "application/json"),
+    ("*/*;q=0.1, image/png", "image/png"),
+    ("image/png;q=0, */*", "application/json"),
+    ("text/html, application/json;q=0.9", "application/json"),
+])
+def test_result_accept_negotiation(client, upload, volume, accept, media_type):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/0/original", params={"case": "result"}, headers={"Accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+
+
+@pytest.mark.parametrize("accept", ["image/png;q=0", "text/html", "application/octet-stream;q=0, image/jpeg"])
+def test_result_not_acceptable(client, upload, volume, accept):
+    upload(volume, case="result")
+    response = client.get("/result/sagittal/0/original", params={"case": "result"}, headers={"Accept": accept})
+    assert response.status_code == 406
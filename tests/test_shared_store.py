@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.shared_store import SharedVolumeStore
+
+
+KEY = ("0000", "sagittal", "original")
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """ Two stores on one shared directory, as two worker processes would open it """
+    shared_dir, spill_dir = str(tmp_path / "shared"), str(tmp_path / "spill")
+    first = SharedVolumeStore(shared_dir, 1 << 30, spill_dir)
+    second = SharedVolumeStore(shared_dir, 1 << 30, spill_dir)
+    first.attach()
+    second.attach()
+    yield first, second
+    first.detach()
+    second.detach()
+
+
+def test_put_is_seen_by_the_other_store(stores, volume):
+    first, second = stores
+    first.put(KEY, volume)
+    assert KEY in second
+    assert second.keys() == [KEY]
+    np.testing.assert_array_equal(second.get(KEY), volume)
+    assert second.stats()["hits"] == 1
+
+
+def test_replace_is_seen_by_the_other_store(stores, volume):
+    first, second = stores
+    first.put(KEY, volume)
+    former = second.get(KEY)
+    first.put(KEY, volume + 1)
+    np.testing.assert_array_equal(second.get(KEY), volume + 1)
+    # the former map stays valid for a reader which still holds it
+    np.testing.assert_array_equal(former, volume)
+
+
+def test_delete_is_seen_by_the_other_store(stores, volume):
+    first, second = stores
+    first.put(KEY, volume)
+    first.get(KEY)
+    second.delete(KEY)
+    with pytest.raises(KeyError):
+        first.get(KEY)
+    assert first.stats()["misses"] == 1
+
+
+def test_predictions_are_shared(stores):
+    first, second = stores
+    first.predictions[KEY[:2]] = {"abnormal": 0.5}
+    assert second.predictions[KEY[:2]] == {"abnormal": 0.5}
+    second.predictions.pop(KEY[:2])
+    with pytest.raises(KeyError):
+        first.predictions[KEY[:2]]
+
+
+def test_oldest_upload_is_spilled(tmp_path, volume):
+    store = SharedVolumeStore(str(tmp_path / "shared"), volume.nbytes * 2, str(tmp_path / "spill"))
+    keys = [(str(i), "axial", "original") for i in range(3)]
+    for i, key in enumerate(keys):
+        store.put(key, volume + i)
+    stats = store.stats()
+    assert stats["memory_volumes"] == 2 and stats["spilled_volumes"] == 1
+    assert store.memory_usage() == volume.nbytes * 2
+
+    other = SharedVolumeStore(str(tmp_path / "shared"), volume.nbytes * 2, str(tmp_path / "spill"))
+    for i, key in enumerate(keys):
+        np.testing.assert_array_equal(other.get(key), volume + i)
+    assert other.stats()["spill_hits"] == 1
+
+
+def test_clear_removes_the_volumes_of_every_store(stores, volume):
+    first, second = stores
+    first.put(KEY, volume)
+    second.put(("0001", "axial", "original"), volume)
+    first.predictions[KEY[:2]] = None
+    second.clear()
+    assert first.keys() == []
+    with pytest.raises(KeyError):
+        first.predictions[KEY[:2]]
+
+
+def test_spill_copy_runs_out_of_the_transaction(tmp_path, volume, monkeypatch):
+    import shutil
+    import sqlite3
+
+    from src import shared_store
+
+    shared_dir = str(tmp_path / "shared")
+    store = SharedVolumeStore(shared_dir, volume.nbytes, str(tmp_path / "spill"))
+    other = SharedVolumeStore(shared_dir, 1 << 30, str(tmp_path / "spill"))
+    store.put(KEY, volume)
+    copyfile = shutil.copyfile
+
+    def replace_while_copying(src, dst):
+        # the index is not locked during the copy, so another worker replaces the volume meanwhile
+        connection = sqlite3.connect(os.path.join(shared_dir, shared_store.INDEX_FILE), timeout=0)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("ROLLBACK")
+        connection.close()
+        other.put(KEY, volume + 1)
+        return copyfile(src, dst)
+
+    monkeypatch.setattr(shared_store.shutil, "copyfile", replace_while_copying)
+    store.put(("0001", "axial", "original"), volume)
+    # the replaced volume keeps its new row, and the stale copy is removed
+    np.testing.assert_array_equal(store.get(KEY), volume + 1)
+    assert store.stats()["spilled_volumes"] == 0
+    assert os.listdir(tmp_path / "spill") == []
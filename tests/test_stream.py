@@ -0,0 +1,144 @@
+import threading
+
+import numpy as np
+import pytest
+from PySide6.QtCore import Qt
+
+from backend import get_push_order
+from src.stream_frame import decode_frame
+
+
+def test_push_order():
+    assert get_push_order(10, 24, 3) == [10, 11, 9, 12, 8, 13, 7]
+    assert get_push_order(0, 24, 2) == [0, 1, 2]
+    assert get_push_order(4, 5, 2) == [4, 3, 2]
+
+
+def test_stream_order_and_credits(client, upload):
+    volume = np.arange(24 * 4 * 6, dtype=np.uint16).reshape(24, 4, 6)
+    upload(volume, case="stream")
+    with client.websocket_connect("/stream") as websocket:
+        websocket.send_json({"type": "subscribe", "case": "stream", "plane": "sagittal", "idx": 10})
+        subscribed = websocket.receive_json()
+        assert subscribed["type"] == "subscribed"
+        assert subscribed["length"] == 24 and subscribed["shape"] == [24, 4, 6]
+        subscription = subscribed["subscription"]
+
+        # nearest first, and no more than the window (4) without an ack
+        frames = [decode_frame(websocket.receive_bytes()) for _ in range(4)]
+        assert [idx for _, idx, _ in frames] == [10, 11, 9, 12]
+        for sub, idx, img in frames:
+            assert sub == subscription
+            np.testing.assert_array_equal(img, volume[idx])
+
+        # a cursor move replaces the queue, and the frames wait for the credits
+        websocket.send_json({"type": "cursor", "idx": 0})
+        websocket.send_json({"type": "ack", "count": 2})
+        assert [decode_frame(websocket.receive_bytes())[1] for _ in range(2)] == [0, 1]
+
+        # out of credits: the next message is the answer to this one, not a frame
+        websocket.send_json({"type": "unknown"})
+        assert websocket.receive_json()["type"] == "error"
+
+        # slices already sent are not sent again
+        websocket.send_json({"type": "cursor", "idx": 11})
+        websocket.send_json({"type": "ack", "count": 10})
+        assert [decode_frame(websocket.receive_bytes())[1] for _ in range(4)] == [13, 14, 8, 15]
+
+
+def test_stream_new_subscription_resets(client, upload):
+    volume = np.zeros((3, 2, 2), np.uint8)
+    upload(volume, plane="axial", case="stream")
+    with client.websocket_connect("/stream") as websocket:
+        websocket.send_json({"type": "subscribe", "case": "stream", "plane": "axial", "idx": 0})
+        first = websocket.receive_json()["subscription"]
+        assert [decode_frame(websocket.receive_bytes())[1] for _ in range(3)] == [0, 1, 2]
+        websocket.send_json({"type": "subscribe", "case": "stream", "plane": "axial", "idx": 2})
+        second = websocket.receive_json()["subscription"]
+        assert second == first + 1
+        frames = [decode_frame(websocket.receive_bytes()) for _ in range(3)]
+        assert [(sub, idx) for sub, idx, _ in frames] == [(second, 2), (second, 1), (second, 0)]
+
+
+def test_stream_errors(client):
+    with client.websocket_connect("/stream") as websocket:
+        websocket.send_json({"type": "cursor", "idx": 0})
+        assert websocket.receive_json()["detail"] == "Subscribe before moving the cursor"
+        websocket.send_json({"type": "subscribe", "case": "missing", "plane": "sagittal"})
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"type": "subscribe"})
+        assert websocket.receive_json()["detail"].startswith("Bad subscribe message")
+        websocket.send_text("not json")
+        assert websocket.receive_json()["detail"] == "Messages must be JSON"
+
+
+def test_stream_bad_messages_keep_the_session(client, upload):
+    upload(np.zeros((2, 2, 2), np.uint8), plane="coronal", case="stream")
+    with client.websocket_connect("/stream") as websocket:
+        websocket.send_bytes(b"\x00\x01")
+        assert websocket.receive_json()["detail"] == "Messages must be JSON"
+        for message in ("null", "[1, 2]", '"subscribe"'):
+            websocket.send_text(message)
+            assert websocket.receive_json()["detail"] == "Messages must be JSON objects"
+        websocket.send_json({"idx": 0})
+        assert websocket.receive_json()["detail"].startswith("Bad None message")
+        websocket.send_json({"type": "subscribe", "case": "stream", "plane": "coronal", "idx": None})
+        assert websocket.receive_json()["detail"].startswith("Bad subscribe message")
+        websocket.send_json({"type": "ack", "count": "many"})
+        assert websocket.receive_json()["detail"].startswith("Bad ack message")
+        # the session still serves
+        websocket.send_json({"type": "subscribe", "case": "stream", "plane": "coronal", "idx": 1})
+        assert websocket.receive_json()["type"] == "subscribed"
+        assert decode_frame(websocket.receive_bytes())[1] == 1
+
+
+@pytest.fixture
+def stream_server():
+    """ An AsyncHttpClient and a /stream server on its loop, which closes every socket after one message """
+    from aiohttp import web
+
+    from src.http_client import AsyncHttpClient
+
+    async def handle(request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        await websocket.receive()
+        await websocket.close()
+        return websocket
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/stream", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, runner.addresses[0][1]
+
+    http_client = AsyncHttpClient("http://127.0.0.1")
+    runner, port = http_client.submit(start()).result()
+    http_client.base_url = f"http://127.0.0.1:{port}"
+    yield http_client
+    http_client.submit(runner.cleanup()).result()
+    http_client.close()
+
+
+def test_stream_closed_by_the_server_fails(stream_server):
+    from src.http_client import SliceStream
+
+    stream = SliceStream(stream_server)
+    failed = threading.Event()
+    stream.failed.connect(lambda message: failed.set(), Qt.DirectConnection)
+    stream.subscribe("0000", "sagittal")
+    assert failed.wait(5)
+
+
+def test_stream_closed_by_the_client_does_not_fail(stream_server):
+    from src.http_client import SliceStream
+
+    stream = SliceStream(stream_server)
+    failed = threading.Event()
+    stream.failed.connect(lambda message: failed.set(), Qt.DirectConnection)
+    stream_server.submit(stream.open_connection()).result()
+    stream_server.submit(stream.close_connection()).result()
+    assert not failed.wait(0.5)
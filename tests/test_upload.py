@@ -0,0 +1,36 @@
+import io
+
+import numpy as np
+
+
+
+def test_preprocess_returns_length(upload, volume):
+    assert upload(volume, case="length") == {"length": 6, "case": "length", "prediction": None}
+
+
+def test_preprocess_rejects_a_non_npy_body(client):
+    response = client.post(
+        "/preprocess", params={"case": "bad"}, content=b"this is not a .npy file",
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 400
+
+
+def test_preprocess_rejects_a_truncated_body(client, volume):
+    buf = io.BytesIO()
+    np.save(buf, volume)
+    response = client.post(
+        "/preprocess", params={"case": "truncated"}, content=buf.getvalue()[:-10],
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 400
+
+
+def test_preprocess_rejects_a_2d_array(client):
+    buf = io.BytesIO()
+    np.save(buf, np.zeros((4, 4), np.uint8))
+    response = client.post(
+        "/preprocess", params={"case": "flat"}, content=buf.getvalue(),
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from src.window_level import WindowLevel
+
+
+def test_set_window_maps_the_window_to_the_full_range():
+    window_level = WindowLevel(np.arange(1000, dtype=np.uint16).reshape(10, 10, 10))
+    window_level.set_window(500, 200)
+    img = np.array([[0, 399, 400, 500, 599, 600, 65535]], dtype=np.uint16)
+    np.testing.assert_array_equal(window_level.apply(img), [[0, 0, 0, 127, 253, 255, 255]])
+
+
+def test_lut_is_monotonic():
+    window_level = WindowLevel(np.random.default_rng(0).integers(0, 4096, (4, 8, 8)).astype(np.uint16))
+    window_level.set_window(2000, 1000)
+    assert window_level.lut.dtype == np.uint8
+    assert np.all(np.diff(window_level.lut.astype(np.int16)) >= 0)
+
+
+def test_default_window_is_the_percentile_range():
+    volume = np.zeros((1, 100, 100), np.uint16)
+    volume.reshape(-1)[:] = np.arange(10000) % 1000 + 1000
+    window_level = WindowLevel(volume)
+    center, width = window_level.default_window
+    assert center == pytest.approx(1500, abs=2)
+    assert width == pytest.approx(990, abs=4)
+    # every slice uses the same mapping, so a value shows the same on any slice
+    assert window_level.apply(volume[:, :1, :1])[0, 0, 0] == window_level.apply(np.array([[1000]], np.uint16))[0, 0]
+
+
+def test_signed_data_is_offset():
+    volume = np.array([[[-1000, 0, 1000]]], dtype=np.int16)
+    window_level = WindowLevel(volume)
+    window_level.set_window(0 + window_level.offset, 2000)
+    np.testing.assert_array_equal(window_level.apply(volume), [[[0, 127, 255]]])
+
+
+def test_float_data_is_quantized():
+    volume = np.linspace(-1.0, 1.0, 64, dtype=np.float32).reshape(1, 8, 8)
+    window_level = WindowLevel(volume)
+    assert window_level.index(volume).min() == 0
+    assert window_level.index(volume).max() == WindowLevel.LUT_SIZE - 1
+    window_level.set_window(WindowLevel.LUT_SIZE / 2, WindowLevel.LUT_SIZE)
+    out = window_level.apply(volume)
+    assert out[0, 0, 0] == 0 and out[0, -1, -1] >= 254
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int16, np.float32])
+def test_state_round_trip(dtype):
+    volume = (np.random.default_rng(1).random((3, 8, 8)) * 200).astype(dtype)
+    window_level = WindowLevel(volume)
+    restored = WindowLevel(volume[:0], dict(window_level.get_state()))
+    assert restored.default_window == window_level.default_window
+    np.testing.assert_array_equal(restored.apply(volume), window_level.apply(volume))
+
+
+def test_adjust_and_reset():
+    window_level = WindowLevel(np.arange(4096, dtype=np.uint16).reshape(1, 64, 64))
+    default = (window_level.center, window_level.width)
+    window_level.adjust(10, -10)
+    assert window_level.width > default[1] and window_level.center > default[0]
+    window_level.reset()
+    assert (window_level.center, window_level.width) == default
+
+
+def test_window_level_is_loaded_from_the_cache(tmp_path, volume):
+    from src.volume_store import get_window_level, load_window_level
+
+    src_path, cache_path = str(tmp_path / "0000.npy"), str(tmp_path / "cache" / "0000.npy")
+    np.save(src_path, volume)
+    assert load_window_level(volume, src_path, cache_path) is None
+    window_level = get_window_level(volume, src_path, cache_path)
+    cached = load_window_level(volume[:0], src_path, cache_path)
+    assert cached.default_window == window_level.default_window